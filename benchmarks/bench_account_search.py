@@ -0,0 +1,61 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from ledger import migrations
+from ledger.cache import AccountCache
+from benchmarks import synthetic
+
+# -------------------------------
+# Type-ahead account search
+# -------------------------------
+# Usage: python benchmarks/bench_account_search.py --accounts 50000
+# Loads a chart of accounts into an in-memory SQLite database, builds the
+# account cache and times search() for what a user types, one key at a time.
+
+def chart(n, seed=42):
+    rnd = random.Random(seed)
+    words = [w for party in synthetic.PARTIES for w in party.split()] + \
+            ["Cash", "Bank", "Receivable", "Payable", "Expense", "Revenue", "Loan", "Deposit", "Branch", "Suspense"]
+    words = sorted(set(words))
+    return [(i, " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 3))) + f" {i:05d}",
+             synthetic.ACCOUNT_TYPES[i % len(synthetic.ACCOUNT_TYPES)]) for i in range(1, n + 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the type-ahead account search.")
+    parser.add_argument("--accounts", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, default=12)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO accounts (id, name, type, balance) VALUES (:id, :name, :type, 0)"),
+                     [{"id": i, "name": n, "type": t} for i, n, t in chart(args.accounts)])
+    cache = AccountCache(engine, max_age=3600)
+    t0 = time.perf_counter()
+    cache.ensure()
+    print(f"Indexed {args.accounts:,} accounts in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    typed = ["wonka", "supp", "umbrella trad", "recievable", "bnak", "4", "4217", "ex", "deposit 000"]
+    print(f"{'typed so far':<16} {'matches':>8} {'median (ms)':>12} {'max (ms)':>9}")
+    for word in typed:
+        for end in range(1, len(word) + 1):
+            prefix = word[:end]
+            timings = []
+            for _ in range(20):
+                t0 = time.perf_counter()
+                found = cache.search(prefix, args.limit)
+                timings.append(time.perf_counter() - t0)
+            if end == len(word) or end in (1, 3):
+                print(f"{prefix:<16} {len(found):>8} {statistics.median(timings) * 1000:>12.2f} {max(timings) * 1000:>9.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from ledger import accounts, bulk, migrations, queries, reports
+from ledger.balances import balances_as_of
+from ledger.db import make_engine
+from ledger.posting import post_vouchers
+from benchmarks.bench_posting import make_vouchers
+from tests.local_postgres import LocalPostgres, fresh_pg_database, pg_bindir
+
+# -------------------------------
+# SQLite vs PostgreSQL: posting and report throughput
+# -------------------------------
+# Usage: python benchmarks/bench_backends.py [--vouchers 50000 --accounts 200]
+#        python benchmarks/bench_backends.py --pg-url postgresql+psycopg://user:pw@host/postgres
+#        python benchmarks/bench_backends.py --pg-bin /usr/lib/postgresql/16/bin
+# Without --pg-url, starts a throw-away PostgreSQL server (initdb + pg_ctl from
+# --pg-bin, PATH or pg_config; see tests/local_postgres.py, which the tests use
+# too) and stops it afterwards.  With --pg-url, a database named --pg-database
+# is dropped and created again on that server.  Needs psycopg (or psycopg2)
+# installed.
+#
+# On each backend, on a fresh schema:
+#   single   - one voucher per transaction, as the voucher screen posts
+#   bulk     - batches of --batch vouchers, as the importer posts (COPY on
+#              PostgreSQL), and on PostgreSQL again with COPY switched off
+#   reports  - trial balance, income statement, balances on a date, and the
+#              first ledger page of the busiest account (median of --repeat)
+
+def dated_vouchers(rnd, count, account_count, start):
+    vouchers = make_vouchers(rnd, count, account_count)
+    for voucher in vouchers:
+        voucher["date"] = start + timedelta(days=rnd.randrange(730), seconds=rnd.randrange(86400))
+    return vouchers
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings)
+
+def run_backend(url, args):
+    engine = make_engine(url)
+    migrations.upgrade(engine)
+    Session = sessionmaker(bind=engine)
+    rnd = random.Random(42)
+    start = datetime(datetime.now().year - 2, 1, 1)
+    results = {}
+    with Session() as session:
+        for i in range(args.accounts):
+            accounts.create_account(session, f"Account {i + 1:05d}", accounts.ACCOUNT_TYPES[i % len(accounts.ACCOUNT_TYPES)])
+
+        vouchers = dated_vouchers(rnd, args.single, args.accounts, start)
+        t0 = time.perf_counter()
+        for voucher in vouchers:
+            post_vouchers(session, [voucher])
+        results["single vouchers/s"] = len(vouchers) / (time.perf_counter() - t0)
+
+        modes = [("bulk", bulk.COPY_MIN_ROWS)]
+        if engine.dialect.name == "postgresql":
+            modes.append(("bulk, no COPY", float("inf")))
+        saved = bulk.COPY_MIN_ROWS
+        try:
+            for label, threshold in modes:
+                bulk.COPY_MIN_ROWS = threshold
+                vouchers = dated_vouchers(rnd, args.vouchers, args.accounts, start)
+                t0 = time.perf_counter()
+                for i in range(0, len(vouchers), args.batch):
+                    post_vouchers(session, vouchers[i:i + args.batch])
+                results[f"{label} vouchers/s"] = len(vouchers) / (time.perf_counter() - t0)
+        finally:
+            bulk.COPY_MIN_ROWS = saved
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM ANALYZE"))
+    read_engine = make_engine(url, readonly=True)
+    with sessionmaker(bind=read_engine)() as session:
+        busiest = session.execute(text("SELECT account_id FROM transaction_details GROUP BY account_id "
+                                       "ORDER BY COUNT(*) DESC LIMIT 1")).scalar()
+        year_start, year_end = datetime(start.year + 1, 1, 1), datetime(start.year + 1, 12, 31)
+        middle = datetime(start.year + 1, 6, 15)
+        cases = {
+            "trial balance ms": lambda: reports.trial_balance(session, year_start, year_end),
+            "income statement ms": lambda: reports.income_statement(session, year_start, year_end),
+            "balances as of ms": lambda: balances_as_of(session, middle),
+            "ledger page ms": lambda: queries.ledger_page(session, busiest, queries.first_cursor(session, busiest, middle)),
+        }
+        for label, fn in cases.items():
+            results[label] = timed(fn, args.repeat)
+    read_engine.dispose()
+    engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare posting and report throughput on SQLite and PostgreSQL.")
+    parser.add_argument("--vouchers", type=int, default=50_000, help="vouchers posted in bulk")
+    parser.add_argument("--single", type=int, default=1000, help="vouchers posted one per transaction")
+    parser.add_argument("--batch", type=int, default=1000, help="vouchers per bulk transaction")
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pg-url", default=None, help="an existing PostgreSQL server (any database on it)")
+    parser.add_argument("--pg-database", default="ledger_bench", help="database (re)created for the run")
+    parser.add_argument("--pg-bin", default=None, help="directory with initdb and pg_ctl")
+    parser.add_argument("--no-pg", action="store_true", help="SQLite only")
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results["sqlite"] = run_backend(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}", args)
+    if not args.no_pg:
+        server = None
+        server_url = args.pg_url
+        if not server_url:
+            bindir = pg_bindir(args.pg_bin)
+            if bindir is None:
+                raise SystemExit("PostgreSQL binaries not found: pass --pg-bin DIR or --pg-url URL")
+            server = LocalPostgres(bindir)
+            server_url = server.start()
+        try:
+            results["postgresql"] = run_backend(fresh_pg_database(server_url, args.pg_database), args)
+        finally:
+            if server:
+                server.stop()
+
+    labels = list(max(results.values(), key=len))
+    backends = list(results)
+    print(f"{args.vouchers:,} bulk + {args.single:,} single vouchers, {args.accounts} accounts")
+    print(f"{'':<22}" + "".join(f"{name:>12}" for name in backends))
+    for label in labels:
+        print(f"{label:<22}" + "".join(f"{results[b][label]:>12,.1f}" if label in results[b] else f"{'-':>12}"
+                                       for b in backends))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from ledger import migrations
+from ledger.models import Account, JournalEntry, TransactionDetail, AuditLog, Stock
+from benchmarks import synthetic
+
+# -------------------------------
+# Ledger / dashboard / audit latency before and after the index migrations
+# -------------------------------
+# Usage: python benchmarks/bench_indexes.py --lines 5000000
+# The same queries the Tk screens issue are timed against the baseline schema
+# (version 1), then the database is upgraded to the latest version and timed again.
+
+def load_ledger(session, account_id):
+    return session.query(TransactionDetail).filter_by(account_id=account_id).all()
+
+def dashboard(session):
+    session.query(Account).count()
+    session.query(JournalEntry).count()
+    session.query(Stock).count()
+    return session.query(JournalEntry).order_by(JournalEntry.date.desc()).first()
+
+def audit_first_screen(session):
+    return session.query(AuditLog).order_by(AuditLog.timestamp.desc()).limit(500).all()
+
+def measure(Session, account_id, repeat):
+    results = {}
+    for name, fn in (("ledger", lambda s: load_ledger(s, account_id)),
+                     ("dashboard", dashboard),
+                     ("audit_logs", audit_first_screen)):
+        timings = []
+        for _ in range(repeat):
+            session = Session()
+            t0 = time.perf_counter()
+            fn(session)
+            timings.append(time.perf_counter() - t0)
+            session.close()
+        results[name] = statistics.median(timings)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ledger, dashboard and audit queries before and after the index migrations.")
+    parser.add_argument("--lines", type=int, default=5_000_000)
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--db", default="bench_indexes.db")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing --db instead of rebuilding it")
+    args = parser.parse_args()
+
+    if not (args.reuse and os.path.exists(args.db)):
+        t0 = time.perf_counter()
+        stats = synthetic.build(args.db, args.lines, accounts=args.accounts)
+        print(f"Built {args.db}: {stats['lines']:,} lines, {stats['vouchers']:,} vouchers in {time.perf_counter() - t0:.1f}s")
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    Session = sessionmaker(bind=engine)
+    migrations.downgrade(engine, 1)
+    account_id = args.accounts // 2
+
+    before = measure(Session, account_id, args.repeat)
+    t0 = time.perf_counter()
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    migrate_time = time.perf_counter() - t0
+    after = measure(Session, account_id, args.repeat)
+
+    print(f"Migrated to version {migrations.current_version(engine)} in {migrate_time:.1f}s")
+    print(f"{'query':<12} {'before (ms)':>12} {'after (ms)':>12} {'speedup':>9}")
+    for name in before:
+        b, a = before[name] * 1000, after[name] * 1000
+        print(f"{name:<12} {b:>12.1f} {a:>12.1f} {b / a if a else float('inf'):>8.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+
+from ledger import migrations
+from ledger.balances import signed_amount_sql
+from benchmarks import synthetic
+
+# -------------------------------
+# Amount aggregation: float units vs integer minor units
+# -------------------------------
+# Usage: python benchmarks/bench_money.py [--lines 2000000 --repeat 5]
+# Builds one synthetic ledger with float amounts (schema 11), copies it and
+# migrates the copy to integer minor units (migration 0012, timed), then runs
+# the same aggregates on both:
+#   sum by account   SUM of every line, GROUP BY account (reconcile, rebuilds)
+#   year P&L         one year's lines joined to their vouchers, GROUP BY account
+#   running balance  window SUM over the busiest account's lines (ledger screen)
+#   python sum       the busiest account's amounts fetched and added in Python
+# and reports how far the float sums are from the exact ones: accounts whose
+# float total doesn't round to the exact cents, and the largest error.
+
+FLOAT_SCHEMA = 11
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings)
+
+def cases(conn, account_id, year):
+    signed = signed_amount_sql()
+    by_account = f"SELECT td.account_id, SUM({signed}) FROM transaction_details td GROUP BY td.account_id"
+    pnl = f"""SELECT td.account_id, SUM({signed})
+              FROM journal_entries je JOIN transaction_details td ON td.journal_entry_id = je.id
+              WHERE je.date >= '{year}-01-01 00:00:00' AND je.date < '{year + 1}-01-01 00:00:00'
+              GROUP BY td.account_id"""
+    running = f"""SELECT SUM({signed}) OVER (ORDER BY je.date, td.id)
+                  FROM transaction_details td JOIN journal_entries je ON je.id = td.journal_entry_id
+                  WHERE td.account_id = {account_id}"""
+    amounts = f"SELECT {signed} FROM transaction_details td WHERE td.account_id = {account_id}"
+    return [("sum by account", lambda: conn.execute(by_account).fetchall()),
+            ("year P&L", lambda: conn.execute(pnl).fetchall()),
+            ("running balance", lambda: conn.execute(running).fetchall()),
+            ("python sum", lambda: sum(row[0] for row in conn.execute(amounts)))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare aggregation on float and integer amounts.")
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default="bench_money.db", help="float database; the integer copy gets -int")
+    parser.add_argument("--reuse", action="store_true", help="reuse existing databases instead of rebuilding")
+    args = parser.parse_args()
+
+    float_db = args.db
+    int_db = f"{os.path.splitext(args.db)[0]}-int.db"
+    migrate_s = None
+    if not (args.reuse and os.path.exists(float_db) and os.path.exists(int_db)):
+        synthetic.build(float_db, args.lines, accounts=args.accounts, schema_version=FLOAT_SCHEMA)
+        shutil.copyfile(float_db, int_db)
+        engine = create_engine(f"sqlite:///{int_db}")
+        t0 = time.perf_counter()
+        migrations.upgrade(engine)
+        migrate_s = time.perf_counter() - t0
+        engine.dispose()
+
+    results, totals = {}, {}
+    for label, path in (("float", float_db), ("integer", int_db)):
+        with sqlite3.connect(path) as conn:
+            account_id = conn.execute("SELECT account_id FROM transaction_details GROUP BY account_id "
+                                      "ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+            year = date.today().year - 1
+            results[label] = {name: timed(fn, args.repeat) for name, fn in cases(conn, account_id, year)}
+            totals[label] = dict(cases(conn, account_id, year)[0][1]())
+            lines = conn.execute("SELECT COUNT(*) FROM transaction_details").fetchone()[0]
+
+    print(f"{lines:,} lines, {args.accounts} accounts, median of {args.repeat}"
+          + (f"; migration to minor units took {migrate_s:.1f} s" if migrate_s is not None else ""))
+    print(f"{'':<18}{'float ms':>12}{'integer ms':>12}{'ratio':>8}")
+    for name in results["float"]:
+        f_ms, i_ms = results["float"][name], results["integer"][name]
+        print(f"{name:<18}{f_ms:>12.1f}{i_ms:>12.1f}{f_ms / i_ms:>7.2f}x")
+
+    exact = totals["integer"]
+    off = [acc for acc, total in totals["float"].items() if round(total * 100) != exact.get(acc)]
+    worst = max(abs(total - exact.get(acc, 0) / 100) for acc, total in totals["float"].items())
+    print(f"float sums off by a cent or more: {len(off)} of {len(exact)} accounts; largest error {worst:.2e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+
+from ledger import report_pack
+from ledger.db import make_engine
+from benchmarks import synthetic
+
+# -------------------------------
+# Report pack: wall time by number of worker processes
+# -------------------------------
+# Usage: python benchmarks/bench_pack.py [--lines 300000 --accounts 40 --workers 1,2,4]
+# Renders the same pack -- the three statements and every account ledger, as
+# PDF -- with each worker count and prints the wall time, the time spent
+# rendering (summed over the workers) and the speed-up over one worker.  The
+# speed-up is bounded by the number of CPU cores and by the largest ledger,
+# which one worker has to render on its own.
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel report pack.")
+    parser.add_argument("--lines", type=int, default=300_000, help="ledger lines in the synthetic database")
+    parser.add_argument("--accounts", type=int, default=40)
+    parser.add_argument("--workers", default=None, help="comma-separated worker counts (default: 1,2,4,...,CPUs)")
+    parser.add_argument("--db", default="bench_pack.db")
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing --db instead of rebuilding it")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(n) for n in args.workers.split(",")]
+    else:
+        counts = sorted({1, cpus} | {n for n in (2, 4, 8, 16) if n < cpus})
+    if not (args.reuse and os.path.exists(args.db)):
+        synthetic.build(args.db, args.lines, accounts=args.accounts, schema_version=None)
+    url = f"sqlite:///{args.db}"
+    engine = make_engine(url, readonly=True)
+    with sessionmaker(bind=engine)() as session:
+        jobs = report_pack.plan_pack(session, report_pack.STATEMENTS, "all")
+    engine.dispose()
+
+    print(f"{len(jobs)} files, {sum(job.weight for job in jobs if job.kind == 'ledger'):,} ledger lines, {cpus} CPUs")
+    print(f"{'workers':>7} {'wall s':>8} {'render s':>9} {'speed-up':>9} {'MB':>7}")
+    base = None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for workers in counts:
+            manifest = report_pack.run_pack(url, jobs, os.path.join(tmpdir, f"pack-{workers}.zip"), workers=workers)
+            wall = manifest["wall_seconds"]
+            base = base or wall
+            size = sum(entry["bytes"] for entry in manifest["files"])
+            print(f"{manifest['workers']:>7} {wall:>8.2f} {manifest['cpu_seconds']:>9.2f} {base / wall:>8.2f}x "
+                  f"{size / 1e6:>7.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ledger import accounts, export
+from benchmarks import synthetic
+from benchmarks.run_all import busiest_account, ledger_walk
+
+# -------------------------------
+# Ledger PDF export: pages per second and peak memory
+# -------------------------------
+# Usage: python benchmarks/bench_pdf.py [--lines 600000 --accounts 20]
+# Exports the busiest account's ledger (about 500 pages with the defaults)
+# two ways:
+#   canvas  - the old way: every line read into a list, formatted as text and
+#             drawn with ReportLab's canvas, which keeps all pages until save()
+#   stream  - export.write_ledger_pdf: lines read page by page and streamed
+#             through ledger.pdf, one finished page at a time
+# Each is run once for time and once under tracemalloc for the peak memory
+# (tracemalloc slows Python down, so the two are measured separately).
+
+def canvas_pdf(report_text, file_path):
+    # The app's original PDF writer: one drawString per line of text.
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+
+    c = canvas.Canvas(file_path, pagesize=letter)
+    width, height = letter
+    y = height - 50
+    for line in report_text.splitlines():
+        c.drawString(50, y, line)
+        y -= 15
+        if y < 50:
+            c.showPage()
+            y = height - 50
+    c.save()
+
+def canvas_export(session, account_id, path):
+    rows = ledger_walk(session, account_id)
+    text_ = "".join("{:<10} {:<8} {:<12} {:<30} {:>12.2f} {:>12.2f} {:>14.2f}\n".format(
+        f"{r.date:%Y-%m-%d}", r.voucher_id, r.voucher_type[:12], r.description[:30], r.debit, r.credit, r.balance)
+        for r in rows)
+    canvas_pdf("LEDGER\n\n" + text_, path)
+    return {"rows": len(rows)}
+
+def stream_export(session, account_id, path):
+    return export.write_ledger_pdf(session, account_id, accounts.account_name(session, account_id), path)
+
+def page_count(path):
+    # Page objects in the file (both writers emit "/Type /Page" once per page).
+    with open(path, "rb") as f:
+        data = f.read()
+    return data.count(b"/Type /Page") - data.count(b"/Type /Pages")
+
+def measure(fn, session, account_id, path):
+    t0 = time.perf_counter()
+    result = fn(session, account_id, path)
+    seconds = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(session, account_id, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, page_count(path), result["rows"], os.path.getsize(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ledger PDF export.")
+    parser.add_argument("--lines", type=int, default=600_000, help="ledger lines in the synthetic database")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--db", default="bench_pdf.db")
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing --db instead of rebuilding it")
+    args = parser.parse_args()
+
+    if not (args.reuse and os.path.exists(args.db)):
+        synthetic.build(args.db, args.lines, accounts=args.accounts, schema_version=None)
+    engine = create_engine(f"sqlite:///{args.db}")
+    session = sessionmaker(bind=engine)()
+    account_id = busiest_account(session)
+    print(f"{'writer':<8} {'lines':>8} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'peak MB':>8} {'file MB':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for label, fn in (("canvas", canvas_export), ("stream", stream_export)):
+            seconds, peak, pages, rows, size = measure(fn, session, account_id, os.path.join(tmpdir, f"{label}.pdf"))
+            print(f"{label:<8} {rows:>8,} {pages:>6} {seconds:>8.2f} {pages / seconds:>8.0f} "
+                  f"{peak / 1e6:>8.1f} {size / 1e6:>8.1f}")
+    session.close()
+    engine.dispose()
+
+if __name__ == '__main__':
+    main()
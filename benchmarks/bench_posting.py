@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ledger.models import Account, JournalEntry, TransactionDetail, AuditLog
+from ledger.money import to_minor
+from ledger.posting import post_vouchers
+from benchmarks import synthetic
+
+# -------------------------------
+# Voucher posting throughput (vouchers per second)
+# -------------------------------
+# Usage: python benchmarks/bench_posting.py [--vouchers 20000]
+# Compares the posting engine at batch sizes 1, 100 and 10,000 against the
+# old submit_voucher sequence (commit header, get() per line, commit, commit audit).
+
+def make_vouchers(rnd, count, accounts):
+    vouchers = []
+    for i in range(count):
+        n = rnd.randint(2, 4)
+        amounts = [round(rnd.uniform(1, 5000), 2) for _ in range(n - 1)]
+        lines = [{"account_id": rnd.randint(1, accounts), "amount": a, "type": "debit"} for a in amounts]
+        lines.append({"account_id": rnd.randint(1, accounts), "amount": round(sum(amounts), 2), "type": "credit"})
+        vouchers.append({"voucher_type": "Journal", "description": f"Bench voucher {i}", "lines": lines})
+    return vouchers
+
+def legacy_post(session, voucher):
+    entry = JournalEntry(description=voucher["description"], voucher_type=voucher["voucher_type"])
+    session.add(entry)
+    session.commit()
+    for line in voucher["lines"]:
+        amount = to_minor(line["amount"])
+        session.add(TransactionDetail(journal_entry_id=entry.id, account_id=line["account_id"],
+                                      amount=amount, type=line["type"]))
+        acc = session.get(Account, line["account_id"])
+        acc.balance += amount if line["type"] == "debit" else -amount
+    session.commit()
+    session.add(AuditLog(action="Voucher Entry", details=f"Voucher ID {entry.id}"))
+    session.commit()
+
+def run(path, accounts, vouchers, batch_size):
+    synthetic.build(path, 0, accounts=accounts, schema_version=None)
+    engine = create_engine(f"sqlite:///{path}")
+    session = sessionmaker(bind=engine)()
+    t0 = time.perf_counter()
+    if batch_size is None:
+        for v in vouchers:
+            legacy_post(session, v)
+    else:
+        for i in range(0, len(vouchers), batch_size):
+            post_vouchers(session, vouchers[i:i + batch_size])
+    elapsed = time.perf_counter() - t0
+    session.close()
+    engine.dispose()
+    return len(vouchers) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark voucher posting throughput.")
+    parser.add_argument("--vouchers", type=int, default=20000, help="vouchers per batched run")
+    parser.add_argument("--single", type=int, default=2000, help="vouchers for the batch-size-1 and legacy runs")
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--db", default="bench_posting.db")
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    print(f"{'mode':<22} {'vouchers':>9} {'vouchers/s':>12}")
+    for label, batch_size, count in (("legacy submit_voucher", None, args.single),
+                                     ("engine batch=1", 1, args.single),
+                                     ("engine batch=100", 100, args.vouchers),
+                                     ("engine batch=10000", 10000, args.vouchers)):
+        vouchers = make_vouchers(rnd, count, args.accounts)
+        rate = run(args.db, args.accounts, vouchers, batch_size)
+        print(f"{label:<22} {count:>9,} {rate:>12,.0f}")
+    os.remove(args.db)
+
+if __name__ == '__main__':
+    main()
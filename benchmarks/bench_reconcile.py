@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger import reconcile
+from benchmarks import synthetic
+
+# -------------------------------
+# Balance reconciliation: lines per second by workers and chunk size
+# -------------------------------
+# Usage: python benchmarks/bench_reconcile.py [--lines 5000000 --workers 1,2,4 --chunks 250000,1000000]
+# Reconciles the same synthetic database with each combination and prints the
+# wall time, the rate and the time the rate implies for --target lines (50M by
+# default), so the numbers can be read against a large branch database.  The
+# synthetic balances are exact, so every run must report no discrepancies.
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the balance reconciliation scan.")
+    parser.add_argument("--lines", type=int, default=5_000_000, help="ledger lines in the synthetic database")
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--chunks", default=f"{reconcile.CHUNK_LINES},1000000", help="comma-separated chunk sizes")
+    parser.add_argument("--target", type=int, default=50_000_000, help="line count to extrapolate to")
+    parser.add_argument("--db", default="bench_reconcile.db")
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing --db instead of rebuilding it")
+    args = parser.parse_args()
+
+    if not (args.reuse and os.path.exists(args.db)):
+        synthetic.build(args.db, args.lines, accounts=args.accounts, schema_version=None)
+    url = f"sqlite:///{args.db}"
+
+    print(f"{os.cpu_count() or 1} CPUs")
+    print(f"{'workers':>7} {'chunk':>10} {'lines':>12} {'wall s':>8} {'lines/s':>12} "
+          f"{f'{args.target / 1e6:g}M est. s':>12} {'errors':>7}")
+    for workers in (int(n) for n in args.workers.split(",")):
+        for chunk in (int(n) for n in args.chunks.split(",")):
+            result = reconcile.reconcile(url, workers, chunk)
+            rate = result["lines"] / result["seconds"]
+            errors = len(result["discrepancies"]) + len(result["orphans"])
+            print(f"{workers:>7} {chunk:>10,} {result['lines']:>12,} {result['seconds']:>8.2f} {rate:>12,.0f} "
+                  f"{args.target / rate:>12.0f} {errors:>7}")
+
+if __name__ == '__main__':
+    main()
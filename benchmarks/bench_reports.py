@@ -0,0 +1,69 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from ledger import reports
+from ledger.balances import signed_amount_sql
+from benchmarks import synthetic
+
+# -------------------------------
+# Date-range financial statements on a large ledger
+# -------------------------------
+# Usage: python benchmarks/bench_reports.py --lines 10000000
+# Times a full-year income statement, trial balance and balance sheet, and the
+# same full-year P&L as one plain GROUP BY over the year's lines for reference.
+
+def full_scan_pnl(session, start, end):
+    return session.execute(text(f"""
+        SELECT td.account_id, SUM({signed_amount_sql()})
+        FROM journal_entries je JOIN transaction_details td ON td.journal_entry_id = je.id
+        WHERE je.date >= :start AND je.date < :end
+        GROUP BY td.account_id
+    """), {"start": f"{start:%Y-%m-%d} 00:00:00", "end": f"{end:%Y-%m-%d} 00:00:00"}).all()
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark date-range financial statements.")
+    parser.add_argument("--lines", type=int, default=10_000_000)
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--db", default="bench_reports.db")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing --db instead of rebuilding it")
+    args = parser.parse_args()
+
+    if not (args.reuse and os.path.exists(args.db)):
+        t0 = time.perf_counter()
+        stats = synthetic.build(args.db, args.lines, accounts=args.accounts, schema_version=None)
+        print(f"Built {args.db}: {stats['lines']:,} lines in {time.perf_counter() - t0:.1f}s")
+
+    session = sessionmaker(bind=create_engine(f"sqlite:///{args.db}"))()
+    year = date.today().year - 1
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    cases = [
+        (f"income statement {year}", lambda: reports.income_statement(session, start, end)),
+        (f"trial balance {year}", lambda: reports.trial_balance(session, start, end)),
+        (f"balance sheet {end}", lambda: reports.balance_sheet(session, end)),
+        ("balance sheet (live)", lambda: reports.balance_sheet(session)),
+        (f"full GROUP BY P&L {year}", lambda: full_scan_pnl(session, start, date(year + 1, 1, 1))),
+    ]
+    print(f"{'report':<28} {'median (ms)':>12}")
+    for label, fn in cases:
+        print(f"{label:<28} {timed(fn, args.repeat) * 1000:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ledger import search
+from benchmarks import synthetic
+
+# -------------------------------
+# Full-text search on a large ledger
+# -------------------------------
+# Usage: python benchmarks/bench_search.py --lines 3000000
+# Times the first page (and the match count) of a few voucher and audit log
+# searches through the FTS5 index, and the same searches as LIKE scans.
+
+QUERIES = [
+    ("vouchers", "vandelay", {}),
+    ("vouchers", "wonka freight", {}),
+    ("vouchers", "umbrella insur", {"voucher_type": "Payment"}),
+    ("vouchers", "acme", {"date_from": datetime(datetime.utcnow().year - 1, 1, 1),
+                          "date_to": datetime(datetime.utcnow().year - 1, 4, 1)}),
+    ("vouchers", "ref 123456", {}),
+    ("audit", "gringotts rent", {}),
+]
+
+def run(session, kind, text_, filters, fts, page_size):
+    fn = search.search_vouchers if kind == "vouchers" else search.search_audit_logs
+    source = fn(session, text_, fts=fts, **filters)
+    t0 = time.perf_counter()
+    rows = source.fetch(0, page_size)
+    page = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    total = source.count()
+    return page, time.perf_counter() - t0, len(rows), total
+
+def timed(session, kind, text_, filters, fts, page_size, repeat):
+    results = [run(session, kind, text_, filters, fts, page_size) for _ in range(repeat)]
+    return (statistics.median(r[0] for r in results), statistics.median(r[1] for r in results), results[0][3])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-text voucher and audit log search.")
+    parser.add_argument("--lines", type=int, default=3_000_000)
+    parser.add_argument("--db", default="bench_search.db")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing --db instead of rebuilding it")
+    args = parser.parse_args()
+
+    if not (args.reuse and os.path.exists(args.db)):
+        t0 = time.perf_counter()
+        stats = synthetic.build(args.db, args.lines, schema_version=None)
+        print(f"Built {args.db}: {stats['vouchers']:,} vouchers in {time.perf_counter() - t0:.1f}s")
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    print(f"{'search':<36} {'matches':>10} {'FTS page':>10} {'FTS count':>10} {'LIKE page':>10} {'LIKE count':>11}  (ms)")
+    for kind, text_, filters in QUERIES:
+        session = sessionmaker(bind=engine)()
+        fts = timed(session, kind, text_, filters, True, args.page_size, args.repeat)
+        like = timed(session, kind, text_, filters, False, args.page_size, 1)
+        label = f"{kind}: {text_}" + (" +filter" if filters else "")
+        print(f"{label:<36} {fts[2]:>10,} {fts[0] * 1000:>10.1f} {fts[1] * 1000:>10.1f} "
+              f"{like[0] * 1000:>10.1f} {like[1] * 1000:>11.1f}")
+        session.close()
+
+if __name__ == '__main__':
+    main()
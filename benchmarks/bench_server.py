@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic
+from benchmarks.bench_posting import make_vouchers
+
+# -------------------------------
+# HTTP API load test (concurrent voucher posting)
+# -------------------------------
+# Usage: python benchmarks/bench_server.py [--concurrency 1,16,64] [--duration 5]
+#        python benchmarks/bench_server.py --server http://127.0.0.1:8765
+# Without --server, builds a fresh database with --accounts accounts, starts
+# python -m ledger.server on a free port and stops it afterwards.  Each client
+# keeps one connection open and posts one voucher per request, back to back,
+# for --duration seconds.  Reports p50/p99 latency, vouchers per second, errors
+# and how many requests the writer committed per transaction.
+
+async def request(reader, writer, method, path, data=None):
+    body = json.dumps(data).encode() if data is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)) if length else None
+
+async def client(host, port, vouchers, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for voucher in vouchers:
+            if time.perf_counter() >= deadline:
+                break
+            started = time.perf_counter()
+            status, result = await request(reader, writer, "POST", "/vouchers", voucher)
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors.append(result.get("error") if result else status)
+    finally:
+        writer.close()
+
+async def level(host, port, concurrency, duration, accounts, seed):
+    rnd = random.Random(seed)
+    per_client = max(int(duration * 5000 / concurrency), 100)  # more than a client can post in time
+    latencies, errors = [], []
+    _, before = await stats(host, port)
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(client(host, port, make_vouchers(rnd, per_client, accounts), deadline, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    _, after = await stats(host, port)
+    batches = after["writer"]["batches"] - before["writer"]["batches"]
+    requests = after["writer"]["requests"] - before["writer"]["requests"]
+    return latencies, errors, elapsed, requests / batches if batches else 0.0
+
+async def stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return await request(reader, writer, "GET", "/stats")
+    finally:
+        writer.close()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(path, port):
+    process = subprocess.Popen([sys.executable, "-m", "ledger.server", "--url", f"sqlite:///{path}", "--port", str(port)],
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit("The server did not start.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test voucher posting through the HTTP API.")
+    parser.add_argument("--server", default=None, help="URL of a running server (default: start one)")
+    parser.add_argument("--concurrency", default="1,16,64", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per concurrency level")
+    parser.add_argument("--accounts", type=int, default=200)
+    args = parser.parse_args()
+
+    process = None
+    tmp = tempfile.TemporaryDirectory()
+    if args.server:
+        url = urlsplit(args.server)
+        host, port = url.hostname, url.port or 80
+    else:
+        path = os.path.join(tmp.name, "server.db")
+        synthetic.build(path, 0, accounts=args.accounts, schema_version=None)
+        host, port = "127.0.0.1", free_port()
+        process = start_server(path, port)
+    try:
+        print(f"{'clients':>7} {'vouchers':>9} {'vouchers/s':>11} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7} {'per commit':>11}")
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            latencies, errors, elapsed, per_commit = asyncio.run(
+                level(host, port, concurrency, args.duration, args.accounts, seed=concurrency))
+            ms = sorted(t * 1000 for t in latencies) or [0.0]
+            p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+            print(f"{concurrency:>7} {len(latencies):>9,} {len(latencies) / elapsed:>11,.0f} "
+                  f"{statistics.median(ms):>9.1f} {p99:>9.1f} {len(errors):>7} {per_commit:>11.1f}")
+            for error in sorted(set(map(str, errors)))[:5]:
+                print(f"        error: {error}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        tmp.cleanup()
+
+if __name__ == '__main__':
+    main()
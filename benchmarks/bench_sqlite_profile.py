@@ -0,0 +1,145 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from ledger import queries, reports
+from ledger.db import is_busy, make_engine, retry_on_busy
+from ledger.posting import post_vouchers
+from benchmarks import synthetic
+from benchmarks.bench_posting import make_vouchers
+
+# -------------------------------
+# SQLite engine profile: mixed read/write throughput
+# -------------------------------
+# Usage: python benchmarks/bench_sqlite_profile.py [--lines 200000 --readers 4 --writers 2 --duration 10]
+# Runs reader threads (a monthly trial balance or the first ledger page of a
+# random account, alternately) and writer threads (one voucher per
+# transaction) against the same database for --duration seconds, twice:
+#   default  - create_engine() as the app used to: rollback journal, the
+#              driver's 5 s lock timeout, reads and writes on one engine
+#   profile  - ledger.db.make_engine(): WAL and the other pragmas, writes
+#              retried on a busy database, reads on the read-only engine
+# Each run gets its own copy of the same synthetic database.  Prints
+# operations per second for readers and writers, p99 latencies and the
+# number of operations that failed with "database is locked".
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+def run(write_engine, read_engine, args, months, accounts):
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts, errors, latency = Counter(), Counter(), {"read": [], "write": []}
+    WriteSession, ReadSession = sessionmaker(bind=write_engine), sessionmaker(bind=read_engine)
+    write_retries = args.retry
+
+    def record(kind, started, error=None):
+        with lock:
+            if error is None:
+                counts[kind] += 1
+                latency[kind].append(time.perf_counter() - started)
+            else:
+                errors[kind, "locked" if is_busy(error) else type(error).__name__] += 1
+
+    def reader(seed):
+        rnd = random.Random(seed)
+        n = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                with ReadSession() as session:
+                    if n % 2:
+                        first, last = rnd.choice(months)
+                        reports.trial_balance(session, first, last)
+                    else:
+                        account_id = rnd.randint(1, accounts)
+                        queries.ledger_page(session, account_id, queries.first_cursor(session, account_id))
+                record("read", started)
+            except OperationalError as e:
+                record("read", started, e)
+            n += 1
+
+    def writer(seed):
+        rnd = random.Random(seed)
+        while not stop.is_set():
+            voucher = make_vouchers(rnd, 1, accounts)
+
+            def post():
+                with WriteSession() as session:
+                    try:
+                        post_vouchers(session, voucher)
+                    except BaseException:
+                        session.rollback()
+                        raise
+
+            started = time.perf_counter()
+            try:
+                retry_on_busy(post) if write_retries else post()
+                record("write", started)
+            except OperationalError as e:
+                record("write", started, e)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts, errors, latency
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite engine profile under mixed load.")
+    parser.add_argument("--lines", type=int, default=200_000, help="ledger lines in the synthetic database")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--db", default="bench_sqlite_profile.db")
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing --db instead of rebuilding it")
+    args = parser.parse_args()
+
+    if not (args.reuse and os.path.exists(args.db)):
+        synthetic.build(args.db, args.lines, accounts=args.accounts, schema_version=None)
+    year = date.today().year
+    months = [(date(y, m, 1), date(y + m // 12, m % 12 + 1, 1)) for y in (year - 1, year) for m in range(1, 13)]
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.duration:g} s per run")
+    print(f"{'engine':<8} {'reads/s':>8} {'writes/s':>9} {'read p99':>9} {'write p99':>10}  errors")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for label in ("default", "profile"):
+            path = os.path.join(tmpdir, f"{label}.db")
+            shutil.copyfile(args.db, path)
+            url = f"sqlite:///{path}"
+            if label == "default":
+                write_engine = read_engine = create_engine(url)
+                args.retry = False
+            else:
+                write_engine = make_engine(url)
+                read_engine = make_engine(url, readonly=True, pool_size=args.readers + 1)
+                args.retry = True
+            counts, errors, latency = run(write_engine, read_engine, args, months, args.accounts)
+            write_engine.dispose()
+            read_engine.dispose()
+            error_text = ", ".join(f"{kind} {error}: {n}" for (kind, error), n in sorted(errors.items())) or "none"
+            print(f"{label:<8} {counts['read'] / args.duration:>8.1f} {counts['write'] / args.duration:>9.1f} "
+                  f"{percentile(latency['read'], 0.99) * 1000:>7.0f}ms {percentile(latency['write'], 0.99) * 1000:>8.0f}ms"
+                  f"  {error_text}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from widgets import VirtualTreeview, ListSource
+
+# -------------------------------
+# Time-to-first-paint and memory: VirtualTreeview vs. a plain Treeview
+# -------------------------------
+# Usage: python benchmarks/bench_virtual_tree.py --rows 1000000 [--db audit.db]
+# Needs a display (run under xvfb-run on a headless machine).  With --db the
+# virtual tree reads the audit_logs table of that database instead of a list.
+
+COLUMNS = ("ID", "Timestamp", "Action", "Details")
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def first_paint(root, build):
+    frame = tk.Frame(root)
+    frame.pack(fill='both', expand=True)
+    before = rss_mb()
+    t0 = time.perf_counter()
+    build(frame)
+    root.update()
+    elapsed = time.perf_counter() - t0
+    used = rss_mb() - before
+    frame.destroy()
+    root.update()
+    return elapsed, used
+
+def plain_tree(rows):
+    def build(frame):
+        tree = ttk.Treeview(frame, columns=COLUMNS, show="headings")
+        for col in COLUMNS:
+            tree.heading(col, text=col)
+        tree.pack(fill='both', expand=True)
+        for row in rows:
+            tree.insert("", "end", values=row)
+    return build
+
+def virtual_tree(source):
+    def build(frame):
+        VirtualTreeview(frame, source, COLUMNS).pack(fill='both', expand=True)
+    return build
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VirtualTreeview against a plain ttk.Treeview.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--plain-rows", type=int, default=100_000,
+                        help="rows for the plain Treeview (1M takes minutes; 0 to skip)")
+    parser.add_argument("--db", default=None, help="read audit_logs from this SQLite database for the virtual tree")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"No display available ({e}); run under xvfb-run.")
+        return 1
+    root.geometry("1000x600")
+
+    rows = [(i, "2025-01-01 00:00:00", "Voucher Entry", f"Voucher ID {i} created") for i in range(args.rows)]
+    if args.db:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from ledger.queries import audit_source
+        source = audit_source(sessionmaker(bind=create_engine(f"sqlite:///{args.db}"))())
+        label = f"VirtualTreeview ({source.count():,} audit rows)"
+    else:
+        source = ListSource(rows)
+        label = f"VirtualTreeview ({args.rows:,} rows)"
+
+    print(f"{'widget':<40} {'first paint (ms)':>17} {'memory (MB)':>12}")
+    elapsed, used = first_paint(root, virtual_tree(source))
+    print(f"{label:<40} {elapsed * 1000:>17.1f} {used:>12.1f}")
+    if args.plain_rows:
+        elapsed, used = first_paint(root, plain_tree(rows[:args.plain_rows]))
+        print(f"{f'ttk.Treeview ({args.plain_rows:,} rows)':<40} {elapsed * 1000:>17.1f} {used:>12.1f}")
+    root.destroy()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
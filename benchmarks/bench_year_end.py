@@ -0,0 +1,99 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from ledger import queries, reports, yearend
+from ledger.db import make_engine
+from benchmarks import synthetic
+
+# -------------------------------
+# Year-end close: the live database before and after closing old years
+# -------------------------------
+# Usage: python benchmarks/bench_year_end.py --lines 3000000 [--years 3]
+# Builds a synthetic ledger spanning --years calendar years, copies it and
+# closes every year but the current one in the copy (ledger.yearend, timed),
+# then times the same screens on both:
+#   ledger page      first page of the busiest account from 1 January
+#   ledger count     the same account's line count over its whole history
+#   income statement this year and the oldest (archived) year
+#   balance sheet    live, and as of the end of the oldest year
+# and prints the size of the live database and of the archives.
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings)
+
+def size_mb(path):
+    return os.path.getsize(path) / 1e6
+
+def cases(session, account_id, this_year, oldest):
+    start = datetime(this_year, 1, 1)
+    return [
+        ("ledger page", lambda: queries.LedgerSource(session, account_id, start).fetch(0, queries.LEDGER_PAGE_SIZE)),
+        ("ledger count (all)", lambda: queries.LedgerSource(session, account_id).count()),
+        (f"income statement {this_year}", lambda: reports.income_statement(session, date(this_year, 1, 1), None)),
+        (f"income statement {oldest}",
+         lambda: reports.income_statement(session, date(oldest, 1, 1), date(oldest, 12, 31))),
+        ("balance sheet (live)", lambda: reports.balance_sheet(session)),
+        (f"balance sheet {oldest}-12-31", lambda: reports.balance_sheet(session, date(oldest, 12, 31))),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the live database before and after year-end closes.")
+    parser.add_argument("--lines", type=int, default=3_000_000)
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default="bench_year_end.db", help="open-books database; the closed copy gets -closed")
+    args = parser.parse_args()
+
+    this_year = date.today().year
+    oldest = this_year - args.years + 1
+    open_db = args.db
+    closed_db = f"{os.path.splitext(args.db)[0]}-closed.db"
+    archive_dir = f"{os.path.splitext(args.db)[0]}-archive"
+    synthetic.build(open_db, args.lines, accounts=args.accounts, years=args.years, schema_version=None)
+    shutil.copyfile(open_db, closed_db)
+    shutil.rmtree(archive_dir, ignore_errors=True)
+
+    engine = make_engine(f"sqlite:///{closed_db}")
+    for year in range(oldest, this_year):
+        result = yearend.close_year(engine, year, archive_dir=os.path.abspath(archive_dir),
+                                    vacuum=year == this_year - 1)
+        print(f"closed {year}: {result['lines']:,} lines archived; "
+              + ", ".join(f"{step} {seconds:.1f} s" for step, seconds in result["timings"].items()))
+    engine.dispose()
+
+    results = {}
+    for label, path in (("open", open_db), ("closed", closed_db)):
+        engine = make_engine(f"sqlite:///{path}", readonly=True)
+        with sessionmaker(bind=engine)() as session:
+            account_id = session.execute(text("SELECT account_id FROM transaction_details GROUP BY account_id "
+                                              "ORDER BY COUNT(*) DESC LIMIT 1")).scalar()
+            results[label] = {name: timed(fn, args.repeat)
+                              for name, fn in cases(session, account_id, this_year, oldest)}
+        engine.dispose()
+
+    archives = [os.path.join(archive_dir, name) for name in sorted(os.listdir(archive_dir))]
+    print(f"live database: {size_mb(open_db):,.0f} MB open, {size_mb(closed_db):,.0f} MB after closing; "
+          f"archives {', '.join(f'{size_mb(p):,.0f} MB' for p in archives)}")
+    print(f"{'':<28}{'open ms':>10}{'closed ms':>11}{'ratio':>8}")
+    for name in results["open"]:
+        o_ms, c_ms = results["open"][name], results["closed"][name]
+        print(f"{name:<28}{o_ms:>10.1f}{c_ms:>11.1f}{o_ms / c_ms:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
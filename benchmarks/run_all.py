@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from ledger import export, queries, report_model, reports
+from ledger.balances import signed_amount_sql
+from ledger.posting import post_vouchers
+from benchmarks import synthetic
+from benchmarks.bench_posting import make_vouchers
+
+# -------------------------------
+# Benchmark suite with machine-readable results
+# -------------------------------
+# Usage: python benchmarks/run_all.py --lines 1000000 --output results.json
+#        python benchmarks/run_all.py --db big.db --reuse --baseline results-main.json
+# Builds (or reuses) a synthetic database and times voucher posting, the
+# account ledger, the three statements, a sum of every line by account, the
+# audit log listing and PDF export.  benchmarks/bench_money.py compares the
+# line sums on float and on integer amounts.
+# Results go to --output as JSON (median / min / max milliseconds per case,
+# plus the commit, versions and data size), and a table is printed to stderr.
+# With --baseline, every case is compared with an earlier results file and the
+# exit status is 1 if any got slower by more than --threshold.
+#
+# Posting is timed on a separate, empty database with the same chart of
+# accounts, so reusing --db gives the same data every run.
+
+def timed(fn, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3),
+            "max_ms": round(max(timings), 3), "repeat": repeat}, result
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def busiest_account(session):
+    return session.execute(text("SELECT account_id FROM transaction_details GROUP BY account_id "
+                                "ORDER BY COUNT(*) DESC LIMIT 1")).scalar()
+
+def ledger_walk(session, account_id, max_lines=None):
+    # Every page of an account's ledger, as the ledger screen scrolls through it.
+    rows = []
+    cursor = queries.first_cursor(session, account_id)
+    while cursor is not None and (max_lines is None or len(rows) < max_lines):
+        page = queries.ledger_page(session, account_id, cursor)
+        rows.extend(page.rows)
+        cursor = page.cursor
+    return rows
+
+def cases(session, tmpdir, args):
+    year = date.today().year - 1
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    account_id = busiest_account(session)
+    audit = queries.audit_source(session)
+    audit_rows = audit.count()
+    pdf_path = os.path.join(tmpdir, "bench.pdf")
+    return [
+        ("ledger.first_page", lambda: queries.ledger_page(session, account_id,
+                                                          queries.first_cursor(session, account_id)).rows),
+        ("ledger.walk", lambda: ledger_walk(session, account_id)),
+        ("reports.trial_balance", lambda: reports.trial_balance(session, start, end)["lines"]),
+        ("reports.income_statement", lambda: reports.income_statement(session, start, end)["revenues"]),
+        ("reports.balance_sheet", lambda: reports.balance_sheet(session, end)["assets"]),
+        ("reports.balance_sheet_live", lambda: reports.balance_sheet(session)["assets"]),
+        ("lines.sum_by_account", lambda: session.execute(text(
+            f"SELECT td.account_id, SUM({signed_amount_sql()}) FROM transaction_details td "
+            "GROUP BY td.account_id")).all()),
+        ("audit.first_page", lambda: (audit.count(), audit.fetch(0, 100))[1]),
+        ("audit.middle_page", lambda: audit.fetch(audit_rows // 2, 100)),
+        ("pdf.trial_balance", lambda: export.write_report_pdf(
+            report_model.build_report(session, "trial_balance", start, end), pdf_path)),
+        ("pdf.ledger", lambda: export.write_ledger_pdf(session, account_id, "Bench", pdf_path)),
+    ]
+
+def posting_cases(session, accounts, args):
+    rnd = random.Random(7)
+    single = make_vouchers(rnd, args.post_single, accounts)
+    batch = make_vouchers(rnd, args.post_batch, accounts)
+
+    def one_by_one():
+        for voucher in single:
+            post_vouchers(session, [voucher])
+
+    def batched():
+        for i in range(0, len(batch), 1000):
+            post_vouchers(session, batch[i:i + 1000])
+
+    return [("posting.batch_1", one_by_one, len(single)), ("posting.batch_1000", batched, len(batch))]
+
+def compare(results, baseline, threshold):
+    # Cases slower than the baseline by more than `threshold` (a fraction).
+    regressions = []
+    print(f"\n{'case':<28} {'baseline':>10} {'now':>10} {'change':>8}", file=sys.stderr)
+    for name, now in results["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        change = now["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        flag = "  SLOWER" if change > threshold else ""
+        print(f"{name:<28} {before['median_ms']:>10.1f} {now['median_ms']:>10.1f} {change:>+8.0%}{flag}", file=sys.stderr)
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ledger benchmark suite.")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default="bench_suite.db")
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing --db instead of rebuilding it")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--post-single", type=int, default=500, help="vouchers posted one per transaction")
+    parser.add_argument("--post-batch", type=int, default=20_000, help="vouchers posted 1000 per transaction")
+    parser.add_argument("--output", default="-", help="JSON results file (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    results = {"meta": {"commit": git_commit(), "started": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(), "sqlalchemy": sqlalchemy.__version__,
+                        "sqlite": sqlite3.sqlite_version, "platform": platform.platform()},
+               "results": {}}
+    if not (args.reuse and os.path.exists(args.db)):
+        t0 = time.perf_counter()
+        built = synthetic.build(args.db, args.lines, accounts=args.accounts, seed=args.seed, schema_version=None,
+                                stock=args.stock)
+        results["meta"]["build"] = dict(built, seconds=round(time.perf_counter() - t0, 1))
+    with sqlite3.connect(args.db) as conn:
+        counts = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                  for t in ("accounts", "journal_entries", "transaction_details", "audit_logs", "stocks")}
+    results["meta"]["data"] = counts
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    session = sessionmaker(bind=engine)()
+    print(f"{'case':<28} {'median (ms)':>12} {'min':>10} {'max':>10} {'rows':>9}", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, fn in cases(session, tmpdir, args):
+            stats, result = timed(fn, args.repeat)
+            if isinstance(result, list):
+                stats["rows"] = len(result)
+            results["results"][name] = stats
+            print(f"{name:<28} {stats['median_ms']:>12.1f} {stats['min_ms']:>10.1f} {stats['max_ms']:>10.1f} "
+                  f"{stats.get('rows', ''):>9}", file=sys.stderr)
+    session.close()
+    engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "posting.db")
+        synthetic.build(path, 0, accounts=counts["accounts"], seed=args.seed, schema_version=None)
+        engine = create_engine(f"sqlite:///{path}")
+        session = sessionmaker(bind=engine)()
+        for name, fn, count in posting_cases(session, counts["accounts"], args):
+            stats, _ = timed(fn, 1)
+            stats["vouchers"] = count
+            stats["vouchers_per_s"] = round(count / stats["median_ms"] * 1000, 1)
+            results["results"][name] = stats
+            print(f"{name:<28} {stats['median_ms']:>12.1f} {'':>10} {'':>10} {count:>9}  "
+                  f"({stats['vouchers_per_s']:,.0f} vouchers/s)", file=sys.stderr)
+        session.close()
+        engine.dispose()
+
+    payload = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}.", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
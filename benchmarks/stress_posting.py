@@ -0,0 +1,167 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from ledger import accounts
+from ledger.balances import apply_period_deltas, period_deltas, signed_amount_sql
+from ledger.db import init_db, is_conflict, make_engine, retry_on_busy
+from ledger.models import Account, AuditLog, JournalEntry, TransactionDetail
+from ledger.money import to_units
+from ledger.posting import post_vouchers, validate_voucher
+
+# -------------------------------
+# Concurrent posting stress test: no lost balance updates
+# -------------------------------
+# Usage: python benchmarks/stress_posting.py [--vouchers 100000 --processes 8]
+#        python benchmarks/stress_posting.py --url postgresql+psycopg://... --mode orm
+# Starts --processes processes that post --vouchers vouchers between them, as
+# fast as they can, every one of them touching one of a few --hot accounts
+# (the "cash accounts" every terminal posts to).  Then checks, for every
+# account, that accounts.balance equals the sum of its transaction_details and
+# the last monthly closing balance; exits with status 1 if any differs.
+#
+#   --mode posting  ledger.posting (atomic balance = balance + delta updates)
+#   --mode orm      the old read-modify-write through Account objects, which
+#                   the accounts row version now turns into a retried
+#                   StaleDataError instead of a lost update
+#
+# Without --url, uses a new SQLite database in a temporary directory.  The
+# database at --url is expected to be empty (it gets its own accounts).
+
+def orm_post(session, voucher):
+    # How the legacy voucher screens posted: read each balance, add, write back.
+    voucher = validate_voucher(voucher)  # amounts in minor units
+    entry = JournalEntry(description=voucher["description"], voucher_type=voucher["voucher_type"],
+                         date=voucher["date"])
+    session.add(entry)
+    session.flush()
+    for line in voucher["lines"]:
+        session.add(TransactionDetail(journal_entry_id=entry.id, account_id=line["account_id"],
+                                      amount=line["amount"], type=line["type"]))
+        account = session.get(Account, line["account_id"])
+        account.balance += line["amount"] if line["type"] == "debit" else -line["amount"]
+    session.add(AuditLog(action="Voucher Entry", details=f"Voucher ID {entry.id} created"))
+    apply_period_deltas(session, period_deltas([voucher], entry.date))
+    session.commit()
+
+def make_voucher(rnd, hot, account_ids, start, n):
+    # One hot account against one or two others.
+    amount = round(rnd.uniform(1, 1000), 2)
+    others = rnd.sample(account_ids, rnd.randint(1, 2))
+    split = [round(amount / len(others), 2)] * len(others)
+    split[-1] = round(amount - sum(split[:-1]), 2)
+    hot_side, other_side = ("debit", "credit") if rnd.random() < 0.5 else ("credit", "debit")
+    lines = [{"account_id": rnd.choice(hot), "amount": amount, "type": hot_side}]
+    lines += [{"account_id": acc, "amount": part, "type": other_side} for acc, part in zip(others, split)]
+    return {"voucher_type": "Journal", "description": f"Stress voucher {n}",
+            "date": start + timedelta(days=rnd.randrange(365)), "lines": lines}
+
+def worker(url, mode, worker_id, count, batch, hot, account_ids, results):
+    engine = make_engine(url)
+    Session = sessionmaker(bind=engine)
+    rnd = random.Random(worker_id)
+    start = datetime(datetime.now().year, 1, 1)
+    retries = 0
+
+    def attempt(fn, *args):
+        def run():
+            nonlocal retries
+            with Session() as session:
+                try:
+                    return fn(session, *args)
+                except BaseException as e:
+                    session.rollback()
+                    if is_conflict(e):
+                        retries += 1
+                    raise
+        return retry_on_busy(run, attempts=50, delay=0.005)
+
+    posted = 0
+    while posted < count:
+        n = min(batch, count - posted)
+        vouchers = [make_voucher(rnd, hot, account_ids, start, f"{worker_id}-{posted + i}") for i in range(n)]
+        if mode == "orm":
+            for voucher in vouchers:
+                attempt(orm_post, voucher)
+        else:
+            attempt(post_vouchers, vouchers)
+        posted += n
+    engine.dispose()
+    results.put((worker_id, posted, retries))
+
+def check_balances(engine):
+    # [(account id, balance, sum of lines, last closing balance)] that disagree.
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT a.id, COALESCE(a.balance, 0),
+                   (SELECT COALESCE(SUM({signed_amount_sql()}), 0) FROM transaction_details td
+                    WHERE td.account_id = a.id),
+                   COALESCE((SELECT p.closing_balance FROM account_period_balances p
+                             WHERE p.account_id = a.id ORDER BY p.period DESC LIMIT 1), 0)
+            FROM accounts a ORDER BY a.id
+        """)).all()
+    # Minor units: any difference at all is a lost update.
+    return [row for row in rows if row[1] != row[2] or row[3] != row[2]]
+
+def main():
+    parser = argparse.ArgumentParser(description="Post vouchers from many processes and check the balances.")
+    parser.add_argument("--url", default=None, help="database URL (default: a new SQLite file)")
+    parser.add_argument("--vouchers", type=int, default=100_000)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=1, help="vouchers per transaction (posting mode)")
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--hot", type=int, default=3, help="hot accounts, one in every voucher")
+    parser.add_argument("--mode", choices=["posting", "orm"], default="posting")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url = args.url or f"sqlite:///{os.path.join(tmpdir, 'stress.db')}"
+        engine = make_engine(url)
+        init_db(engine)
+        with sessionmaker(bind=engine)() as session:
+            account_ids = [accounts.create_account(session, f"Stress {i + 1:04d}", "Asset")
+                           for i in range(args.accounts)]
+        hot = account_ids[:args.hot]
+
+        results = multiprocessing.Queue()
+        share, extra = divmod(args.vouchers, args.processes)
+        batch = 1 if args.mode == "orm" else args.batch
+        started = time.perf_counter()
+        processes = [multiprocessing.Process(target=worker, args=(url, args.mode, i, share + (i < extra), batch, hot,
+                                                                  account_ids, results))
+                     for i in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        outcomes = [results.get() for process in processes if not process.exitcode]
+        seconds = time.perf_counter() - started
+        failed = [p for p in processes if p.exitcode]
+
+        posted = sum(o[1] for o in outcomes)
+        retries = sum(o[2] for o in outcomes)
+        print(f"{posted:,} vouchers from {args.processes} processes in {seconds:.1f} s "
+              f"({posted / seconds:,.0f}/s, mode {args.mode}), {retries:,} conflicts retried")
+        mismatched = check_balances(engine)
+        engine.dispose()
+        for account_id, balance, lines, closing in mismatched[:20]:
+            print(f"  account {account_id}: balance {to_units(balance):,.2f}, lines {to_units(lines):,.2f}, "
+                  f"last closing {to_units(closing):,.2f}")
+        if mismatched or failed:
+            print(f"FAILED: {len(mismatched)} accounts out of balance, {len(failed)} processes failed")
+            return 1
+        print(f"OK: all {args.accounts} account balances equal the sum of their lines")
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+
+from ledger import migrations
+
+# -------------------------------
+# Synthetic ledger databases for benchmarks
+# -------------------------------
+# Usage: python benchmarks/synthetic.py big.db --lines 10000000 [--stock 5000]
+ACCOUNT_TYPES = ["Asset", "Liability", "Equity", "Revenue", "Expense", "Stock"]
+VOUCHER_TYPES = ["Journal", "Payment", "Receipt", "Contra", "Debit Note", "Credit Note"]
+# Description vocabulary, so full-text search has something realistic to match.
+PARTIES = [f"{a} {b}" for a in ("Acme", "Globex", "Initech", "Umbrella", "Stark", "Wayne", "Wonka", "Hooli",
+                                 "Cyberdyne", "Soylent", "Tyrell", "Aperture", "Vandelay", "Gringotts", "Monarch")
+           for b in ("Supplies", "Traders", "Logistics", "Foods", "Motors", "Textiles", "Pharma", "Holdings")]
+PURPOSES = ["invoice", "payment", "refund", "freight", "rent", "salary advance", "office supplies",
+            "maintenance", "consulting fees", "insurance premium", "utility bill", "discount settlement"]
+
+# Chart of accounts: name stems per account type.
+ACCOUNT_NAMES = {
+    "Asset": ["Cash", "Bank", "Receivable", "Deposit", "Prepaid", "Equipment"],
+    "Liability": ["Payable", "Loan", "Accrued", "Advance from"],
+    "Equity": ["Capital", "Drawings", "Reserve"],
+    "Revenue": ["Sales", "Service Income", "Commission", "Interest Income"],
+    "Expense": ["Purchases", "Rent", "Wages", "Freight", "Utilities", "Repairs"],
+    "Stock": ["Inventory", "Goods in Transit", "Raw Materials"],
+}
+PRODUCTS = ["Bolt", "Cable", "Valve", "Bearing", "Filter", "Gasket", "Panel", "Pump", "Sensor", "Switch"]
+LOGIN_EVERY = 200  # vouchers between synthetic "Login" audit rows
+
+def account_names(count, seed=42):
+    # Deterministic, unique names: "<stem> <party> <id>", type cycling through ACCOUNT_TYPES.
+    rnd = random.Random(seed + 2)
+    chart = []
+    for i in range(1, count + 1):
+        acc_type = ACCOUNT_TYPES[i % len(ACCOUNT_TYPES)]
+        chart.append((i, f"{rnd.choice(ACCOUNT_NAMES[acc_type])} {rnd.choice(PARTIES)} {i:05d}", acc_type))
+    return chart
+
+def stock_items(count, seed=42):
+    rnd = random.Random(seed + 3)
+    items = []
+    for i in range(1, count + 1):
+        cost = round(rnd.uniform(0.5, 500), 2)
+        items.append((i, f"{rnd.choice(PRODUCTS)} {rnd.choice('ABCDEFGH')}{i:05d}", rnd.randint(0, 5000),
+                      cost, round(cost * rnd.uniform(1.05, 1.8), 2), f"Supplier: {rnd.choice(PARTIES)}"))
+    return items
+
+def build(path, lines, accounts=500, years=3, seed=42, schema_version=1, batch=50000, stock=0,
+          start_year=None, progress=None):
+    # Create a fresh SQLite database at path holding roughly `lines`
+    # transaction_details rows in balanced 2-4 line vouchers spread over
+    # `years` years, `accounts` accounts, `stock` stock items and an audit
+    # trail (account and stock creation, logins, one row per voucher).  The
+    # same arguments always give the same data; start_year defaults to
+    # `years` - 1 years before the current one, so pass it explicitly when
+    # databases built in different years must match.  Rows are loaded into
+    # the baseline schema and the later migrations (indexes, monthly balances,
+    # full-text indexes) are then applied up to schema_version (None: latest),
+    # which is much faster than maintaining them row by row.
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine, 1)
+
+    rnd = random.Random(seed)
+    words = random.Random(seed + 1)  # separate stream: descriptions don't change the amounts
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    if start_year is None:
+        start_year = datetime.utcnow().year - years + 1
+    start = datetime(start_year, 1, 1)
+    chart = account_names(accounts, seed)
+    items = stock_items(stock, seed)
+    conn.executemany("INSERT INTO accounts (id, name, type, balance) VALUES (?, ?, ?, 0.0)", chart)
+    conn.executemany("INSERT INTO stocks (id, product_name, quantity, purchase_price, selling_price, details) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", items)
+
+    setup = f"{start - timedelta(days=1):%Y-%m-%d %H:%M:%S.%f}"
+    audits = [(None, setup, "Account Created", f"Account '{name}' of type '{acc_type}' created.") for _, name, acc_type in chart]
+    audits += [(None, setup, "Stock Entry", f"New stock item '{name}' added with quantity {qty}.")
+               for _, name, qty, _, _, _ in items]
+    audit_id = 0
+    for i, row in enumerate(audits):
+        audit_id += 1
+        audits[i] = (audit_id,) + row[1:]
+
+    span = years * 365 * 86400
+    balances = [0.0] * (accounts + 1)
+    entries, details = [], []
+    entry_id = detail_id = 0
+    while detail_id < lines:
+        entry_id += 1
+        when = (start + timedelta(seconds=span * entry_id / max(lines // 3, 1))).strftime("%Y-%m-%d %H:%M:%S.%f")
+        vtype = VOUCHER_TYPES[entry_id % len(VOUCHER_TYPES)]
+        description = f"{words.choice(PURPOSES).capitalize()} {words.choice(PARTIES)} ref {entry_id}"
+        entries.append((entry_id, when, description, vtype))
+        n = rnd.randint(2, 4)
+        amounts = [round(rnd.uniform(1, 5000), 2) for _ in range(n - 1)]
+        legs = [(a, "debit") for a in amounts] + [(round(sum(amounts), 2), "credit")]
+        for amount, kind in legs:
+            detail_id += 1
+            acc = rnd.randint(1, accounts)
+            details.append((detail_id, entry_id, acc, amount, kind))
+            balances[acc] += amount if kind == "debit" else -amount
+        if entry_id % LOGIN_EVERY == 1:
+            audit_id += 1
+            audits.append((audit_id, when, "Login", f"User 'clerk{entry_id // LOGIN_EVERY % 10}' logged in."))
+        audit_id += 1
+        audits.append((audit_id, when, "Voucher Entry", f"Voucher ID {entry_id} ({vtype}) created: {description}"))
+        if len(details) >= batch:
+            _flush(conn, entries, details, audits)
+            if progress:
+                progress(detail_id, lines)
+    _flush(conn, entries, details, audits)
+    conn.executemany("UPDATE accounts SET balance = ? WHERE id = ?",
+                     [(round(balances[i], 2), i) for i in range(1, accounts + 1)])
+    conn.commit()
+    conn.close()
+    if schema_version is None or schema_version > 1:
+        migrations.upgrade(engine, schema_version)
+    engine.dispose()
+    return {"accounts": accounts, "vouchers": entry_id, "lines": detail_id, "stock": stock,
+            "audit_logs": audit_id, "start_year": start_year, "seed": seed}
+
+def _flush(conn, entries, details, audits):
+    conn.executemany("INSERT INTO journal_entries (id, date, description, voucher_type) VALUES (?, ?, ?, ?)", entries)
+    conn.executemany("INSERT INTO transaction_details (id, journal_entry_id, account_id, amount, type) VALUES (?, ?, ?, ?, ?)", details)
+    conn.executemany("INSERT INTO audit_logs (id, timestamp, action, details) VALUES (?, ?, ?, ?)", audits)
+    conn.commit()
+    entries.clear()
+    details.clear()
+    audits.clear()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a synthetic ledger database.")
+    parser.add_argument("db")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="transaction lines (10k to 50M)")
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=1000, help="stock items")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--start-year", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--schema-version", type=int, default=None, help="default: latest")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+
+    def progress(done, total):
+        print(f"\r{done:,} / {total:,} lines", end="", file=sys.stderr)
+
+    stats = build(args.db, args.lines, accounts=args.accounts, years=args.years, seed=args.seed,
+                  schema_version=args.schema_version, stock=args.stock, start_year=args.start_year, progress=progress)
+    print(file=sys.stderr)
+    print(f"Built {args.db} in {time.perf_counter() - t0:.1f}s: {stats['lines']:,} lines in {stats['vouchers']:,} vouchers, "
+          f"{stats['accounts']:,} accounts, {stats['stock']:,} stock items, {stats['audit_logs']:,} audit rows "
+          f"from {stats['start_year']} (seed {stats['seed']})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+# Headless ledger core: database models, schema migrations and the
+# bookkeeping operations shared by the Tk app and the command-line tools.
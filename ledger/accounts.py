@@ -0,0 +1,89 @@
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from ledger import fiscal
+from ledger.cache import account_cache
+from ledger.models import Account, AuditLog
+from ledger.money import to_units
+
+# -------------------------------
+# Chart of Accounts
+# -------------------------------
+# Creating and deleting accounts.  The audit row is written in the same
+# transaction as the change, and the shared account cache is patched once the
+# change is committed.
+
+ACCOUNT_TYPES = ["Asset", "Liability", "Equity", "Revenue", "Expense", "Stock"]
+NAME_LENGTH = Account.__table__.c.name.type.length
+
+class AccountError(ValueError):
+    pass
+
+class AccountInUse(AccountError):
+    # The account has ledger lines and is kept.
+    pass
+
+def create_account(session, name, acc_type, commit=True):
+    name, acc_type = (name or "").strip(), (acc_type or "").strip()
+    if not name or not acc_type:
+        raise AccountError("Please provide both name and type.")
+    if len(name) > NAME_LENGTH:
+        raise AccountError(f"The account name is too long (at most {NAME_LENGTH} characters).")
+    account = Account(name=name, type=acc_type)
+    session.add(account)
+    session.flush()
+    session.add(AuditLog(action="Account Created", details=f"Account '{name}' of type '{acc_type}' created."))
+    if commit:
+        session.commit()
+        account_cache(session.get_bind()).added(account.id, name, acc_type)
+    return account.id
+
+def has_lines(session, account_id):
+    # Live lines first, then every closed year's archive: a Revenue or Expense
+    # account has no live lines after a close, but its history is archived.
+    def found(prefix):
+        return session.execute(text(f"SELECT 1 FROM {prefix}transaction_details WHERE account_id = :id LIMIT 1"),
+                               {"id": account_id}).first() is not None
+
+    if found(""):
+        return True
+    return any(found(f"{fiscal.attach(session, fy)}.") for fy in fiscal.closed_years(session))
+
+def delete_account(session, account_id, commit=True):
+    # Accounts with ledger lines, live or in a closed year, are kept: deleting
+    # them would orphan the lines and unbalance every statement (the foreign
+    # key refuses it too, but only for the live tables).
+    account = session.get(Account, account_id)
+    if account is None:
+        raise AccountError("Account not found.")
+    try:
+        in_use = has_lines(session, account_id)
+    except fiscal.FiscalError as e:
+        raise AccountInUse(f"Account '{account.name}' cannot be deleted: {e}") from None
+    if in_use:
+        raise AccountInUse(f"Account '{account.name}' has ledger lines and cannot be deleted.")
+    name = account.name
+    session.delete(account)
+    try:
+        session.flush()
+    except IntegrityError:
+        # A line was posted to it after the check above.
+        if commit:
+            session.rollback()
+        raise AccountInUse(f"Account '{name}' has ledger lines and cannot be deleted.") from None
+    session.add(AuditLog(action="Account Deleted", details=f"Account '{name}' (ID {account_id}) deleted."))
+    if commit:
+        session.commit()
+        account_cache(session.get_bind()).removed(account_id)
+    return name
+
+def list_accounts(session):
+    # [(id, name, type, balance in units)] in id order.
+    return [(account_id, name, acc_type, to_units(balance)) for account_id, name, acc_type, balance in
+            session.execute(text("SELECT id, name, type, balance FROM accounts ORDER BY id"))]
+
+def account_name(session, account_id):
+    name = session.execute(text("SELECT name FROM accounts WHERE id = :id"), {"id": account_id}).scalar()
+    if name is None:
+        raise AccountError("Account not found.")
+    return name
@@ -0,0 +1,346 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from ledger.balances import month_start
+from ledger.db import DATABASE_URL, init_db, make_engine
+from ledger.models import AuditLog
+from ledger.queries import audit_source
+
+# -------------------------------
+# Audit Log Archival
+# -------------------------------
+# Audit rows older than the retention period are moved out of `audit_logs` into
+# one gzip-compressed JSONL file per calendar month:
+#     audit_archive/audit-2023-04.jsonl.gz
+# Only whole months are archived, so the hot table always holds everything from
+# the archive boundary (the first day after the newest archived month) onwards.
+# A partition file is written to a temporary name, fsynced and renamed before
+# the rows are deleted from the database; re-running after a crash merges the
+# file with whatever is still in the table, so nothing is lost or duplicated.
+# Records are matched on all their fields rather than the id alone: SQLite hands
+# out max(id) + 1, so an id can come back once the newest rows are archived.
+#
+# archive_due() runs archive_audit_logs() at most once per `every_days`, using
+# a stamp file in the archive directory; the app calls it in the background at
+# start-up.  audit_history_source() lets the audit screen page through hot and
+# archived rows as one list.  counts.json in the archive directory holds the
+# row count of every partition, so the list's length is known without
+# decompressing anything; a partition is only read when a page reaches it.
+
+ARCHIVE_DIR = "audit_archive"
+RETENTION_DAYS = 365
+ARCHIVE_EVERY_DAYS = 1
+STAMP_FILE = ".last_run"
+COUNTS_FILE = "counts.json"
+
+_partition_re = re.compile(r"^audit-(\d{4})-(\d{2})\.jsonl\.gz$")
+
+def next_month(value):
+    return (value.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+def archive_cutoff(now=None, retention_days=RETENTION_DAYS):
+    # Rows strictly before this (a month start) are eligible for archiving.
+    return month_start((now or datetime.utcnow()) - timedelta(days=retention_days))
+
+def partition_path(archive_dir, month):
+    return os.path.join(archive_dir, f"audit-{month:%Y-%m}.jsonl.gz")
+
+def partitions(archive_dir=ARCHIVE_DIR):
+    # [(month start, path)] of the archived months, oldest first.
+    if not os.path.isdir(archive_dir):
+        return []
+    found = []
+    for name in os.listdir(archive_dir):
+        m = _partition_re.match(name)
+        if m:
+            found.append((datetime(int(m.group(1)), int(m.group(2)), 1), os.path.join(archive_dir, name)))
+    return sorted(found)
+
+def archive_boundary(archive_dir=ARCHIVE_DIR):
+    found = partitions(archive_dir)
+    return next_month(found[-1][0]) if found else None
+
+def _to_record(row):
+    return {"id": row.id, "timestamp": row.timestamp.isoformat(" ") if row.timestamp else None,
+            "action": row.action, "details": row.details}
+
+def _record_key(record):
+    return (record["id"], record["timestamp"], record["action"], record["details"])
+
+def read_partition(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["timestamp"]:
+                record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+            yield record
+
+def _load_counts(archive_dir):
+    # {partition file name: {"rows": n, "bytes": file size}}
+    try:
+        with open(os.path.join(archive_dir, COUNTS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_counts(archive_dir, counts):
+    path = os.path.join(archive_dir, COUNTS_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(counts, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def partition_count(path, counts=None):
+    # Rows in a partition: from counts.json while it matches the file's size,
+    # otherwise (an older archive, a crash before the counts were saved)
+    # counted once and remembered.
+    archive_dir, name = os.path.split(path)
+    counts = _load_counts(archive_dir) if counts is None else counts
+    size = os.path.getsize(path)
+    entry = counts.get(name)
+    if entry and entry["bytes"] == size:
+        return entry["rows"]
+    rows = sum(1 for _ in read_partition(path))
+    counts[name] = {"rows": rows, "bytes": size}
+    try:
+        _save_counts(archive_dir, counts)
+    except OSError:
+        pass
+    return rows
+
+def _write_partition(path, records):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            for record in records:
+                f.write((json.dumps(record) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(path) or ".", os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def _archive_month(engine, archive_dir, month):
+    table = AuditLog.__table__
+    start, end = month, next_month(month)
+    in_month = (table.c.timestamp >= start) & (table.c.timestamp < end)
+    with engine.connect() as conn:
+        rows = conn.execute(select(table).where(in_month).order_by(table.c.id)).all()
+    if not rows:
+        return 0
+    path = partition_path(archive_dir, month)
+    records = []
+    if os.path.exists(path):
+        records = [dict(r, timestamp=r["timestamp"].isoformat(" ") if r["timestamp"] else None)
+                   for r in read_partition(path)]
+    seen = {_record_key(r) for r in records}
+    records += [r for r in map(_to_record, rows) if _record_key(r) not in seen]
+    _write_partition(path, records)
+    counts = _load_counts(archive_dir)
+    counts[os.path.basename(path)] = {"rows": len(records), "bytes": os.path.getsize(path)}
+    _save_counts(archive_dir, counts)
+    # Only now that the partition is on disk, drop the rows that went into it.
+    # New rows always get a higher id, so id <= max_id matches exactly the rows read above.
+    max_id = rows[-1].id
+    with engine.begin() as conn:
+        conn.execute(delete(table).where(in_month & (table.c.id <= max_id)))
+    return len(rows)
+
+def archive_audit_logs(engine, archive_dir=ARCHIVE_DIR, retention_days=RETENTION_DAYS, now=None, vacuum=False):
+    # Moves every whole month older than the retention period to the archive.
+    # Returns {month start: rows archived}.
+    cutoff = archive_cutoff(now, retention_days)
+    table = AuditLog.__table__
+    with engine.connect() as conn:
+        oldest = conn.execute(select(func.min(table.c.timestamp)).where(table.c.timestamp < cutoff)).scalar()
+    archived = {}
+    if oldest is None:
+        return archived
+    os.makedirs(archive_dir, exist_ok=True)
+    month = month_start(oldest)
+    while month < cutoff:
+        count = _archive_month(engine, archive_dir, month)
+        if count:
+            archived[month] = count
+        month = next_month(month)
+    if vacuum and archived and engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+    return archived
+
+def archive_due(engine, archive_dir=ARCHIVE_DIR, retention_days=RETENTION_DAYS, every_days=ARCHIVE_EVERY_DAYS):
+    # Runs the archiver if it has not run in the last `every_days` days.
+    stamp = os.path.join(archive_dir, STAMP_FILE)
+    if os.path.exists(stamp) and time.time() - os.path.getmtime(stamp) < every_days * 86400:
+        return None
+    archived = archive_audit_logs(engine, archive_dir, retention_days)
+    os.makedirs(archive_dir, exist_ok=True)
+    with open(stamp, "w") as f:
+        f.write(datetime.utcnow().isoformat(" ") + "\n")
+    return archived
+
+# -------------------------------
+# Reading hot and archived rows together
+# -------------------------------
+def old_audit_rows(session, date_from=None, date_to=None, archive_dir=ARCHIVE_DIR):
+    # ArchivedRows for the range from before the archive boundary, or None when
+    # the range doesn't reach back into the archive.
+    boundary = archive_boundary(archive_dir)
+    if boundary is None or (date_from is not None and date_from >= boundary):
+        return None
+    # Old rows still in the table: normally none, only after an interrupted
+    # archive run (and then usually also in the partition).
+    unarchived = {}
+    old_hot = audit_source(session, *_range_sql(date_from, min(date_to, boundary) if date_to else boundary))
+    for id_, timestamp, action, details in old_hot.fetch(0, old_hot.count()):
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        unarchived.setdefault(month_start(timestamp), []).append((id_, timestamp, action, details))
+    paths = {month: path for month, path in partitions(archive_dir)
+             if not ((date_to and month >= date_to) or (date_from and next_month(month) <= date_from))}
+    return ArchivedRows(paths, unarchived, date_from, date_to, _load_counts(archive_dir))
+
+def _month_rows(path, unarchived, date_from, date_to):
+    rows = set(unarchived)
+    if path is not None:
+        for r in read_partition(path):
+            if (date_from is None or r["timestamp"] >= date_from) and (date_to is None or r["timestamp"] < date_to):
+                rows.add(_record_key(r))
+    return sorted(rows, key=lambda r: (r[1] or datetime.min, r[0]), reverse=True)
+
+class ArchivedRows:
+    # The archived rows in range, newest first, one month per partition.  A
+    # whole month's length comes from counts.json and its partition is only
+    # decompressed when rows(...) reaches it, keeping the last few in memory.
+    # The months cut by date_from / date_to, or with rows still in the table,
+    # are read up front: their length is only known once they are filtered.
+    CACHED_MONTHS = 2
+
+    def __init__(self, paths, unarchived, date_from, date_to, counts):
+        self.date_from, self.date_to = date_from, date_to
+        self.months = []  # [month, path, row count, rows or None], newest first
+        self.cache = {}
+        for month in sorted(set(paths) | set(unarchived), reverse=True):
+            path = paths.get(month)
+            whole = ((date_from is None or month >= date_from) and (date_to is None or next_month(month) <= date_to))
+            if path is not None and whole and month not in unarchived:
+                self.months.append([month, path, partition_count(path, counts), None])
+            else:
+                rows = _month_rows(path, unarchived.get(month, ()), date_from, date_to)
+                self.months.append([month, path, len(rows), rows])
+
+    def __len__(self):
+        return sum(m[2] for m in self.months)
+
+    def _rows_of(self, month, path):
+        if month not in self.cache:
+            if len(self.cache) >= self.CACHED_MONTHS:
+                self.cache.pop(next(iter(self.cache)))
+            self.cache[month] = _month_rows(path, (), self.date_from, self.date_to)
+        return self.cache[month]
+
+    def rows(self, offset, limit):
+        result = []
+        for month, path, count, rows in self.months:
+            if len(result) >= limit:
+                break
+            if offset >= count:
+                offset -= count
+                continue
+            if rows is None:
+                rows = self._rows_of(month, path)
+            result += rows[offset:offset + limit - len(result)]
+            offset = 0
+        return result
+
+class AuditHistorySource:
+    # Audit rows between date_from (inclusive) and date_to (exclusive), newest
+    # first, as one list.  Rows from the archive boundary on come straight from
+    # the table, a page at a time; the older ones from ArchivedRows, a month
+    # at a time.  Raw rows are (id, timestamp, action, details), like audit_source().
+    def __init__(self, session, date_from=None, date_to=None, archive_dir=ARCHIVE_DIR, old=None):
+        self.boundary = archive_boundary(archive_dir)
+        where, params = _range_sql(max(date_from, self.boundary) if date_from else self.boundary, date_to)
+        self.hot = audit_source(session, where, params)
+        self.old = old if old is not None else old_audit_rows(session, date_from, date_to, archive_dir) or []
+        self.hot_count = self.hot.count()
+        self.old_count = len(self.old)
+
+    def sortable(self, column):
+        return False
+
+    def count(self):
+        return self.hot_count + self.old_count
+
+    def fetch(self, offset, limit, sort=None, descending=None, after=None):
+        rows = []
+        if offset < self.hot_count:
+            rows = self.hot.fetch(offset, min(limit, self.hot_count - offset), after=after)
+        if len(rows) < limit and self.old_count:
+            rows += self.old.rows(max(0, offset - self.hot_count), limit - len(rows))
+        return rows
+
+    def format_row(self, row):
+        return self.hot.format_row(row)
+
+def _range_sql(date_from, date_to):
+    conditions, params = [], {}
+    if date_from is not None:
+        conditions.append("timestamp >= :date_from")
+        params["date_from"] = f"{date_from:%Y-%m-%d %H:%M:%S}"
+    if date_to is not None:
+        conditions.append("timestamp < :date_to")
+        params["date_to"] = f"{date_to:%Y-%m-%d %H:%M:%S}"
+    return " AND ".join(conditions) or None, params
+
+def audit_history_source(session, date_from=None, date_to=None, archive_dir=ARCHIVE_DIR, old=None):
+    # The plain, sortable table source when the range does not reach into the
+    # archive; otherwise the merged history.  `old` is old_audit_rows() when
+    # the caller has already read them (e.g. on a background thread).
+    if old is None:
+        old = old_audit_rows(session, date_from, date_to, archive_dir)
+    if old is None:
+        return audit_source(session, *_range_sql(date_from, date_to))
+    return AuditHistorySource(session, date_from, date_to, archive_dir, old)
+
+# -------------------------------
+# Command line: python -m ledger.archive run|list
+# -------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ledger.archive", description="Archive old audit log rows.")
+    parser.add_argument("--url", default=DATABASE_URL, help="SQLAlchemy database URL")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="archive directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="move rows older than the retention period to the archive")
+    run.add_argument("--days", type=int, default=RETENTION_DAYS, help="retention period in days")
+    run.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards (SQLite)")
+    sub.add_parser("list", help="list archived partitions")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for month, path in partitions(args.dir):
+            rows = partition_count(path)
+            print(f"{month:%Y-%m}  {rows:>10,} rows  {os.path.getsize(path):>12,} bytes  {path}")
+        return 0
+
+    engine = make_engine(args.url)
+    init_db(engine)
+    archived = archive_audit_logs(engine, args.dir, args.days, vacuum=args.vacuum)
+    for month, count in archived.items():
+        print(f"{month:%Y-%m}: archived {count:,} rows")
+    print(f"Archived {sum(archived.values()):,} rows older than {archive_cutoff(retention_days=args.days):%Y-%m-%d}.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from ledger.models import AuditLog
+
+# -------------------------------
+# Asynchronous Audit Log Writer
+# -------------------------------
+# log() timestamps a record and puts it on a bounded queue; a background thread
+# drains the queue and inserts records in batches, one commit per batch, when
+# either `batch_size` records are waiting or `interval` seconds have passed
+# since the first one arrived.  A full queue blocks the caller (back-pressure)
+# rather than dropping records.
+#
+# Ordering and durability: there is a single writer thread and the queue is
+# FIFO, so records reach the table in the order they were logged.  Callers log
+# *after* committing the change they describe, so an audit row never refers to
+# work that was rolled back.  checkpoint() blocks until everything logged so
+# far is committed, and close() (registered with atexit by the app) drains the
+# queue before the process exits.  Vouchers and bulk imports still write their
+# audit rows inside the posting transaction (see ledger.posting).
+#
+# If the database still refuses the last batch at shutdown after
+# SHUTDOWN_RETRIES attempts, the records are appended to `spill_path` (JSONL)
+# and the next writer started on that file inserts them before anything else.
+
+SPILL_PATH = "audit_unwritten.jsonl"
+SHUTDOWN_RETRIES = 3
+
+class AuditWriter:
+    def __init__(self, engine, max_queue=10000, batch_size=500, interval=0.5, spill_path=SPILL_PATH):
+        self.engine = engine
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        # `lock` orders log() / checkpoint() against close(), so nothing is
+        # queued behind the shutdown marker; `counters_lock` guards counters.
+        self.lock = threading.Lock()
+        self.counters_lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        self.counters = {"logged": 0, "written": 0, "batches": 0, "errors": 0,
+                         "max_queue_depth": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0}
+
+    # --- producer side ---
+    def start(self):
+        with self.lock:
+            self._start()
+
+    def _start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self.thread.start()
+
+    def log(self, action, details):
+        record = {"timestamp": datetime.utcnow(), "action": action, "details": details}
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Audit writer is closed.")
+            self._start()
+            self.queue.put(record)
+            with self.counters_lock:
+                self.counters["logged"] += 1
+                self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], self.queue.qsize())
+
+    def checkpoint(self, timeout=None):
+        # Wait until every record logged before this call has been committed.
+        done = threading.Event()
+        with self.lock:
+            if self.thread is None or self.closed:
+                return True
+            self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            thread = self.thread
+            if thread is not None:
+                self.queue.put(None)
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        with self.counters_lock:
+            stats = dict(self.counters)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    # --- writer thread ---
+    def _run(self):
+        self._replay_spill()
+        pending, waiters = [], []
+        stop = False
+        shutdown_tries = 0
+        deadline = None
+        while True:
+            # Collect a batch: stop at the size limit, the time limit, or a
+            # checkpoint / shutdown marker.
+            while not stop and not waiters and len(pending) < self.batch_size:
+                try:
+                    timeout = max(0.0, deadline - time.monotonic()) if pending else None
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    if not pending:
+                        deadline = time.monotonic() + self.interval
+                    pending.append(item)
+            if pending:
+                if self._flush(pending):
+                    pending = []
+                elif not stop or shutdown_tries < SHUTDOWN_RETRIES:
+                    # Database busy or failing: keep the batch and retry it.
+                    if stop:
+                        shutdown_tries += 1
+                    time.sleep(self.interval)
+                    deadline = time.monotonic()
+                    continue
+            if stop:
+                if pending:
+                    self._spill(pending)
+                for event in waiters:
+                    event.set()
+                return
+            for event in waiters:
+                event.set()
+            waiters = []
+
+    def _spill(self, records):
+        try:
+            if not self.spill_path:
+                raise OSError("no spill file")
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for r in records:
+                    f.write(json.dumps(dict(r, timestamp=r["timestamp"].isoformat())) + "\n")
+        except OSError as e:
+            print(f"Audit writer: {len(records)} record(s) could not be written or saved: {e}", file=sys.stderr)
+            return
+        print(f"Audit writer: {len(records)} record(s) could not be written; saved to {self.spill_path} "
+              f"and written on the next start.", file=sys.stderr)
+
+    def _replay_spill(self):
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        with open(self.spill_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        for r in records:
+            r["timestamp"] = datetime.fromisoformat(r["timestamp"])
+        if not records or self._flush(records):
+            os.remove(self.spill_path)
+
+    def _flush(self, records):
+        t0 = time.perf_counter()
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(AuditLog), records)
+        except Exception as e:
+            with self.counters_lock:
+                self.counters["errors"] += 1
+            print(f"Audit writer: flush failed ({str(e).splitlines()[0]}); will retry.", file=sys.stderr)
+            return False
+        elapsed = (time.perf_counter() - t0) * 1000
+        with self.counters_lock:
+            c = self.counters
+            c["written"] += len(records)
+            c["batches"] += 1
+            c["last_flush_ms"] = elapsed
+            c["max_flush_ms"] = max(c["max_flush_ms"], elapsed)
+            c["total_flush_ms"] += elapsed
+        return True
@@ -0,0 +1,146 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, bindparam, text
+
+from ledger import fiscal
+
+# -------------------------------
+# Period Balance Snapshots
+# -------------------------------
+# account_period_balances keeps one row per account and calendar month that
+# saw activity: the month's net movement and the account's closing balance at
+# the end of it.  Posting keeps the table current, so the balance of every
+# account on any date is "closing balance of the last earlier month" plus the
+# lines of the partial month, whatever the length of the history.  Amounts
+# are in minor units (see ledger.money).
+#
+# Balances before the end of a closed fiscal year are read from that year's
+# archive, which has the same tables (see ledger.fiscal).
+
+def period_of(value):
+    return value.year * 100 + value.month
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def period_sql(dialect_name, column):
+    # SQL expression turning a DATETIME column into a YYYYMM integer.
+    if dialect_name == "sqlite":
+        return f"CAST(strftime('%Y%m', {column}) AS INTEGER)"
+    return f"CAST(EXTRACT(YEAR FROM {column}) * 100 + EXTRACT(MONTH FROM {column}) AS INTEGER)"
+
+def signed_amount_sql(alias="td"):
+    return f"CASE WHEN {alias}.type = 'debit' THEN {alias}.amount ELSE -{alias}.amount END"
+
+def period_deltas(vouchers, default_date):
+    # Vouchers as returned by ledger.posting.validate_voucher (minor units).
+    deltas = defaultdict(int)
+    for voucher in vouchers:
+        period = period_of(voucher.get("date") or default_date)
+        for line in voucher["lines"]:
+            amount = line["amount"]
+            deltas[(line["account_id"], period)] += amount if line["type"] == "debit" else -amount
+    return deltas
+
+_upsert_period = text("""
+    INSERT INTO account_period_balances (account_id, period, movement, closing_balance)
+    VALUES (:account_id, :period, :delta,
+            COALESCE((SELECT p.closing_balance FROM account_period_balances p
+                      WHERE p.account_id = :account_id AND p.period < :period
+                      ORDER BY p.period DESC LIMIT 1), 0) + :delta)
+    ON CONFLICT (account_id, period) DO UPDATE SET
+        movement = account_period_balances.movement + excluded.movement,
+        closing_balance = account_period_balances.closing_balance + excluded.movement
+""")
+
+_carry_forward = text("""
+    UPDATE account_period_balances SET closing_balance = closing_balance + :delta
+    WHERE account_id = :account_id AND period > :period
+""")
+
+def apply_period_deltas(session, deltas):
+    # deltas: {(account_id, period): amount}.  Back-dated postings also move
+    # the closing balance of every later month of that account.  Existing later
+    # months are carried forward first; months created by the upsert (in
+    # ascending order) then start from an already-updated predecessor.
+    if not deltas:
+        return
+    params = [{"account_id": acc, "period": period, "delta": delta} for (acc, period), delta in sorted(deltas.items())]
+    session.execute(_carry_forward, params)
+    session.execute(_upsert_period, params)
+
+def rebuild_period_balances(conn, schema=None):
+    # Recompute the whole table from transaction_details (used by the
+    # migration that introduces it, by benchmarks that bulk-load lines and,
+    # with the archive's schema, for a closed year's archive).
+    p = f"{schema}." if schema else ""
+    period = period_sql(conn.dialect.name, "je.date")
+    conn.execute(text(f"DELETE FROM {p}account_period_balances"))
+    conn.execute(text(f"""
+        INSERT INTO {p}account_period_balances (account_id, period, movement, closing_balance)
+        SELECT m.account_id, m.period, m.movement,
+               SUM(m.movement) OVER (PARTITION BY m.account_id ORDER BY m.period)
+        FROM (SELECT td.account_id AS account_id, {period} AS period,
+                     SUM({signed_amount_sql()}) AS movement
+              FROM {p}transaction_details td JOIN {p}journal_entries je ON je.id = td.journal_entry_id
+              JOIN {p}accounts a ON a.id = td.account_id  -- lines left by deleted accounts have no row to go in
+              GROUP BY td.account_id, {period}) AS m
+    """))
+
+def _day_after(as_of):
+    if isinstance(as_of, datetime):
+        return as_of
+    return datetime.combine(as_of + timedelta(days=1), datetime.min.time())
+
+def balances_as_of(session, as_of):
+    # Balance of every account at the end of as_of (a date, or an exclusive
+    # datetime bound), as {account_id: minor units}.  One snapshot lookup per
+    # account plus one aggregate over the partial month.  Accounts created
+    # after a closed year are missing from balances within it.
+    end = _day_after(as_of)
+    start = month_start(end - timedelta(microseconds=1))
+    schema = fiscal.archive_for(session, end)
+    p = f"{schema}." if schema else ""
+    balances = {}
+    rows = session.execute(text(f"""
+        SELECT a.id,
+               (SELECT p.closing_balance FROM {p}account_period_balances p
+                WHERE p.account_id = a.id AND p.period < :period
+                ORDER BY p.period DESC LIMIT 1)
+        FROM {p}accounts a
+    """), {"period": period_of(start)})
+    for account_id, closing in rows:
+        balances[account_id] = int(closing or 0)
+    partial = session.execute(text(f"""
+        SELECT td.account_id, SUM({signed_amount_sql()})
+        FROM {p}journal_entries je JOIN {p}transaction_details td ON td.journal_entry_id = je.id
+        WHERE je.date >= :start AND je.date < :end
+        GROUP BY td.account_id
+    """).bindparams(bindparam("start", type_=DateTime), bindparam("end", type_=DateTime)),
+        {"start": start, "end": end})
+    for account_id, movement in partial:
+        if account_id in balances:
+            balances[account_id] += int(movement or 0)
+    return balances
+
+def closing_movements(session, start=None, end=None):
+    # What the year-end closing vouchers dated in [start, end) moved, as
+    # {account_id: minor units}: the Revenue and Expense balances they zeroed
+    # and the result they carried into equity.  Statements of income take
+    # these out, so a period spanning a year end still shows what was earned.
+    movements = defaultdict(int)
+    for fy in fiscal.fiscal_years(session):
+        at = fiscal.last_instant(fy)
+        if (start is not None and at < start) or (end is not None and at >= end):
+            continue
+        p = f"{fiscal.attach(session, fy)}." if fy.status == "closed" else ""
+        rows = session.execute(text(f"""
+            SELECT td.account_id, SUM({signed_amount_sql()})
+            FROM {p}journal_entries je JOIN {p}transaction_details td ON td.journal_entry_id = je.id
+            WHERE je.date = :at AND je.voucher_type = :type
+            GROUP BY td.account_id
+        """).bindparams(bindparam("at", type_=DateTime)), {"at": at, "type": fiscal.CLOSING_VOUCHER_TYPE})
+        for account_id, amount in rows:
+            movements[account_id] += int(amount or 0)
+    return movements
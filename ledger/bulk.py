@@ -0,0 +1,56 @@
+import io
+
+from sqlalchemy import insert, text
+
+# -------------------------------
+# Bulk Inserts (COPY on PostgreSQL)
+# -------------------------------
+# insert_rows(session, table, rows) writes a list of row dicts in the current
+# transaction.  On PostgreSQL, batches of COPY_MIN_ROWS or more are streamed
+# with COPY ... FROM STDIN, which skips per-row statement overhead entirely;
+# elsewhere (and for small batches) it is one executemany INSERT.
+#
+# COPY can't return generated keys, so reserve_ids() takes a block of ids from
+# the table's sequence first and the rows are copied with their ids set.
+# Works with psycopg 3 (cursor.copy) and psycopg2 (copy_expert).
+
+COPY_MIN_ROWS = 200
+
+def use_copy(session, rows):
+    return session.get_bind().dialect.name == "postgresql" and rows >= COPY_MIN_ROWS
+
+def reserve_ids(session, table, count):
+    # `count` new ids from the serial sequence behind table.id, ascending.
+    return list(session.execute(text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                                      "FROM generate_series(1, :count)"),
+                                {"table": table.name, "count": count}).scalars())
+
+def _copy_text(value):
+    # One field in COPY's text format.
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+def copy_rows(session, table, rows):
+    if not rows:
+        return
+    columns = list(rows[0])
+    sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+    # The raw DBAPI connection of the session's transaction, so the rows are
+    # committed (or rolled back) with everything else.
+    dbapi_connection = session.connection().connection.dbapi_connection
+    with dbapi_connection.cursor() as cursor:
+        if hasattr(cursor, "copy"):
+            with cursor.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row([row[c] for c in columns])
+        else:
+            buffer = io.StringIO("".join("\t".join(_copy_text(row[c]) for c in columns) + "\n" for row in rows))
+            cursor.copy_expert(sql, buffer)
+
+def insert_rows(session, table, rows):
+    if use_copy(session, len(rows)):
+        copy_rows(session, table, rows)
+    elif rows:
+        session.execute(insert(table), rows)
@@ -0,0 +1,287 @@
+import bisect
+import threading
+import time
+import weakref
+from collections import namedtuple
+
+from sqlalchemy import text
+
+# -------------------------------
+# Account Master Cache
+# -------------------------------
+# The chart of accounts (id, name, type) is loaded once per engine and kept in
+# memory, indexed by id, by type and by lower-case name for prefix lookups.
+# Balances are not cached: they change with every posting and are always read
+# from the database (reports, ledger, the accounts screen).
+#
+# Staleness is detected with the account_master_version row that triggers on
+# `accounts` bump on every insert, delete, rename or change of type (migration
+# 10).  Reading that one row is cheap, and it is done at most every `max_age`
+# seconds; when it differs from the version the cache was built from, the
+# cache reloads.  Changes made by this process are patched in directly with
+# added() / updated() / removed() instead of reloading.
+#
+# search() backs the type-ahead account picker.  It ranks matches as: account
+# code (id) prefix, name prefix, word prefix, substring, then words that are
+# similar by trigrams (typos).  Substrings are found through the name trigram
+# postings; typos are matched against the vocabulary of distinct words, which
+# stays small however many accounts there are.
+
+AccountInfo = namedtuple("AccountInfo", "id name type")
+
+MIN_SIMILARITY = 0.5  # Dice coefficient of the trigram sets of two words
+
+def trigrams(value):
+    padded = f"  {value.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def account_label(account):
+    return f"{account.id} - {account.name}"
+
+class AccountCache:
+    def __init__(self, engine, max_age=1.0):
+        self.engine = engine
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.version = None
+        self.checked = 0.0
+        self.loads = 0
+        self.by_id = {}
+        self.by_type = {}
+        self.codes = []  # sorted [(str(id), id)]
+        self.names = []  # sorted [(lower name, id)]
+        self.words = []  # sorted [(lower word, id)] for every word of every name
+        self.grams = {}  # trigram -> set of ids whose name contains it
+        self.word_grams = {}  # trigram -> set of words containing it
+
+    # --- loading ---
+    def _db_version(self, conn):
+        try:
+            return conn.execute(text("SELECT version FROM account_master_version WHERE id = 1")).scalar()
+        except Exception:
+            return None  # schema older than migration 10: reload on every check
+
+    def _load(self):
+        with self.engine.connect() as conn:
+            version = self._db_version(conn)
+            rows = conn.execute(text("SELECT id, name, type FROM accounts ORDER BY id")).all()
+        self.by_id = {row[0]: AccountInfo(*row) for row in rows}
+        self._reindex()
+        self.version = version
+        self.loads += 1
+
+    def _reindex(self):
+        self.by_id = dict(sorted(self.by_id.items()))
+        self.by_type = {}
+        for account in self.by_id.values():
+            self.by_type.setdefault(account.type, []).append(account)
+        self.codes = sorted((str(a.id), a.id) for a in self.by_id.values())
+        self.names = sorted((a.name.lower(), a.id) for a in self.by_id.values())
+        self.words = sorted((word, a.id) for a in self.by_id.values() for word in set(a.name.lower().split()))
+        self.grams = {}
+        for account in self.by_id.values():
+            for gram in trigrams(account.name):
+                self.grams.setdefault(gram, set()).add(account.id)
+        self.word_grams = {}
+        for word in {word for word, _ in self.words}:
+            for gram in trigrams(word):
+                self.word_grams.setdefault(gram, set()).add(word)
+
+    # Single-account updates of the same indexes, for patching.
+    def _index(self, account):
+        last = next(reversed(self.by_id), None)
+        new = account.id not in self.by_id
+        self.by_id[account.id] = account
+        if new and last is not None and account.id < last:
+            self.by_id = dict(sorted(self.by_id.items()))
+        same_type = self.by_type.setdefault(account.type, [])
+        same_type.insert(bisect.bisect_left([a.id for a in same_type], account.id), account)
+        bisect.insort(self.codes, (str(account.id), account.id))
+        bisect.insort(self.names, (account.name.lower(), account.id))
+        for word in set(account.name.lower().split()):
+            bisect.insort(self.words, (word, account.id))
+            for gram in trigrams(word):
+                self.word_grams.setdefault(gram, set()).add(word)
+        for gram in trigrams(account.name):
+            self.grams.setdefault(gram, set()).add(account.id)
+
+    def _unindex(self, account_id, keep=False):
+        # keep=True leaves the by_id slot in place (the account is re-indexed
+        # right after, e.g. when renamed).
+        account = self.by_id.get(account_id) if keep else self.by_id.pop(account_id, None)
+        if account is None:
+            return
+        self.by_type[account.type] = [a for a in self.by_type[account.type] if a.id != account_id]
+        for index, keys in ((self.codes, [str(account_id)]), (self.names, [account.name.lower()]),
+                            (self.words, set(account.name.lower().split()))):
+            for key in keys:
+                i = bisect.bisect_left(index, (key, account_id))
+                if i < len(index) and index[i] == (key, account_id):
+                    del index[i]
+        for gram in trigrams(account.name):
+            self.grams.get(gram, set()).discard(account_id)
+        # word_grams may keep words no account uses any more; they match no ids.
+
+    def ensure(self, force=False):
+        # Reload if the database version moved on since the last load.
+        with self.lock:
+            now = time.monotonic()
+            if not force and self.version is not None and now - self.checked < self.max_age:
+                return
+            self.checked = now
+            if self.version is not None and not force:
+                with self.engine.connect() as conn:
+                    if self._db_version(conn) == self.version:
+                        return
+            self._load()
+
+    def invalidate(self):
+        with self.lock:
+            self.version = None
+
+    # --- lookups ---
+    def get(self, account_id):
+        self.ensure()
+        return self.by_id.get(account_id)
+
+    def all(self):
+        # Every account, in id order.
+        self.ensure()
+        return list(self.by_id.values())
+
+    def of_type(self, *types):
+        # Accounts of any of the given types, in id order.
+        self.ensure()
+        return sorted((a for t in types for a in self.by_type.get(t, [])), key=lambda a: a.id)
+
+    def prefix(self, value, limit=None):
+        # Accounts whose name starts with `value` (case-insensitive), by name.
+        self.ensure()
+        value = value.lower()
+        start = bisect.bisect_left(self.names, (value,))
+        found = []
+        for name, account_id in self.names[start:]:
+            if not name.startswith(value) or (limit is not None and len(found) >= limit):
+                break
+            found.append(self.by_id[account_id])
+        return found
+
+    def _prefixed(self, index, value):
+        for i in range(bisect.bisect_left(index, (value,)), len(index)):
+            key, account_id = index[i]
+            if not key.startswith(value):
+                break
+            yield account_id
+
+    def _exact(self, index, value):
+        for i in range(bisect.bisect_left(index, (value,)), len(index)):
+            key, account_id = index[i]
+            if key != value:
+                break
+            yield account_id
+
+    def search(self, value, limit=20):
+        # Best `limit` matches for what the user has typed so far.
+        self.ensure()
+        value = " ".join(value.lower().split())
+        if not value:
+            return self.all()[:limit]
+        ranked = {}
+
+        def rank(account_id, tier, score=0.0):
+            key = (tier, -score, self.by_id[account_id].name.lower(), account_id)
+            if account_id not in ranked or key < ranked[account_id]:
+                ranked[account_id] = key
+
+        # Tiers are tried best first, and each stops once there are enough
+        # results, so a one-letter prefix doesn't rank thousands of names.
+        if value.isdigit():
+            for account_id in self._prefixed(self.codes, value):
+                rank(account_id, 0 if str(account_id) == value else 1)
+                if len(ranked) >= limit:
+                    break
+        for tier, index in ((2, self.names), (3, self.words)):
+            for account_id in self._prefixed(index, value):
+                if len(ranked) >= limit:
+                    break
+                rank(account_id, tier)
+        if len(ranked) < limit and len(value) >= 3:
+            # Substrings: every match contains the query's rarest trigram.
+            postings = [self.grams.get(value[i:i + 3], set()) for i in range(len(value) - 2)]
+            for account_id in min(postings, key=len):
+                if account_id not in ranked and value in self.by_id[account_id].name.lower():
+                    rank(account_id, 4)
+        words = [word for word in value.split() if len(word) >= 3 and not word.isdigit()]
+        if len(ranked) < limit and words:
+            # Typos: words of the vocabulary similar to the longest typed word.
+            word = max(words, key=len)
+            grams = trigrams(word)
+            shared = {}
+            for gram in grams:
+                for candidate in self.word_grams.get(gram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            similar = []
+            for candidate, count in shared.items():
+                similarity = 2 * count / (len(grams) + len(trigrams(candidate)))
+                if similarity >= MIN_SIMILARITY:
+                    similar.append((-similarity, candidate))
+            for negative, candidate in sorted(similar):
+                if len(ranked) >= limit:
+                    break
+                for account_id in self._exact(self.words, candidate):
+                    if len(ranked) >= limit:
+                        break
+                    rank(account_id, 5, -negative)
+        best = sorted(ranked.items(), key=lambda item: item[1])[:limit]
+        return [self.by_id[account_id] for account_id, _ in best]
+
+    def labels(self):
+        # "id - name" strings, in id order, for account combo boxes.
+        return [account_label(a) for a in self.all()]
+
+    # --- changes made by this process ---
+    def _patched(self):
+        # Our own change bumped the version by one; if anything else moved it
+        # too, fall back to a full reload on the next lookup.
+        with self.engine.connect() as conn:
+            version = self._db_version(conn)
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+            self.checked = time.monotonic()
+        else:
+            self.version = None
+
+    def added(self, account_id, name, acc_type):
+        with self.lock:
+            if self.version is None:
+                return
+            self._unindex(account_id, keep=True)
+            self._index(AccountInfo(account_id, name, acc_type))
+            self._patched()
+
+    updated = added
+
+    def removed(self, account_id):
+        with self.lock:
+            if self.version is None:
+                return
+            self._unindex(account_id)
+            self._patched()
+
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+def account_cache(engine):
+    # One shared cache per engine.
+    with _caches_lock:
+        if engine not in _caches:
+            _caches[engine] = AccountCache(engine)
+        return _caches[engine]
+
+def share_account_cache(engine, other):
+    # Let `other` -- e.g. the read-only engine of the same database -- use
+    # engine's cache, so changes patched in by writers show up on both.
+    cache = account_cache(engine)
+    with _caches_lock:
+        _caches[other] = cache
+    return cache
@@ -0,0 +1,191 @@
+import argparse
+import csv
+import sys
+from datetime import datetime
+
+from sqlalchemy.orm import sessionmaker
+
+from ledger import (accounts, archive, export, fiscal, importer, migrations, queries, reconcile, report_model,
+                    report_pack, server, stock, yearend)
+from ledger.db import DATABASE_URL, init_db, make_engine
+from ledger.posting import PostingError
+from ledger.unit_of_work import unit_of_work
+
+# -------------------------------
+# Batch Command Line: python -m ledger
+# -------------------------------
+#     python -m ledger import vouchers.csv
+#     python -m ledger report trial-balance --from 2025-01-01 --to 2025-12-31 --format csv -o tb.csv
+#     python -m ledger report balance-sheet --to 2025-12-31 --format pdf -o bs.pdf
+#     python -m ledger report income-statement --from 2025-01-01 --format xlsx -o pl.xlsx
+#     python -m ledger accounts add "Petty Cash" Asset
+#     python -m ledger ledger 12 --from 2025-01-01
+#     python -m ledger ledger 12 --format pdf -o cash.pdf
+#     python -m ledger pack --from 2025-01-01 --to 2025-12-31 --ledgers -o pack-2025.zip
+#     python -m ledger reconcile --workers 4 --fix
+#     python -m ledger year-end close 2024
+#     python -m ledger serve --port 8765
+#
+# Built on the same library calls as the Tk app, but never imports tkinter;
+# ReportLab is only imported for --format pdf.
+
+REPORTS = {"trial-balance": "trial_balance", "income-statement": "income_statement",
+           "balance-sheet": "balance_sheet"}
+FORMATS = {"text": export.write_text, "csv": export.write_csv, "json": export.write_json}
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}' (expected YYYY-MM-DD)")
+
+def _output(path):
+    # stdout for "-" or no path
+    if not path or path == "-":
+        return sys.stdout, False
+    return open(path, "w", newline="", encoding="utf-8"), True
+
+def cmd_report(session, args):
+    report = report_model.build_report(session, REPORTS[args.kind], args.date_from, args.date_to)
+    if args.format in ("pdf", "xlsx"):
+        if not args.output or args.output == "-":
+            raise SystemExit(f"Error: --format {args.format} needs --output FILE")
+        export.FILE_EXPORTERS["." + args.format](report, args.output)
+        print(f"Report saved as {args.format.upper()}: {args.output}", file=sys.stderr)
+        return 0
+    f, close = _output(args.output)
+    try:
+        FORMATS[args.format](report, f)
+    finally:
+        if close:
+            f.close()
+    return 0
+
+def cmd_accounts(session, args):
+    if args.action == "list":
+        print("{:<6} {:<30} {:<18} {:>14}".format("ID", "Name", "Type", "Balance"))
+        for account_id, name, acc_type, balance in accounts.list_accounts(session):
+            print("{:<6} {:<30} {:<18} {:>14.2f}".format(account_id, name, acc_type, balance))
+    elif args.action == "add":
+        account_id = accounts.create_account(session, args.name, args.type)
+        print(f"Account '{args.name}' created with ID {account_id}.")
+    else:
+        name = accounts.delete_account(session, args.id)
+        print(f"Account '{name}' (ID {args.id}) deleted.")
+    return 0
+
+def cmd_stock(session, args):
+    if args.action == "list":
+        print("{:<6} {:<30} {:>10} {:>14} {:>14}".format("ID", "Product Name", "Quantity", "Purchase Price", "Selling Price"))
+        for row in stock.list_stock(session):
+            print("{:<6} {:<30} {:>10} {:>14.2f} {:>14.2f}".format(*row))
+    else:
+        item_id = stock.add_stock_item(session, args.name, args.quantity, args.purchase_price,
+                                       args.selling_price, args.details)
+        print(f"Stock item '{args.name}' added with ID {item_id}.")
+    return 0
+
+def cmd_ledger(session, args):
+    # Every line of one account, streamed page by page as CSV or PDF.
+    if args.format == "pdf":
+        if not args.output or args.output == "-":
+            raise SystemExit("Error: --format pdf needs --output FILE")
+        name = accounts.account_name(session, args.account)
+        result = export.write_ledger_pdf(session, args.account, name, args.output, args.date_from)
+        print(f"Ledger saved as PDF: {args.output} ({result['pages']} pages, {result['rows']} lines)", file=sys.stderr)
+        return 0
+    f, close = _output(args.output)
+    try:
+        _write_ledger_csv(session, args, f)
+    finally:
+        if close:
+            f.close()
+    return 0
+
+def _write_ledger_csv(session, args, f):
+    writer = csv.writer(f)
+    writer.writerow(["date", "voucher", "voucher_type", "description", "debit", "credit", "balance"])
+    cursor = queries.first_cursor(session, args.account, args.date_from)
+    while cursor is not None:
+        page = queries.ledger_page(session, args.account, cursor)
+        for row in page.rows:
+            writer.writerow([f"{row.date:%Y-%m-%d}", row.voucher_id, row.voucher_type, row.description,
+                             f"{row.debit:.2f}", f"{row.credit:.2f}", f"{row.balance:.2f}"])
+        cursor = page.cursor
+
+COMMANDS = {"report": cmd_report, "accounts": cmd_accounts, "stock": cmd_stock, "ledger": cmd_ledger}
+# Subcommands handed over to the existing tools with the rest of the command line.
+DELEGATED = {"import": importer.main, "migrate": migrations.main, "archive": archive.main, "serve": server.main,
+             "pack": report_pack.main, "reconcile": reconcile.main, "year-end": yearend.main}
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m ledger", description="Ledger batch tools.")
+    parser.add_argument("--url", default=DATABASE_URL, help="SQLAlchemy database URL")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_ in (("import", "post vouchers from a CSV / JSONL file (see python -m ledger import -h)"),
+                        ("migrate", "manage the database schema (see python -m ledger migrate -h)"),
+                        ("archive", "archive old audit log rows (see python -m ledger archive -h)"),
+                        ("serve", "run the local HTTP/JSON API (see python -m ledger serve -h)"),
+                        ("pack", "render a pack of reports in parallel (see python -m ledger pack -h)"),
+                        ("reconcile", "check account balances against the ledger lines "
+                                      "(see python -m ledger reconcile -h)"),
+                        ("year-end", "close fiscal years into archive databases (see python -m ledger year-end -h)")):
+        sub.add_parser(name, help=help_, add_help=False).add_argument("args", nargs=argparse.REMAINDER)
+
+    report = sub.add_parser("report", help="produce a financial statement")
+    report.add_argument("kind", choices=list(REPORTS))
+    report.add_argument("--from", dest="date_from", type=_date, default=None, help="YYYY-MM-DD (inclusive)")
+    report.add_argument("--to", dest="date_to", type=_date, default=None, help="YYYY-MM-DD (inclusive)")
+    report.add_argument("--format", choices=list(FORMATS) + ["pdf", "xlsx"], default="text")
+    report.add_argument("-o", "--output", default=None, help="output file (default: stdout)")
+
+    acc = sub.add_parser("accounts", help="list, add or delete accounts")
+    acc_sub = acc.add_subparsers(dest="action", required=True)
+    acc_sub.add_parser("list")
+    add = acc_sub.add_parser("add")
+    add.add_argument("name")
+    add.add_argument("type", choices=accounts.ACCOUNT_TYPES)
+    delete = acc_sub.add_parser("delete")
+    delete.add_argument("id", type=int)
+
+    stk = sub.add_parser("stock", help="list or add stock items")
+    stk_sub = stk.add_subparsers(dest="action", required=True)
+    stk_sub.add_parser("list")
+    add = stk_sub.add_parser("add")
+    add.add_argument("name")
+    add.add_argument("quantity")
+    add.add_argument("purchase_price")
+    add.add_argument("selling_price")
+    add.add_argument("--details", default="")
+
+    led = sub.add_parser("ledger", help="print an account's ledger as CSV, or write it as PDF")
+    led.add_argument("account", type=int)
+    led.add_argument("--from", dest="date_from", type=_date, default=None, help="YYYY-MM-DD (inclusive)")
+    led.add_argument("--format", choices=["csv", "pdf"], default="csv")
+    led.add_argument("-o", "--output", default=None, help="output file (default: stdout)")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    # Options of delegated subcommands (including -h) are unknown to this parser.
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args, extra = parser.parse_known_args(argv)
+    if args.command in DELEGATED:
+        # Everything after the subcommand, in its original order.
+        rest = argv[argv.index(args.command) + 1:]
+        return DELEGATED[args.command](["--url", args.url] + rest) or 0
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    engine = make_engine(args.url)
+    init_db(engine)
+    try:
+        with unit_of_work(sessionmaker(bind=engine)) as session:
+            return COMMANDS[args.command](session, args)
+    except (accounts.AccountError, stock.StockError, PostingError, fiscal.FiscalError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
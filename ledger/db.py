@@ -0,0 +1,138 @@
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+
+from ledger import config, migrations
+from ledger.cache import share_account_cache
+
+# -------------------------------
+# Database Setup using SQLAlchemy
+# -------------------------------
+# make_engine() applies the SQLite engine profile to every new connection:
+#   journal_mode=WAL     readers never block the writer and vice versa
+#   synchronous=NORMAL   with WAL: durable at checkpoints, no fsync per commit
+#   cache_size, mmap_size, temp_store   bigger page cache, memory-mapped reads
+#   busy_timeout         wait for a lock instead of failing at once
+#   foreign_keys=ON      enforce the REFERENCES of the schema
+#
+# There are two engines on the same file.  `engine` / Session is for writes:
+# short transactions (the driver begins one at the first INSERT/UPDATE/DELETE).
+# `read_engine` / ReadSession is for reports and lists: its connections are
+# query-only and every session begins a transaction straight away, so all the
+# queries of one report read the same WAL snapshot while postings go on.
+# Read sessions must be short-lived too -- close them when the report is done.
+#
+# On PostgreSQL the read engine gets the same guarantee from REPEATABLE READ,
+# read-only transactions; the write engine uses the configured isolation level
+# (READ COMMITTED by default, which posting's "balance = balance + delta"
+# updates are written for).
+#
+# The URL, pool size and isolation level come from ledger.config (environment
+# or ledger.ini); arguments given to make_engine() override them.
+
+DATABASE_URL = config.database["url"]
+
+BUSY_TIMEOUT_MS = 30000
+BUSY_RETRIES = 5  # retries of a whole transaction that still found the database locked
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,  # KiB, i.e. about 64 MB
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": BUSY_TIMEOUT_MS,
+    "foreign_keys": "ON",
+}
+
+def _apply_pragmas(pragmas, readonly):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if readonly and name == "journal_mode":
+                continue  # set by the writer; it is stored in the file
+            cursor.execute(f"PRAGMA {name} = {value}")
+        if readonly:
+            cursor.execute("PRAGMA query_only = ON")
+            # The driver would only begin a transaction before writes; begin
+            # one for every session instead (see _begin) to pin the snapshot.
+            dbapi_connection.isolation_level = None
+        cursor.close()
+    return on_connect
+
+def _begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+def engine_options(url, readonly=False, settings=None):
+    # create_engine() keyword arguments from the configuration.
+    settings = settings or config.database
+    options = {"pool_pre_ping": not url.startswith("sqlite")}
+    if not url.startswith("sqlite:///:memory:") and url != "sqlite://":
+        options.update(pool_size=settings["pool_size"], max_overflow=settings["max_overflow"],
+                       pool_timeout=settings["pool_timeout"], pool_recycle=settings["pool_recycle"])
+    if url.startswith("postgresql") and readonly:
+        options.update(isolation_level="REPEATABLE READ", execution_options={"postgresql_readonly": True})
+    elif settings["isolation_level"] and not readonly:
+        options["isolation_level"] = settings["isolation_level"]
+    return options
+
+def make_engine(url=None, readonly=False, pragmas=None, **kwargs):
+    # pragmas=None uses SQLITE_PRAGMAS; pass {} for SQLite's own defaults.
+    url = url or DATABASE_URL
+    kwargs = dict(engine_options(url, readonly), **kwargs)
+    if not url.startswith("sqlite"):
+        return create_engine(url, **kwargs)
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    connect_args = dict(kwargs.pop("connect_args", {}))
+    connect_args.setdefault("timeout", pragmas.get("busy_timeout", BUSY_TIMEOUT_MS) / 1000)
+    engine = create_engine(url, connect_args=connect_args, **kwargs)
+    if pragmas or readonly:
+        event.listen(engine, "connect", _apply_pragmas(pragmas, readonly))
+    if readonly:
+        event.listen(engine, "begin", _begin)
+    return engine
+
+# PostgreSQL errors worth running the transaction again for: serialization
+# failure, deadlock detected, lock not available.
+RETRY_SQLSTATES = ("40001", "40P01", "55P03")
+
+def is_busy(error):
+    if not isinstance(error, DBAPIError):
+        return False
+    sqlstate = getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)
+    if sqlstate:
+        return sqlstate in RETRY_SQLSTATES
+    return isinstance(error, OperationalError) and any(
+        msg in str(error.orig) for msg in ("database is locked", "database is busy"))
+
+def is_conflict(error):
+    # A transaction that lost a race and can simply be run again: the database
+    # was busy, or an ORM update / delete found the row version changed.
+    return isinstance(error, StaleDataError) or is_busy(error)
+
+def retry_on_busy(fn, *args, attempts=BUSY_RETRIES, delay=0.05):
+    # fn(*args) must be a whole transaction (it is run again from scratch).
+    # busy_timeout already waits inside SQLite; this covers a lock held longer
+    # than that, the case SQLite doesn't wait for (a read transaction that
+    # tries to write after another connection committed), and optimistic
+    # locking conflicts on accounts (StaleDataError).
+    for attempt in range(attempts):
+        try:
+            return fn(*args)
+        except (DBAPIError, StaleDataError) as e:
+            if not is_conflict(e) or attempt == attempts - 1:
+                raise
+            time.sleep(delay * 2 ** attempt)
+
+engine = make_engine(DATABASE_URL, echo=False)
+Session = sessionmaker(bind=engine)
+read_engine = make_engine(DATABASE_URL, readonly=True)
+share_account_cache(engine, read_engine)
+ReadSession = sessionmaker(bind=read_engine)
+
+def init_db(bind=None):
+    # Bring the database up to the latest schema version.
+    return migrations.upgrade(bind or engine)
@@ -0,0 +1,129 @@
+import csv
+import json
+
+from ledger import pdf, queries, reports, xlsx
+
+# -------------------------------
+# Report Export
+# -------------------------------
+# Renders a ledger.report_model.Report as fixed-width text, CSV, JSON, XLSX
+# (ledger.xlsx) or PDF (ledger.pdf); all of them read the same report object.
+# ReportLab is only imported when a PDF is actually written, so batch jobs
+# producing the other formats don't need it installed.
+#
+# Account ledgers are streamed into the PDF straight from the ledger query, so
+# a ledger of any length is exported in constant memory.
+
+def _field(title):
+    return title.lower().replace(" ", "_")
+
+def report_rows(report):
+    # (header, rows): one row per account line, amounts rounded to cents; the
+    # section becomes the first column when the report has titled sections.
+    sectioned = any(section.title for section in report.sections)
+    header = (["section"] if sectioned else []) + [_field(c.title) for c in report.columns]
+    rows = []
+    for section in report.sections:
+        prefix = [_field(section.title)] if sectioned else []
+        for row in section.rows:
+            rows.append(prefix + [round(v, 2) if c.kind == "amount" else v for c, v in zip(report.columns, row)])
+    return header, rows
+
+def report_text(report):
+    # Fixed-width text, each column as wide as its widest value.
+    columns = report.columns
+    lines = list(report.lines())
+    cells = [[c.title for c in columns]]
+    for line in lines:
+        if isinstance(line, pdf.Heading):
+            continue
+        values = line.values if isinstance(line, pdf.Total) else line
+        cells.append([pdf.format_value(v, c.kind) if v is not None else "" for c, v in zip(columns, values)])
+    widths = [min(40, max(len(row[i]) for row in cells if i < len(row))) for i in range(len(columns))]
+
+    def fmt(values):
+        return " ".join(value[:w].rjust(w) if c.kind in ("amount", "int") else value[:w].ljust(w)
+                        for c, value, w in zip(columns, values, widths)).rstrip()
+
+    rule = "-" * (sum(widths) + len(widths) - 1)
+    out = [report.title, report.period, "", fmt(cells[0]), rule]
+    for line in lines:
+        if isinstance(line, pdf.Heading):
+            out += ["", f"{line.text}:"]
+        elif isinstance(line, pdf.Total):
+            # The label goes in the blank space before the first amount.
+            values = [pdf.format_value(v, c.kind) if v is not None else "" for c, v in zip(columns, line.values)]
+            text_ = fmt([""] + values[1:])
+            blank = len(text_) - len(text_.lstrip())
+            out.append(line.label.ljust(blank) + text_[blank:] if len(line.label) < blank
+                       else f"{line.label} {text_.lstrip()}")
+        else:
+            out.append(fmt([pdf.format_value(v, c.kind) for c, v in zip(columns, line)]))
+    out += report.notes
+    return "\n".join(out) + "\n"
+
+def write_text(report, f):
+    f.write(report_text(report))
+
+def write_csv(report, f):
+    header, rows = report_rows(report)
+    writer = csv.writer(f)
+    writer.writerow(header)
+    writer.writerows(rows)
+
+def report_dict(report):
+    # JSON-ready form: period, totals and one object per account line.
+    header, rows = report_rows(report)
+    return {"report": report.kind, "period": report.period, "totals": report.summary,
+            "lines": [dict(zip(header, row)) for row in rows]}
+
+def write_json(report, f):
+    json.dump(report_dict(report), f, indent=2)
+    f.write("\n")
+
+def write_report_pdf(report, file_path, progress=None):
+    return pdf.write_table_pdf(file_path, report.title, report.columns, report.lines(), subtitle=report.period,
+                               progress=progress)
+
+def write_report_xlsx(report, file_path, progress=None):
+    return xlsx.write_table_xlsx(file_path, report.title, report.columns, report.lines(), subtitle=report.period,
+                                 progress=progress)
+
+def _write_file(writer):
+    def write(report, file_path, progress=None):
+        with open(file_path, "w", newline="", encoding="utf-8") as f:
+            writer(report, f)
+    return write
+
+# Exporters by file extension: exporter(report, file_path, progress=None).
+FILE_EXPORTERS = {".pdf": write_report_pdf, ".xlsx": write_report_xlsx, ".csv": _write_file(write_csv),
+                  ".json": _write_file(write_json), ".txt": _write_file(write_text)}
+
+# --- ledgers ---
+LEDGER_COLUMNS = [pdf.Column("Date", 10, "date"), pdf.Column("Voucher", 7), pdf.Column("Type", 11),
+                  pdf.Column("Description", 32), pdf.Column("Debit", 13, "amount", True),
+                  pdf.Column("Credit", 13, "amount", True), pdf.Column("Balance", 14, "amount")]
+
+LEDGER_FETCH = 5000  # lines per query; bigger than the screen's pages, far fewer round trips
+
+def ledger_rows(session, account_id, date_from=None, date_to=None):
+    # The opening balance, then every line of the account up to date_to
+    # (inclusive), LEDGER_FETCH at a time.
+    end = reports.day_end(date_to) if date_to else None
+    cursor = queries.first_cursor(session, account_id, date_from)
+    yield (date_from, "", "", "Opening Balance", None, None, cursor.balance)
+    while cursor is not None:
+        page = queries.ledger_page(session, account_id, cursor, LEDGER_FETCH)
+        for row in page.rows:
+            if end and row.date >= end:
+                return
+            # Zero debits / credits are left blank, as on the ledger screen.
+            yield (row.date, row.voucher_id, row.voucher_type, row.description, row.debit or None,
+                   row.credit or None, row.balance)
+        cursor = page.cursor
+
+def write_ledger_pdf(session, account_id, account_name, file_path, date_from=None, progress=None, date_to=None):
+    subtitle = reports.period_label(date_from, date_to)
+    return pdf.write_table_pdf(file_path, f"LEDGER: {account_name}", LEDGER_COLUMNS,
+                               ledger_rows(session, account_id, date_from, date_to), subtitle=subtitle,
+                               progress=progress)
@@ -0,0 +1,122 @@
+import os
+from collections import namedtuple
+from datetime import timedelta
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.exc import OperationalError
+
+# -------------------------------
+# Closed Fiscal Years and their Archives
+# -------------------------------
+# ledger.yearend closes a fiscal year by moving its vouchers out of the live
+# journal_entries / transaction_details into an archive of their own and
+# posting one opening-balance voucher in their place.  fiscal_years (migration
+# 13) records every close:
+#     year       the calendar year the fiscal year starts in
+#     date_from  first instant of the year; date_to: first instant after it
+#     status     "closing" while the close is in progress, then "closed"
+#     archive    SQLite: the archive file, relative to the database file
+#                (ledger_archive/ledger-2024.db); PostgreSQL: a schema of the
+#                same database holding the same tables (fy2024)
+#
+# An archive holds the year's lines, its closing voucher, the opening voucher
+# it started from and a snapshot of the chart of accounts with its monthly
+# balances, so it is a complete ledger of its own.  SQL reaches it through the
+# alias fy<year>: the attached database on SQLite (ATTACH is done per
+# connection, when a query first needs the year), the schema on PostgreSQL.
+#
+# Vouchers can't be dated before the end of the last closed year (see
+# ledger.posting).  The closing and opening vouchers are dated on the year's
+# last instant, so "balance before date_to" includes them and every later
+# balance starts from the opening voucher.
+
+ARCHIVE_DIR = "ledger_archive"
+CLOSING_VOUCHER_TYPE = "Closing"
+OPENING_VOUCHER_TYPE = "Opening Balance"
+
+FiscalYearInfo = namedtuple("FiscalYearInfo", "year date_from date_to status archive opening_entry_id")
+
+class FiscalError(Exception):
+    pass
+
+def archive_alias(year):
+    return f"fy{year}"
+
+def last_instant(fiscal_year):
+    # Date of the year's closing and opening vouchers.
+    return fiscal_year.date_to - timedelta(microseconds=1)
+
+def year_label(fiscal_year):
+    if fiscal_year.date_from.month == 1:
+        return str(fiscal_year.year)
+    return f"{fiscal_year.year}-{(fiscal_year.year + 1) % 100:02d}"
+
+_years_sql = text("""
+    SELECT year, date_from, date_to, status, archive, opening_entry_id
+    FROM fiscal_years ORDER BY year
+""").columns(date_from=DateTime, date_to=DateTime)
+
+_closed_until_sql = text("SELECT MAX(date_to) AS date_to FROM fiscal_years").columns(date_to=DateTime)
+
+def fiscal_years(session):
+    # [FiscalYearInfo] oldest first, in progress or closed.
+    return [FiscalYearInfo(*row) for row in session.execute(_years_sql)]
+
+def closed_years(session):
+    return [fy for fy in fiscal_years(session) if fy.status == "closed"]
+
+def books_closed_until(session):
+    # Vouchers must be dated on or after this (None: no year closed).  A year
+    # counts from the moment its close starts.
+    return session.execute(_closed_until_sql).scalar()
+
+def database_dir(conn):
+    # Directory of the main SQLite database file ("" for an in-memory one).
+    for _, name, path in conn.exec_driver_sql("PRAGMA database_list"):
+        if name == "main":
+            return os.path.dirname(path or "")
+    return ""
+
+def archive_path(conn, archive):
+    return archive if os.path.isabs(archive) else os.path.join(database_dir(conn), archive)
+
+def attach(session, fiscal_year):
+    # The alias to qualify the year's tables with, attaching the archive to
+    # this session's connection first if needed (SQLite).
+    alias = archive_alias(fiscal_year.year)
+    if session.get_bind().dialect.name != "sqlite":
+        return alias
+    conn = session.connection()
+    if alias in {row[1] for row in conn.exec_driver_sql("PRAGMA database_list")}:
+        return alias
+    path = archive_path(conn, fiscal_year.archive)
+    if not os.path.exists(path):  # ATTACH would create an empty one
+        raise FiscalError(f"The archive of fiscal year {year_label(fiscal_year)} is missing: {path}")
+    try:
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {alias}", (path,))
+    except OperationalError as e:
+        raise FiscalError(f"Cannot open the archive of fiscal year {year_label(fiscal_year)}: {e.orig}") from None
+    return alias
+
+def archive_for(session, as_of):
+    # Alias of the archive that holds the balances before `as_of` (an
+    # exclusive datetime bound), or None when the live tables do.
+    years = closed_years(session)
+    if not years or as_of >= years[-1].date_to:
+        return None
+    return attach(session, next(fy for fy in years if as_of < fy.date_to))
+
+def line_sources(session, start=None):
+    # Where the ledger lines dated on or after `start` (None: all) are, as
+    # [(table prefix, SQL condition on je to add or "")].  Just [("", "")] when
+    # the range doesn't reach back into a closed year.  Otherwise the archives
+    # from the one containing `start` on, then the live tables, with every
+    # opening-balance voucher left out: each stands for the archived years
+    # before it, which are in the list themselves.
+    years = closed_years(session)
+    if not years or (start is not None and start >= years[-1].date_to):
+        return [("", "")]
+    openings = [str(fy.opening_entry_id) for fy in years if fy.opening_entry_id is not None]
+    skip = f" AND je.id NOT IN ({', '.join(openings)})" if openings else ""
+    sources = [(f"{attach(session, fy)}.", skip) for fy in years if start is None or start < fy.date_to]
+    return sources + [("", skip)]
@@ -0,0 +1,282 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy.orm import sessionmaker
+
+from ledger import fiscal
+from ledger.db import DATABASE_URL, init_db, make_engine
+from ledger.models import Account, AuditLog, ImportCheckpoint
+from ledger.money import to_minor
+from ledger.posting import check_books_open, post_vouchers, validate_voucher, PostingError
+
+# -------------------------------
+# Streaming Bulk Voucher Import
+# -------------------------------
+# Reads vouchers from CSV or JSONL without loading the file into memory.
+#
+# CSV: one voucher line per row, with the columns
+#     voucher, date, voucher_type, description, account_id, amount, type
+# Consecutive rows sharing the same `voucher` reference form one voucher; the
+# header fields are taken from its first row.
+#
+# JSONL: either the same row objects, or one whole voucher per line:
+#     {"voucher": "V1", "date": "2025-01-31", "voucher_type": "Payment",
+#      "description": "...", "lines": [{"account_id": 1, "amount": 10, "type": "debit"}, ...]}
+#
+# Vouchers are checked with the same rules as the voucher entry screen and
+# posted in chunks of `commit_size` vouchers.  Each chunk commits together with
+# the import checkpoint, so an interrupted import resumes after the last
+# committed chunk.  Rejected vouchers are written to a CSV error report.
+
+DEFAULT_COMMIT_SIZE = 1000
+ERROR_FIELDS = ["line", "voucher", "error"]
+
+def fingerprint(path):
+    # Size plus the head and tail of the file: cheap, and stable across renames.
+    h = hashlib.sha256()
+    size = os.path.getsize(path)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(65536))
+        if size > 65536:
+            f.seek(max(size - 65536, 65536))
+            h.update(f.read())
+    return h.hexdigest()
+
+def detect_format(path):
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+# --- parsing ---
+def _iter_csv(f):
+    reader = csv.DictReader(f)
+    for row in reader:
+        yield reader.line_num, row
+
+def _iter_jsonl(f):
+    for line_no, raw in enumerate(f, start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            row = json.loads(raw, parse_float=Decimal)
+        except ValueError as e:
+            yield line_no, {"__error__": f"Invalid JSON: {e}"}
+            continue
+        if not isinstance(row, dict):
+            row = {"__error__": "Each line must be a JSON object."}
+        yield line_no, row
+
+def _parse_date(value):
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).strip())
+
+def _parse_line(row):
+    if not isinstance(row, dict):
+        raise PostingError("Each voucher line must be an object.")
+    try:
+        account_id = int(row["account_id"])
+    except (KeyError, TypeError, ValueError):
+        raise PostingError("Invalid account selection.")
+    # Amounts stay text (or Decimal, from JSON) until the posting engine
+    # converts them to minor units; a float would round large amounts.
+    try:
+        amount = row["amount"]
+        amount = amount.strip() if isinstance(amount, str) else amount
+        to_minor(amount)
+    except (KeyError, TypeError, ValueError):
+        raise PostingError("Please enter a valid amount.")
+    return {"account_id": account_id, "amount": amount, "type": str(row.get("type") or "").strip().lower()}
+
+def _text(row, field, default=""):
+    value = row.get(field)
+    if value in (None, ""):
+        return default
+    if not isinstance(value, str):
+        raise PostingError(f"The {field} must be text.")
+    return value.strip()
+
+def _header(row):
+    return {"voucher_type": _text(row, "voucher_type", "Journal"),
+            "description": _text(row, "description"),
+            "date": _parse_date(row.get("date"))}
+
+def read_vouchers(f, fmt):
+    # Yields (first_line, last_line, ref, voucher, error) with one voucher held in memory at a time.
+    rows = _iter_jsonl(f) if fmt == "jsonl" else _iter_csv(f)
+    current = None
+    for line_no, row in rows:
+        if "__error__" in row:
+            if current:
+                yield current
+                current = None
+            yield line_no, line_no, None, None, row["__error__"]
+            continue
+        ref = str(row.get("voucher") or "")
+        if "lines" in row:
+            if current:
+                yield current
+                current = None
+            try:
+                voucher = _header(row)
+                if not isinstance(row["lines"], list):
+                    raise PostingError("The lines must be a list.")
+                voucher["lines"] = [_parse_line(line) for line in row["lines"]]
+                yield line_no, line_no, ref, voucher, None
+            except (PostingError, ValueError, TypeError) as e:
+                yield line_no, line_no, ref, None, str(e)
+            continue
+        if current and current[2] != ref:
+            yield current
+            current = None
+        if current is None:
+            try:
+                current = [line_no, line_no, ref, dict(_header(row), lines=[]), None]
+            except PostingError as e:
+                current = [line_no, line_no, ref, None, str(e)]
+            except ValueError as e:
+                current = [line_no, line_no, ref, None, f"Invalid date: {e}"]
+        current[1] = line_no
+        if current[4] is None:
+            try:
+                current[3]["lines"].append(_parse_line(row))
+            except PostingError as e:
+                current[3], current[4] = None, f"Line {line_no}: {e}"
+    if current:
+        yield current
+
+# --- import ---
+def import_file(session, path, fmt=None, commit_size=DEFAULT_COMMIT_SIZE, errors_path=None,
+                restart=False, force=False, progress=None):
+    fmt = fmt or detect_format(path)
+    errors_path = errors_path or path + ".errors.csv"
+    key = fingerprint(path)
+
+    checkpoint = session.query(ImportCheckpoint).filter_by(fingerprint=key).first()
+    if checkpoint and checkpoint.completed and not force:
+        raise PostingError(f"{path} was already imported on {checkpoint.updated_at:%Y-%m-%d %H:%M:%S}; use force to import it again.")
+    if checkpoint is None:
+        checkpoint = ImportCheckpoint(fingerprint=key, source=os.path.abspath(path),
+                                      last_line=0, vouchers=0, rejected=0, completed=0)
+        session.add(checkpoint)
+        session.commit()
+    elif restart or checkpoint.completed:
+        checkpoint.last_line = checkpoint.vouchers = checkpoint.rejected = checkpoint.completed = 0
+        session.commit()
+    resume_after = checkpoint.last_line
+
+    known_accounts = {row.id for row in session.query(Account.id)}
+    # Re-read after every chunk, in case a year-end close ran meanwhile.
+    closed_until = fiscal.books_closed_until(session)
+    stats = {"posted": 0, "rejected": 0, "skipped_lines": resume_after, "resumed": resume_after > 0}
+    chunk, chunk_errors = [], []
+    last_line = resume_after
+
+    error_mode = "a" if resume_after and os.path.exists(errors_path) else "w"
+    with open(path, newline="", encoding="utf-8") as f, open(errors_path, error_mode, newline="", encoding="utf-8") as ef:
+        error_writer = csv.writer(ef)
+        if error_mode == "w":
+            error_writer.writerow(ERROR_FIELDS)
+
+        def commit_chunk():
+            nonlocal closed_until
+            if chunk:
+                post_vouchers(session, chunk, commit=False)
+            checkpoint.last_line = last_line
+            checkpoint.vouchers += len(chunk)
+            checkpoint.rejected += len(chunk_errors)
+            checkpoint.updated_at = datetime.utcnow()
+            session.commit()
+            # Errors are only reported once the chunk they belong to is durable,
+            # so a resumed import never repeats them.
+            error_writer.writerows(chunk_errors)
+            ef.flush()
+            stats["posted"] += len(chunk)
+            stats["rejected"] += len(chunk_errors)
+            chunk.clear()
+            chunk_errors.clear()
+            closed_until = fiscal.books_closed_until(session)
+            if progress:
+                progress(stats, last_line)
+
+        try:
+            for first, last, ref, voucher, error in read_vouchers(f, fmt):
+                if last <= resume_after:
+                    continue
+                if error is None:
+                    try:
+                        validate_voucher(voucher)
+                        unknown = sorted({l["account_id"] for l in voucher["lines"]} - known_accounts)
+                        if unknown:
+                            raise PostingError(f"Unknown account id(s): {', '.join(str(u) for u in unknown)}")
+                        check_books_open(voucher, closed_until)
+                    except PostingError as e:
+                        error = str(e)
+                if error is None:
+                    chunk.append(voucher)
+                else:
+                    chunk_errors.append([first, ref, error])
+                last_line = last
+                if len(chunk) + len(chunk_errors) >= commit_size:
+                    commit_chunk()
+            commit_chunk()
+        except BaseException:
+            session.rollback()
+            raise
+
+    checkpoint.completed = 1
+    session.add(AuditLog(action="Bulk Import",
+                         details=f"Imported {checkpoint.vouchers} vouchers from {os.path.basename(path)} "
+                                 f"({checkpoint.rejected} rejected)."))
+    session.commit()
+    stats["errors_path"] = errors_path
+    return stats
+
+# -------------------------------
+# Command line: python -m ledger.importer FILE
+# -------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ledger.importer", description="Bulk import vouchers from CSV or JSONL.")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="default: from the file extension")
+    parser.add_argument("--commit-size", type=int, default=DEFAULT_COMMIT_SIZE, help="vouchers per committed chunk")
+    parser.add_argument("--errors", default=None, help="error report path (default: FILE.errors.csv)")
+    parser.add_argument("--restart", action="store_true", help="ignore a previous partial import and start over")
+    parser.add_argument("--force", action="store_true", help="import a file that was already imported completely")
+    parser.add_argument("--url", default=DATABASE_URL, help="SQLAlchemy database URL")
+    args = parser.parse_args(argv)
+    if args.commit_size < 1:
+        parser.error("--commit-size must be at least 1")
+
+    engine = make_engine(args.url)
+    init_db(engine)
+    session = sessionmaker(bind=engine)()
+    started = time.perf_counter()
+
+    def progress(stats, line):
+        print(f"\rline {line:,}: {stats['posted']:,} posted, {stats['rejected']:,} rejected", end="", file=sys.stderr)
+
+    try:
+        stats = import_file(session, args.file, fmt=args.format, commit_size=args.commit_size,
+                            errors_path=args.errors, restart=args.restart, force=args.force, progress=progress)
+    except PostingError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    if stats["resumed"]:
+        print(f"Resumed after line {stats['skipped_lines']:,}.")
+    print(f"Posted {stats['posted']:,} vouchers, rejected {stats['rejected']:,} "
+          f"in {time.perf_counter() - started:.1f}s. Error report: {stats['errors_path']}")
+    return 0 if not stats["rejected"] else 2
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,328 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import sqlalchemy
+from sqlalchemy import event
+
+# -------------------------------
+# Query and Screen Instrumentation
+# -------------------------------
+# install(engine) hooks before/after_cursor_execute and handle_error and
+# records, per distinct statement: calls, errors, total / max latency, rows and
+# the calling code (the first frame outside SQLAlchemy).  Statements slower
+# than the slow-query threshold, and failed ones (errors, timeouts, lock
+# waits given up), are also appended to a JSON-lines slow query log.
+#
+# span(name) times a block of code, e.g. a screen's query, widget-build and
+# render phases, and counts the statements run inside it on the same thread.
+#
+# snapshot() returns everything as a dict; to_prometheus() renders it in the
+# Prometheus text format, and StatsFlusher writes both to files periodically.
+#
+# Row counts come from cursor.rowcount: exact for INSERT/UPDATE/DELETE, but
+# SQLite reports -1 for SELECT, so those rows are not counted there.
+
+SLOW_QUERY_MS = 200.0
+STATS_DIR = "diagnostics"
+FLUSH_INTERVAL = 60.0  # seconds
+MAX_STATEMENTS = 500  # distinct statements tracked; the rest are counted as "<other>"
+MAX_CALL_SITES = 5  # per statement
+SLOW_KEPT = 100  # recent slow queries kept in memory
+
+_in_list_re = re.compile(r"\(\s*(\?|%s|:\w+|%\(\w+\)s)(\s*,\s*(\?|%s|:\w+|%\(\w+\)s))+\s*\)")
+_space_re = re.compile(r"\s+")
+# Frames skipped when looking for the caller: SQLAlchemy itself (including the
+# wrappers it generates at runtime) and this module.
+_skip_paths = (os.path.dirname(sqlalchemy.__file__), "<sqlalchemy", os.path.abspath(__file__))
+
+_normalized = {}
+
+def normalize(statement):
+    # One entry for "IN (?, ?)" and "IN (?, ?, ?)".  Memoized: the same few
+    # statement strings come back over and over.
+    sql = _normalized.get(statement)
+    if sql is None:
+        sql = _in_list_re.sub("(?, ...)", _space_re.sub(" ", statement).strip())
+        if len(_normalized) < 10 * MAX_STATEMENTS:
+            _normalized[statement] = sql
+    return sql
+
+def call_site():
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_skip_paths):
+            return f"{os.path.basename(filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+class _StatementStats:
+    __slots__ = ("sql", "count", "errors", "total_ms", "max_ms", "rows", "slow", "call_sites")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.call_sites = {}
+
+class _SpanStats:
+    __slots__ = ("name", "count", "total_ms", "max_ms", "last_ms", "queries", "query_ms")
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.queries = 0
+        self.query_ms = 0.0
+
+class Instrumentation:
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=None, call_sites=True):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.call_sites = call_sites
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.since = datetime.now()
+            self.statements = {}
+            self.spans = {}
+            self.slow = deque(maxlen=SLOW_KEPT)
+
+    # --- engine hooks ---
+    def install(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._error)
+        return self
+
+    def uninstall(self, engine):
+        event.remove(engine, "before_cursor_execute", self._before)
+        event.remove(engine, "after_cursor_execute", self._after)
+        event.remove(engine, "handle_error", self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("instrument_started", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("instrument_started")
+        if not started:
+            return
+        ms = (time.perf_counter() - started.pop()) * 1000
+        rows = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+        self._record(statement, parameters, executemany, ms, rows)
+
+    def _error(self, exception_context):
+        # after_cursor_execute never fires for a statement that raised: take
+        # its start time off the connection here and record it as an error.
+        conn, statement = exception_context.connection, exception_context.statement
+        started = conn.info.get("instrument_started") if conn is not None and statement is not None else None
+        if not started:
+            return
+        ms = (time.perf_counter() - started.pop()) * 1000
+        error = str(exception_context.original_exception).strip().splitlines()
+        executemany = bool(exception_context.execution_context and exception_context.execution_context.executemany)
+        self._record(statement, exception_context.parameters, executemany, ms, 0,
+                     error[0] if error else type(exception_context.original_exception).__name__)
+
+    def _record(self, statement, parameters, executemany, ms, rows, error=None):
+        site = call_site() if self.call_sites or ms >= self.slow_ms or error else None
+        sql = normalize(statement)
+        with self.lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                if len(self.statements) >= MAX_STATEMENTS:
+                    sql = "<other>"
+                    stats = self.statements.get(sql)
+                if stats is None:
+                    stats = self.statements[sql] = _StatementStats(sql)
+            stats.count += 1
+            if error is not None:
+                stats.errors += 1
+            stats.total_ms += ms
+            stats.max_ms = max(stats.max_ms, ms)
+            stats.rows += rows
+            if site is not None and (site in stats.call_sites or len(stats.call_sites) < MAX_CALL_SITES):
+                stats.call_sites[site] = stats.call_sites.get(site, 0) + 1
+            for span in getattr(self.local, "spans", ()):
+                span.queries += 1
+                span.query_ms += ms
+            logged = ms >= self.slow_ms or error is not None
+            if ms >= self.slow_ms:
+                stats.slow += 1
+            if logged:
+                entry = {"time": datetime.now().isoformat(timespec="milliseconds"), "ms": round(ms, 1),
+                         "rows": rows, "site": site, "sql": statement.strip(),
+                         "params": repr(parameters)[:500], "executemany": executemany, "error": error}
+                self.slow.append(entry)
+        if logged and self.slow_log:
+            self._log_slow(entry)
+
+    def _log_slow(self, entry):
+        try:
+            directory = os.path.dirname(self.slow_log)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.slow_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass  # never fail a query because the log can't be written
+
+    # --- spans ---
+    @contextmanager
+    def span(self, name):
+        stats = self._span_stats(name)
+        stack = self.local.__dict__.setdefault("spans", [])
+        stack.append(stats)
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stack.pop()
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def _span_stats(self, name):
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = _SpanStats(name)
+            return stats
+
+    def record(self, name, ms):
+        # Add one timing to a span measured by the caller (e.g. across Tk callbacks).
+        stats = self._span_stats(name)
+        with self.lock:
+            stats.count += 1
+            stats.total_ms += ms
+            stats.max_ms = max(stats.max_ms, ms)
+            stats.last_ms = ms
+
+    # --- output ---
+    def snapshot(self):
+        with self.lock:
+            statements = [{"sql": s.sql, "count": s.count, "errors": s.errors, "total_ms": round(s.total_ms, 3),
+                           "avg_ms": round(s.total_ms / s.count, 3) if s.count else 0.0,
+                           "max_ms": round(s.max_ms, 3), "rows": s.rows, "slow": s.slow,
+                           "call_sites": dict(s.call_sites)} for s in self.statements.values()]
+            spans = [{"name": s.name, "count": s.count, "total_ms": round(s.total_ms, 3),
+                      "avg_ms": round(s.total_ms / s.count, 3) if s.count else 0.0,
+                      "max_ms": round(s.max_ms, 3), "last_ms": round(s.last_ms, 3),
+                      "queries": s.queries, "query_ms": round(s.query_ms, 3)} for s in self.spans.values()]
+            slow = list(self.slow)
+        statements.sort(key=lambda s: -s["total_ms"])
+        spans.sort(key=lambda s: s["name"])
+        return {"generated": datetime.now().isoformat(timespec="seconds"),
+                "since": self.since.isoformat(timespec="seconds"), "slow_query_ms": self.slow_ms,
+                "statements": statements, "spans": spans, "slow_queries": slow}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, top=20):
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_, samples):
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        kinds = {}
+        for s in snap["statements"]:
+            kind = s["sql"].split(" ", 1)[0].upper() if s["sql"] else "?"
+            count, total, slow, errors = kinds.get(kind, (0, 0.0, 0, 0))
+            kinds[kind] = (count + s["count"], total + s["total_ms"], slow + s["slow"], errors + s["errors"])
+        metric("ledger_sql_statements_total", "counter", "SQL statements executed.",
+               [({"kind": k}, v[0]) for k, v in sorted(kinds.items())])
+        metric("ledger_sql_seconds_total", "counter", "Time spent executing SQL statements.",
+               [({"kind": k}, round(v[1] / 1000, 6)) for k, v in sorted(kinds.items())])
+        metric("ledger_sql_slow_total", "counter", f"Statements slower than {self.slow_ms:g} ms.",
+               [({"kind": k}, v[2]) for k, v in sorted(kinds.items())])
+        metric("ledger_sql_errors_total", "counter", "Statements that raised an error.",
+               [({"kind": k}, v[3]) for k, v in sorted(kinds.items())])
+        top_statements = snap["statements"][:top]
+        metric("ledger_sql_statement_seconds_total", "counter", "Time per statement (slowest in total).",
+               [({"sql": s["sql"][:120]}, round(s["total_ms"] / 1000, 6)) for s in top_statements])
+        metric("ledger_sql_statement_max_seconds", "gauge", "Slowest single execution per statement.",
+               [({"sql": s["sql"][:120]}, round(s["max_ms"] / 1000, 6)) for s in top_statements])
+        metric("ledger_span_total", "counter", "Completed spans.",
+               [({"span": s["name"]}, s["count"]) for s in snap["spans"]])
+        metric("ledger_span_seconds_total", "counter", "Time spent in spans.",
+               [({"span": s["name"]}, round(s["total_ms"] / 1000, 6)) for s in snap["spans"]])
+        metric("ledger_span_max_seconds", "gauge", "Slowest span.",
+               [({"span": s["name"]}, round(s["max_ms"] / 1000, 6)) for s in snap["spans"]])
+        metric("ledger_span_query_seconds_total", "counter", "SQL time inside spans.",
+               [({"span": s["name"]}, round(s["query_ms"] / 1000, 6)) for s in snap["spans"]])
+        return "\n".join(lines) + "\n"
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+class StatsFlusher:
+    # Writes <dir>/ledger-stats.json and ledger-stats.prom every `interval` seconds.
+    def __init__(self, instrumentation, directory=STATS_DIR, interval=FLUSH_INTERVAL):
+        self.instrumentation = instrumentation
+        self.directory = directory
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="stats-flush", daemon=True)
+        self.thread.start()
+        return self
+
+    def flush(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_atomic(os.path.join(self.directory, "ledger-stats.json"), self.instrumentation.to_json())
+            _write_atomic(os.path.join(self.directory, "ledger-stats.prom"), self.instrumentation.to_prometheus())
+        except OSError:
+            pass
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+# The process-wide instance used by the app and the server.
+stats = Instrumentation()
+
+def install(engine, slow_ms=None, slow_log=None):
+    if slow_ms is not None:
+        stats.slow_ms = slow_ms
+    if slow_log is not None:
+        stats.slow_log = slow_log
+    return stats.install(engine)
+
+def span(name):
+    return stats.span(name)
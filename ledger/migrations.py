@@ -0,0 +1,437 @@
+import argparse
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import (MetaData, Table, Column, Integer, String, Float, DateTime, ForeignKey, Text,
+                        inspect, text)
+
+# -------------------------------
+# Versioned Schema Migrations
+# -------------------------------
+# Every change to the database schema is a numbered, reversible Migration.
+# The versions that have been applied are recorded in the schema_version
+# table, one row per migration, so the current version is simply MAX(version).
+# New migrations are appended to MIGRATIONS with the next free number and
+# must never be renumbered once released.
+
+class MigrationError(Exception):
+    pass
+
+class Migration:
+    def __init__(self, version, description, upgrade, downgrade):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+        self.downgrade = downgrade
+
+    def __repr__(self):
+        return f"<Migration {self.version:04d} {self.description}>"
+
+def index_migration(version, name, table, columns):
+    def upgrade(conn):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+    def downgrade(conn):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    return Migration(version, f"Index {table}({', '.join(columns)})", upgrade, downgrade)
+
+# --- 0001: baseline schema ---
+# A frozen copy of the tables as they were before migrations existed.  It must
+# not follow later model changes; those belong in their own migrations.
+def _baseline_metadata():
+    metadata = MetaData()
+    Table('users', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('username', String(80), unique=True, nullable=False),
+          Column('password', String(200), nullable=False))
+    Table('accounts', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(100), nullable=False),
+          Column('type', String(50), nullable=False),
+          Column('balance', Float))
+    Table('journal_entries', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('date', DateTime),
+          Column('description', String(200)),
+          Column('voucher_type', String(50)))
+    Table('transaction_details', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('journal_entry_id', Integer, ForeignKey('journal_entries.id')),
+          Column('account_id', Integer, ForeignKey('accounts.id')),
+          Column('amount', Float, nullable=False),
+          Column('type', String(10), nullable=False))
+    Table('audit_logs', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('timestamp', DateTime),
+          Column('action', String(100)),
+          Column('details', String(500)))
+    Table('stocks', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('product_name', String(100), nullable=False),
+          Column('quantity', Integer),
+          Column('purchase_price', Float),
+          Column('selling_price', Float),
+          Column('details', Text))
+    return metadata
+
+def _baseline_upgrade(conn):
+    # checkfirst keeps databases created before migrations existed intact.
+    _baseline_metadata().create_all(conn, checkfirst=True)
+
+def _baseline_downgrade(conn):
+    _baseline_metadata().drop_all(conn, checkfirst=True)
+
+# --- 0005: bulk import checkpoints ---
+def _import_checkpoints_table(metadata):
+    return Table('import_checkpoints', metadata,
+                 Column('id', Integer, primary_key=True),
+                 Column('fingerprint', String(64), unique=True, nullable=False),
+                 Column('source', String(500)),
+                 Column('last_line', Integer),
+                 Column('vouchers', Integer),
+                 Column('rejected', Integer),
+                 Column('completed', Integer),
+                 Column('updated_at', DateTime))
+
+def _import_checkpoints_upgrade(conn):
+    _import_checkpoints_table(MetaData()).create(conn, checkfirst=True)
+
+def _import_checkpoints_downgrade(conn):
+    _import_checkpoints_table(MetaData()).drop(conn, checkfirst=True)
+
+# --- 0007: monthly closing balances per account ---
+def _period_balances_table(metadata):
+    return Table('account_period_balances', metadata,
+                 Column('account_id', Integer, ForeignKey('accounts.id'), primary_key=True),
+                 Column('period', Integer, primary_key=True, autoincrement=False),
+                 Column('movement', Float, nullable=False),
+                 Column('closing_balance', Float, nullable=False))
+
+def _period_balances_upgrade(conn):
+    metadata = MetaData()
+    Table('accounts', metadata, Column('id', Integer, primary_key=True))
+    _period_balances_table(metadata).create(conn, checkfirst=True)
+    _rebuild_period_balances(conn)
+
+def _period_balances_downgrade(conn):
+    conn.execute(text("DROP TABLE IF EXISTS account_period_balances"))
+
+def _rebuild_period_balances(conn):
+    # ledger.balances.rebuild_period_balances() as of these migrations, copied
+    # so that replaying them never changes along with that module.
+    if conn.dialect.name == "sqlite":
+        period = "CAST(strftime('%Y%m', je.date) AS INTEGER)"
+    else:
+        period = "CAST(EXTRACT(YEAR FROM je.date) * 100 + EXTRACT(MONTH FROM je.date) AS INTEGER)"
+    conn.execute(text("DELETE FROM account_period_balances"))
+    conn.execute(text(f"""
+        INSERT INTO account_period_balances (account_id, period, movement, closing_balance)
+        SELECT m.account_id, m.period, m.movement,
+               SUM(m.movement) OVER (PARTITION BY m.account_id ORDER BY m.period)
+        FROM (SELECT td.account_id AS account_id, {period} AS period,
+                     SUM(CASE WHEN td.type = 'debit' THEN td.amount ELSE -td.amount END) AS movement
+              FROM transaction_details td JOIN journal_entries je ON je.id = td.journal_entry_id
+              JOIN accounts a ON a.id = td.account_id
+              GROUP BY td.account_id, {period}) AS m
+    """))
+
+# --- 0008+: full-text search ---
+# SQLite FTS5 "external content" tables: the index stores only the tokens and
+# reads the text back from the original table; triggers keep it in sync.
+# Other databases skip these migrations and search falls back to LIKE.
+def fts_migration(version, table, columns):
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new_cols = ", ".join(f"new.{c}" for c in columns)
+    old_cols = ", ".join(f"old.{c}" for c in columns)
+
+    def upgrade(conn):
+        if conn.dialect.name != "sqlite":
+            return
+        conn.execute(text(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}',
+                             content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"""))
+        conn.execute(text(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                                 INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+                             END"""))
+        conn.execute(text(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                                 INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                             END"""))
+        conn.execute(text(f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                                 INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                                 INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+                             END"""))
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+    def downgrade(conn):
+        if conn.dialect.name != "sqlite":
+            return
+        for suffix in ("ai", "ad", "au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{suffix}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {fts}"))
+
+    return Migration(version, f"Full-text index {table}({cols})", upgrade, downgrade)
+
+# --- 0010: account master version counter ---
+# A single row bumped by a trigger whenever an account is added, deleted,
+# renamed or re-typed (balance changes don't count), so every process can tell
+# cheaply whether its cached chart of accounts is stale (see ledger.cache).
+def _account_version_table(metadata):
+    return Table('account_master_version', metadata,
+                 Column('id', Integer, primary_key=True, autoincrement=False),
+                 Column('version', Integer, nullable=False))
+
+_ACCOUNT_VERSION_EVENTS = ("INSERT", "DELETE", "UPDATE OF name, type")
+
+def _account_version_upgrade(conn):
+    table = _account_version_table(MetaData())
+    table.create(conn, checkfirst=True)
+    if conn.execute(text("SELECT COUNT(*) FROM account_master_version")).scalar() == 0:
+        conn.execute(table.insert().values(id=1, version=1))
+    bump = "UPDATE account_master_version SET version = version + 1 WHERE id = 1"
+    if conn.dialect.name == "sqlite":
+        for i, event in enumerate(_ACCOUNT_VERSION_EVENTS):
+            conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS accounts_master_version_{i} AFTER {event} ON accounts "
+                              f"BEGIN {bump}; END"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text(f"""CREATE OR REPLACE FUNCTION bump_account_master_version() RETURNS trigger AS $$
+                             BEGIN {bump}; RETURN NULL; END $$ LANGUAGE plpgsql"""))
+        conn.execute(text("DROP TRIGGER IF EXISTS accounts_master_version ON accounts"))
+        conn.execute(text("CREATE TRIGGER accounts_master_version AFTER INSERT OR DELETE OR UPDATE OF name, type "
+                          "ON accounts FOR EACH STATEMENT EXECUTE FUNCTION bump_account_master_version()"))
+
+def _account_version_downgrade(conn):
+    if conn.dialect.name == "sqlite":
+        for i in range(len(_ACCOUNT_VERSION_EVENTS)):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS accounts_master_version_{i}"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("DROP TRIGGER IF EXISTS accounts_master_version ON accounts"))
+        conn.execute(text("DROP FUNCTION IF EXISTS bump_account_master_version()"))
+    _account_version_table(MetaData()).drop(conn, checkfirst=True)
+
+# --- 0011: optimistic locking on accounts ---
+# A row version for the ORM (ledger.models.Account version_id_col): an account
+# loaded, changed and flushed after someone else changed it raises
+# StaleDataError instead of overwriting the other change.  Posting bumps it
+# with the same atomic UPDATE that moves the balance.
+def _account_row_version_upgrade(conn):
+    if 'version' not in {c['name'] for c in inspect(conn).get_columns('accounts')}:
+        conn.execute(text("ALTER TABLE accounts ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+def _account_row_version_downgrade(conn):
+    conn.execute(text("ALTER TABLE accounts DROP COLUMN version"))
+
+# --- 0012: amounts in minor units ---
+# Every amount column becomes a BIGINT of minor units (see ledger.money):
+# value * 100, rounded.  The factor is frozen here like the baseline schema.
+# The monthly balances are derived data and are rebuilt from the converted
+# lines (with the migrations' own copy of the rebuild), so they add up
+# exactly; account balances are converted as they are (python -m ledger
+# reconcile reports any that disagree with their lines).
+_MONEY_COLUMNS = {"accounts": ["balance"], "transaction_details": ["amount"],
+                  "stocks": ["purchase_price", "selling_price"],
+                  "account_period_balances": ["movement", "closing_balance"]}
+
+def _sqlite_retype(conn, table, columns, sql_type, convert):
+    # SQLite can't change a column's type, so the table is rebuilt from its
+    # own CREATE TABLE statement with the new types: create, copy, drop,
+    # rename, then its indexes and triggers go back on.
+    create = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t"),
+                          {"t": table}).scalar()
+    extras = conn.execute(text("SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') "
+                               "AND tbl_name = :t AND sql IS NOT NULL"), {"t": table}).scalars().all()
+    create = re.sub(rf"^CREATE TABLE\s+\"?{table}\"?", f"CREATE TABLE {table}_new", create, flags=re.I)
+    for column in columns:
+        create, found = re.subn(rf"\b({column}\"?\s+)\w+", rf"\g<1>{sql_type}", create, count=1)
+        if not found:
+            raise MigrationError(f"Column {table}.{column} not found")
+    names = [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+    conn.execute(text(create))
+    conn.execute(text(f"INSERT INTO {table}_new ({', '.join(names)}) "
+                      f"SELECT {', '.join(convert(n) if n in columns else n for n in names)} FROM {table}"))
+    conn.execute(text(f"DROP TABLE {table}"))
+    conn.execute(text(f"ALTER TABLE {table}_new RENAME TO {table}"))
+    for sql in extras:
+        conn.execute(text(sql))
+
+def _retype_money(conn, sql_type, convert):
+    for table, columns in _MONEY_COLUMNS.items():
+        if conn.dialect.name == "sqlite":
+            _sqlite_retype(conn, table, columns, sql_type, convert)
+        else:
+            conn.execute(text(f"ALTER TABLE {table} " + ", ".join(
+                f"ALTER COLUMN {c} TYPE {sql_type} USING {convert(c)}" for c in columns)))
+
+def _minor_units_upgrade(conn):
+    _retype_money(conn, "BIGINT", lambda c: f"CAST(ROUND({c} * 100) AS BIGINT)")
+    _rebuild_period_balances(conn)
+
+def _minor_units_downgrade(conn):
+    _retype_money(conn, "FLOAT" if conn.dialect.name == "sqlite" else "DOUBLE PRECISION", lambda c: f"{c} / 100.0")
+
+# --- 0013: closed fiscal years ---
+# The register of year-end closes (see ledger.fiscal).  It can't be dropped
+# once a year has been closed: the live tables no longer hold that year.
+def _fiscal_years_table(metadata):
+    return Table('fiscal_years', metadata,
+                 Column('year', Integer, primary_key=True, autoincrement=False),
+                 Column('date_from', DateTime, nullable=False),
+                 Column('date_to', DateTime, nullable=False),
+                 Column('status', String(10), nullable=False),
+                 Column('archive', String(500)),
+                 Column('opening_entry_id', Integer),
+                 Column('entries', Integer),
+                 Column('lines', Integer),
+                 Column('closed_at', DateTime))
+
+def _fiscal_years_upgrade(conn):
+    _fiscal_years_table(MetaData()).create(conn, checkfirst=True)
+
+def _fiscal_years_downgrade(conn):
+    if conn.execute(text("SELECT COUNT(*) FROM fiscal_years")).scalar():
+        raise MigrationError("Fiscal years have been closed; their vouchers are only in the archives.")
+    _fiscal_years_table(MetaData()).drop(conn, checkfirst=True)
+
+MIGRATIONS = [
+    Migration(1, "Baseline schema", _baseline_upgrade, _baseline_downgrade),
+    index_migration(2, "ix_transaction_details_account_entry", "transaction_details", ["account_id", "journal_entry_id"]),
+    index_migration(3, "ix_journal_entries_date_type", "journal_entries", ["date", "voucher_type"]),
+    index_migration(4, "ix_audit_logs_timestamp", "audit_logs", ["timestamp"]),
+    Migration(5, "Bulk import checkpoints", _import_checkpoints_upgrade, _import_checkpoints_downgrade),
+    index_migration(6, "ix_transaction_details_entry_lines", "transaction_details", ["journal_entry_id", "account_id", "type", "amount"]),
+    Migration(7, "Monthly account closing balances", _period_balances_upgrade, _period_balances_downgrade),
+    fts_migration(8, "journal_entries", ["description"]),
+    fts_migration(9, "audit_logs", ["action", "details"]),
+    Migration(10, "Account master version counter", _account_version_upgrade, _account_version_downgrade),
+    Migration(11, "Account row version", _account_row_version_upgrade, _account_row_version_downgrade),
+    Migration(12, "Amounts in minor units", _minor_units_upgrade, _minor_units_downgrade),
+    Migration(13, "Closed fiscal years", _fiscal_years_upgrade, _fiscal_years_downgrade),
+]
+
+# -------------------------------
+# Version bookkeeping
+# -------------------------------
+_version_table = Table('schema_version', MetaData(),
+                       Column('version', Integer, primary_key=True, autoincrement=False),
+                       Column('description', String(200)),
+                       Column('applied_at', DateTime))
+
+def _ensure_version_table(conn):
+    _version_table.create(conn, checkfirst=True)
+
+def current_version(bind):
+    with bind.connect() as conn:
+        if not inspect(conn).has_table('schema_version'):
+            return 0
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+def latest_version():
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+def _check_sequence():
+    versions = [m.version for m in MIGRATIONS]
+    if versions != list(range(1, len(versions) + 1)):
+        raise MigrationError(f"Migration versions must be consecutive from 1, got {versions}")
+
+@contextmanager
+def _schema_transaction(bind):
+    # One migration's transaction.  On SQLite, foreign key enforcement is
+    # switched off around it (it can only change outside a transaction), as
+    # SQLite advises for schema changes; rows written before enforcement was
+    # turned on may point at deleted accounts.
+    with bind.connect() as conn:
+        foreign_keys = None
+        if conn.dialect.name == "sqlite":
+            foreign_keys = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+            conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+            conn.commit()
+        try:
+            with conn.begin():
+                yield conn
+        finally:
+            if foreign_keys:
+                conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+                conn.commit()
+
+def upgrade(bind, target=None):
+    # Apply every pending migration up to target (default: latest), each in its
+    # own transaction so a failure leaves the schema at the last good version.
+    _check_sequence()
+    target = latest_version() if target is None else target
+    applied = []
+    for m in MIGRATIONS:
+        if m.version > target:
+            break
+        with _schema_transaction(bind) as conn:
+            _ensure_version_table(conn)
+            done = conn.execute(text("SELECT 1 FROM schema_version WHERE version = :v"), {"v": m.version}).first()
+            if done:
+                continue
+            m.upgrade(conn)
+            conn.execute(_version_table.insert().values(version=m.version, description=m.description,
+                                                        applied_at=datetime.utcnow()))
+        applied.append(m)
+    return applied
+
+def downgrade(bind, target):
+    # Revert applied migrations newer than target, newest first.
+    _check_sequence()
+    if target < 0:
+        raise MigrationError("Target version cannot be negative.")
+    reverted = []
+    for m in reversed(MIGRATIONS):
+        if m.version <= target:
+            break
+        with _schema_transaction(bind) as conn:
+            _ensure_version_table(conn)
+            done = conn.execute(text("SELECT 1 FROM schema_version WHERE version = :v"), {"v": m.version}).first()
+            if not done:
+                continue
+            m.downgrade(conn)
+            conn.execute(_version_table.delete().where(_version_table.c.version == m.version))
+        reverted.append(m)
+    return reverted
+
+def history(bind):
+    with bind.connect() as conn:
+        if not inspect(conn).has_table('schema_version'):
+            return []
+        return conn.execute(_version_table.select().order_by(_version_table.c.version)).all()
+
+# -------------------------------
+# Command line: python -m ledger.migrations
+# -------------------------------
+def main(argv=None):
+    from ledger.db import DATABASE_URL, make_engine
+
+    parser = argparse.ArgumentParser(prog="python -m ledger.migrations", description="Manage the ledger database schema.")
+    parser.add_argument("--url", default=DATABASE_URL, help="SQLAlchemy database URL")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("upgrade", help="apply pending migrations")
+    up.add_argument("--to", type=int, default=None, help="target version (default: latest)")
+    down = sub.add_parser("downgrade", help="revert migrations")
+    down.add_argument("--to", type=int, required=True, help="target version")
+    sub.add_parser("current", help="print the current schema version")
+    sub.add_parser("history", help="list applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    engine = make_engine(args.url)
+    if args.command == "upgrade":
+        for m in upgrade(engine, args.to):
+            print(f"Applied {m.version:04d}: {m.description}")
+    elif args.command == "downgrade":
+        for m in downgrade(engine, args.to):
+            print(f"Reverted {m.version:04d}: {m.description}")
+    elif args.command == "current":
+        print(current_version(engine))
+    else:
+        applied = {row.version: row for row in history(engine)}
+        for m in MIGRATIONS:
+            row = applied.get(m.version)
+            state = f"applied {row.applied_at:%Y-%m-%d %H:%M:%S}" if row else "pending"
+            print(f"{m.version:04d}  {m.description:<60} {state}")
+    print(f"Schema version: {current_version(engine)} (latest {latest_version()})")
+
+if __name__ == '__main__':
+    main()
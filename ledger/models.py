@@ -0,0 +1,106 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy.orm import relationship, declarative_base
+from datetime import datetime
+
+from ledger.money import Money
+
+# -------------------------------
+# Database Models
+# -------------------------------
+# The schema itself is created and evolved by ledger.migrations; these
+# classes only describe it to the ORM.  Money columns hold whole minor units
+# (see ledger.money).
+Base = declarative_base()
+
+# --- User model ---
+class User(Base):
+    __tablename__ = 'users'
+    id       = Column(Integer, primary_key=True)
+    username = Column(String(80), unique=True, nullable=False)
+    password = Column(String(200), nullable=False)
+
+# --- Account model ---
+class Account(Base):
+    __tablename__ = 'accounts'
+    id      = Column(Integer, primary_key=True)
+    name    = Column(String(100), nullable=False)
+    type    = Column(String(50), nullable=False)  # Typical types: Asset, Liability, Equity, Revenue, Expense, Stock
+    balance = Column(Money, default=0)
+    version = Column(Integer, nullable=False, default=1)  # bumped by every change, see ledger.migrations 0011
+    __mapper_args__ = {"version_id_col": version}
+
+# --- Journal Entry / Voucher model ---
+class JournalEntry(Base):
+    __tablename__ = 'journal_entries'
+    id           = Column(Integer, primary_key=True)
+    date         = Column(DateTime, default=datetime.utcnow)
+    description  = Column(String(200))
+    voucher_type = Column(String(50), default="Journal")  # e.g., Journal, Payment, Receipt, Contra, Debit Note, Credit Note
+    transactions = relationship('TransactionDetail', back_populates='journal_entry')
+
+# --- Transaction Details ---
+class TransactionDetail(Base):
+    __tablename__ = 'transaction_details'
+    id               = Column(Integer, primary_key=True)
+    journal_entry_id = Column(Integer, ForeignKey('journal_entries.id'))
+    account_id       = Column(Integer, ForeignKey('accounts.id'))
+    amount           = Column(Money, nullable=False)
+    type             = Column(String(10), nullable=False)  # debit or credit
+    journal_entry    = relationship('JournalEntry', back_populates='transactions')
+
+# --- Audit Log ---
+class AuditLog(Base):
+    __tablename__ = 'audit_logs'
+    id        = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    action    = Column(String(100))
+    details   = Column(String(500))
+
+# --- Stock Management ---
+class Stock(Base):
+    __tablename__ = 'stocks'
+    id             = Column(Integer, primary_key=True)
+    product_name   = Column(String(100), nullable=False)
+    quantity       = Column(Integer, default=0)
+    purchase_price = Column(Money, default=0)
+    selling_price  = Column(Money, default=0)
+    details        = Column(Text)
+
+# --- Bulk import progress (one row per source file) ---
+class ImportCheckpoint(Base):
+    __tablename__ = 'import_checkpoints'
+    id          = Column(Integer, primary_key=True)
+    fingerprint = Column(String(64), unique=True, nullable=False)  # identifies the source file contents
+    source      = Column(String(500))
+    last_line   = Column(Integer, default=0)  # last source line included in a committed chunk
+    vouchers    = Column(Integer, default=0)
+    rejected    = Column(Integer, default=0)
+    completed   = Column(Integer, default=0)
+    updated_at  = Column(DateTime, default=datetime.utcnow)
+
+# --- Closing balance of each account per calendar month (period = YYYYMM) ---
+class AccountPeriodBalance(Base):
+    __tablename__ = 'account_period_balances'
+    account_id      = Column(Integer, ForeignKey('accounts.id'), primary_key=True)
+    period          = Column(Integer, primary_key=True, autoincrement=False)
+    movement        = Column(Money, nullable=False, default=0)  # net debit - credit within the month
+    closing_balance = Column(Money, nullable=False, default=0)  # balance at the end of the month
+
+# --- Chart of accounts version, bumped by triggers on accounts (single row) ---
+class AccountMasterVersion(Base):
+    __tablename__ = 'account_master_version'
+    id      = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=1)
+
+# --- Fiscal years closed or being closed (see ledger.fiscal, ledger.yearend) ---
+class FiscalYear(Base):
+    __tablename__ = 'fiscal_years'
+    year             = Column(Integer, primary_key=True, autoincrement=False)  # calendar year the fiscal year starts in
+    date_from        = Column(DateTime, nullable=False)  # first instant of the year
+    date_to          = Column(DateTime, nullable=False)  # first instant after it
+    status           = Column(String(10), nullable=False)  # closing, closed
+    archive          = Column(String(500))  # archive file (SQLite) or schema (PostgreSQL)
+    opening_entry_id = Column(Integer)  # opening balances voucher in the live tables
+    entries          = Column(Integer)  # vouchers moved to the archive
+    lines            = Column(Integer)
+    closed_at        = Column(DateTime)
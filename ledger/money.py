@@ -0,0 +1,63 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+# -------------------------------
+# Money in Minor Units
+# -------------------------------
+# Amounts are stored as whole numbers of minor units (paisa, cents) in BIGINT
+# columns: transaction_details.amount, accounts.balance, the monthly movements
+# and closing balances, and stock prices (see migration 0012).  Integer sums
+# are exact however many lines are added, and the database aggregates them
+# without floating point.
+#
+# Inside ledger, amounts read from the database stay in minor units and are
+# only converted at the edges:
+#     to_minor(value)  amount typed or imported in units (str, float, Decimal,
+#                      int) -> int minor units, rounded half up
+#     to_units(minor)  -> float units, for reports, JSON and display; exact to
+#                      the last digit shown, as the value is divided only once
+
+MINOR_UNITS = 100
+
+def to_minor(value):
+    # Raises ValueError for anything that isn't a finite number.
+    if isinstance(value, int):
+        return value * MINOR_UNITS
+    try:
+        units = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Not an amount: {value!r}") from None
+    if not units.is_finite():
+        raise ValueError(f"Not an amount: {value!r}")
+    return int((units * MINOR_UNITS).to_integral_value(ROUND_HALF_UP))
+
+def to_units(minor):
+    # PostgreSQL returns SUM(bigint) as a Decimal; NULL counts as zero.
+    return int(minor or 0) / MINOR_UNITS
+
+class Money(TypeDecorator):
+    # A BIGINT of minor units.  Anything but a whole number is refused, so an
+    # amount in units can't be written by mistake (SQLite would store a float
+    # in the column without complaint).
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, Decimal) and value == value.to_integral_value():
+            return int(value)
+        raise TypeError(f"Money columns hold whole minor units, got {value!r} (see ledger.money.to_minor)")
+
+class MoneyUnits(Money):
+    # The same column seen in units, for the legacy screens (main.py, app.py)
+    # that add up and display ORM attributes directly.
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_minor(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else to_units(value)
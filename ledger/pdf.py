@@ -0,0 +1,260 @@
+import os
+import time
+import zlib
+from collections import namedtuple
+from datetime import date, datetime
+
+# -------------------------------
+# Streaming Table PDF Writer
+# -------------------------------
+# Renders a table from any iterable of rows straight to a PDF file, one page
+# at a time: each finished page is compressed and written out, and only the
+# file offsets of the PDF objects are kept, so a 500-page ledger needs no more
+# memory than a one-page report.  (ReportLab's canvas keeps every page until
+# save(), which is why this writes the PDF objects itself.)  Text uses the
+# standard Helvetica fonts; ReportLab is only used for their glyph widths.
+#
+# Columns are typed: "text" and "date" are left-aligned (long text is cut to
+# fit), "int" and "amount" right-aligned, amounts as 1,234.56.  Every page
+# repeats the title and column headings, and when some columns are totalled,
+# ends with the page subtotal; the last page also gets the grand total.
+#
+# Besides plain rows (sequences of values, one per column) the rows may
+# contain Heading("Expenses") lines and Total("Total Expense", values) rows.
+
+Column = namedtuple("Column", "title width kind total", defaults=("text", False))
+
+Heading = namedtuple("Heading", "text")
+Total = namedtuple("Total", "label values")
+
+PAGE_SIZES = {"letter": (612.0, 792.0), "a4": (595.28, 841.89)}
+MARGIN = 36.0
+FONT_SIZE = 8.5
+LEADING = 11.0
+TITLE_SIZE = 12.0
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "(": "\\(", ")": "\\)"})
+
+def _escape(value):
+    # PDF string escapes; the page is encoded to cp1252 (WinAnsi) when written.
+    return value.translate(_ESCAPES)
+
+def format_value(value, kind):
+    if value is None or value == "":
+        return ""
+    if kind == "amount":
+        return f"{round(value, 2) + 0.0:,.2f}"  # + 0.0 turns -0.00 into 0.00
+    if kind == "int":
+        return f"{value:,}" if isinstance(value, int) else str(value)
+    if kind == "date" and isinstance(value, (date, datetime)):
+        return f"{value:%Y-%m-%d}"
+    return str(value)
+
+class TablePDF:
+    def __init__(self, path, title, columns, subtitle=None, page_size="letter", landscape=False):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        self._string_width = stringWidth
+        self._glyphs = {False: {}, True: {}}  # bold -> {char: width at 1pt}
+        self.path = path
+        self.title = title
+        self.subtitle = subtitle
+        width, height = PAGE_SIZES[page_size]
+        self.page_width, self.page_height = (height, width) if landscape else (width, height)
+        self.columns = [c if isinstance(c, Column) else Column(*c) for c in columns]
+        # Column widths are relative; scale them to the printable width.
+        usable = self.page_width - 2 * MARGIN
+        scale = usable / sum(c.width for c in self.columns)
+        self.widths = [c.width * scale for c in self.columns]
+        self.lefts = [MARGIN + sum(self.widths[:i]) for i in range(len(self.widths))]
+        self.totalled = any(c.total for c in self.columns)
+        self.file = open(path, "wb")
+        self.offsets = {}  # object number -> file offset
+        self.page_objects = []
+        self.next_object = 5  # 1 catalog, 2 page tree, 3-4 fonts
+        self.rows = 0
+        self.grand = [0.0] * len(self.columns)
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        for number, font in ((3, b"Helvetica"), (4, b"Helvetica-Bold")):
+            self._object(number, b"<< /Type /Font /Subtype /Type1 /BaseFont /" + font +
+                         b" /Encoding /WinAnsiEncoding >>")
+        self._new_page()
+
+    # --- low-level PDF objects ---
+    def _write(self, data):
+        self.file.write(data)
+
+    def _object(self, number, body):
+        self.offsets[number] = self.file.tell()
+        self._write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _allocate(self):
+        number = self.next_object
+        self.next_object += 1
+        return number
+
+    # --- page layout ---
+    def _new_page(self):
+        self.ops = []
+        self.page_totals = [0.0] * len(self.columns)
+        self.page_rows = 0
+        y = self.page_height - MARGIN - TITLE_SIZE
+        self._text(MARGIN, y, self.title, bold=True, size=TITLE_SIZE)
+        self._text_right(self.page_width - MARGIN, y, f"Page {len(self.page_objects) + 1}")
+        if self.subtitle:
+            y -= LEADING + 2
+            self._text(MARGIN, y, self.subtitle)
+        y -= LEADING * 2
+        for i, col in enumerate(self.columns):
+            self._cell(i, y, col.title, bold=True, kind=col.kind)
+        self._rule(y - 3)
+        self.y = y - LEADING - 2
+        # Room left at the bottom for the page subtotal.
+        self.bottom = MARGIN + (LEADING * 2 if self.totalled else 0)
+
+    def _finish_page(self, subtotal=True):
+        if self.totalled and subtotal:
+            self._rule(self.y + LEADING - 3)
+            self._total_row("Page subtotal", self._totals(self.page_totals))
+        stream = zlib.compress("\n".join(self.ops).encode("cp1252", "replace"))
+        content = self._allocate()
+        self._object(content, f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode() +
+                     stream + b"\nendstream")
+        page = self._allocate()
+        self._object(page, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.page_width:.2f} {self.page_height:.2f}] "
+                            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {content} 0 R >>").encode())
+        self.page_objects.append(page)
+
+    def _text(self, x, y, value, bold=False, size=FONT_SIZE):
+        self.ops.append(f"BT /{'F2' if bold else 'F1'} {size:g} Tf {x:.2f} {y:.2f} Td ({_escape(value)}) Tj ET")
+
+    def _text_right(self, x, y, value, bold=False, size=FONT_SIZE):
+        self._text(x - self._width(value, bold, size), y, value, bold, size)
+
+    def _glyph_widths(self, value, bold):
+        # Per-character widths, looked up once per character and font.
+        glyphs = self._glyphs[bold]
+        widths = []
+        for char in value:
+            width = glyphs.get(char)
+            if width is None:
+                width = glyphs[char] = self._string_width(char, "Helvetica-Bold" if bold else "Helvetica", 1)
+            widths.append(width)
+        return widths
+
+    def _width(self, value, bold=False, size=FONT_SIZE):
+        try:
+            return sum(map(self._glyphs[bold].__getitem__, value)) * size
+        except KeyError:
+            return sum(self._glyph_widths(value, bold)) * size
+
+    def _fit(self, value, room, bold):
+        # value, or as much of it as fits followed by "...".  No Helvetica
+        # glyph is wider than the font size, so short values are never measured.
+        if len(value) * FONT_SIZE <= room or self._width(value, bold) <= room:
+            return value
+        widths = self._glyph_widths(value, bold)
+        room = room / FONT_SIZE - sum(self._glyph_widths("...", bold))
+        used = 0.0
+        for end, width in enumerate(widths):
+            used += width
+            if used > room:
+                return value[:end] + "..."
+        return value
+
+    def _cell(self, i, y, value, bold=False, kind=None):
+        if not value:
+            return
+        kind = kind or self.columns[i].kind
+        value = self._fit(value, self.widths[i] - 4, bold)
+        if kind in ("amount", "int"):
+            self._text_right(self.lefts[i] + self.widths[i] - 2, y, value, bold)
+        else:
+            self._text(self.lefts[i] + 2, y, value, bold)
+
+    def _rule(self, y):
+        self.ops.append(f"0.5 w {MARGIN:.2f} {y:.2f} m {self.page_width - MARGIN:.2f} {y:.2f} l S")
+
+    def _total_row(self, label, values):
+        # The label runs across the columns up to the first value.
+        filled = [i for i, value in enumerate(values) if value is not None and i > 0]
+        right = self.lefts[filled[0]] if filled else self.page_width - MARGIN
+        self._text(MARGIN + 2, self.y, self._fit(label, right - MARGIN - 4, True), bold=True)
+        for i in filled:
+            self._cell(i, self.y, format_value(values[i], self.columns[i].kind), bold=True)
+        self.y -= LEADING
+
+    def _totals(self, totals):
+        return [total if col.total else None for col, total in zip(self.columns, totals)]
+
+    def _room(self, lines=1):
+        if self.y - LEADING * (lines - 1) < self.bottom:
+            self._finish_page()
+            self._new_page()
+
+    # --- rows ---
+    def add(self, row):
+        if isinstance(row, Heading):
+            self._room(2)
+            self.y -= LEADING / 2
+            self._text(MARGIN + 2, self.y, row.text, bold=True, size=FONT_SIZE + 1)
+            self.y -= LEADING
+            return
+        if isinstance(row, Total):
+            self._room()
+            self._rule(self.y + LEADING - 3)
+            self._total_row(row.label, row.values)
+            return
+        self._room()
+        for i, (col, value) in enumerate(zip(self.columns, row)):
+            self._cell(i, self.y, format_value(value, col.kind))
+            if col.total and value:
+                self.page_totals[i] += value
+                self.grand[i] += value
+        self.y -= LEADING
+        self.rows += 1
+        self.page_rows += 1
+
+    def close(self):
+        if self.totalled:
+            # Page subtotal, then the grand total below it on the last page
+            # (only the total when everything fits on one page).
+            single = not self.page_objects
+            self._room(2 if single else 3)
+            self._rule(self.y + LEADING - 3)
+            if not single:
+                self._total_row("Page subtotal", self._totals(self.page_totals))
+            self._total_row("Total", self._totals(self.grand))
+        self._finish_page(subtotal=False)
+        kids = " ".join(f"{n} 0 R" for n in self.page_objects)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_objects)} >>".encode())
+        info = self._allocate()
+        self._object(info, f"<< /Producer (ledger.pdf) /Title ({_escape(self.title)}) >>".encode("cp1252", "replace"))
+        xref = self.file.tell()
+        count = self.next_object
+        self._write(f"xref\n0 {count}\n0000000000 65535 f \n".encode())
+        for number in range(1, count):
+            self._write(f"{self.offsets[number]:010d} 00000 n \n".encode())
+        self._write(f"trailer\n<< /Size {count} /Root 1 0 R /Info {info} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+        self.file.close()
+
+def write_table_pdf(path, title, columns, rows, subtitle=None, progress=None, page_size="letter", landscape=False):
+    # Returns {"pages", "rows", "bytes", "seconds"}.  progress(rows_done, None,
+    # message) is called once per page; it may raise to abort the export.
+    started = time.perf_counter()
+    pdf = TablePDF(path, title, columns, subtitle, page_size, landscape)
+    try:
+        pages = 0
+        for row in rows:
+            pdf.add(row)
+            if progress and len(pdf.page_objects) != pages:
+                pages = len(pdf.page_objects)
+                progress(pdf.rows, None, f"Writing PDF... page {pages + 1}")
+        pdf.close()
+    except BaseException:
+        pdf.file.close()
+        os.remove(path)
+        raise
+    return {"pages": len(pdf.page_objects), "rows": pdf.rows, "bytes": os.path.getsize(path),
+            "seconds": time.perf_counter() - started}
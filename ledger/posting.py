@@ -0,0 +1,168 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, update
+
+from ledger import bulk, fiscal
+from ledger.balances import apply_period_deltas, period_deltas
+from ledger.models import Account, JournalEntry, TransactionDetail, AuditLog
+from ledger.money import to_minor
+
+# -------------------------------
+# Voucher Posting Engine
+# -------------------------------
+# A voucher is a plain dict:
+#     {"voucher_type": "Payment", "description": "...", "date": datetime (optional),
+#      "lines": [{"account_id": 1, "amount": 100.0, "type": "debit"}, ...]}
+# post_vouchers() validates a whole batch up front and then writes the headers,
+# lines, balance changes, monthly closing balances and audit rows in one
+# database transaction: either every voucher in the batch is posted or none is.
+# Amounts come in units and are posted in minor units (see ledger.money), so
+# debits and credits must agree exactly once rounded to the minor unit.
+# Vouchers dated in a closed fiscal year are refused (see ledger.fiscal).
+
+DESCRIPTION_LENGTH = JournalEntry.__table__.c.description.type.length
+VOUCHER_TYPE_LENGTH = JournalEntry.__table__.c.voucher_type.type.length
+
+class PostingError(ValueError):
+    pass
+
+def validate_voucher(voucher):
+    # Same rules the voucher entry screen has always enforced, plus the column
+    # lengths (SQLite ignores them, PostgreSQL rejects longer values).  Returns
+    # a copy of the voucher with every amount in minor units.
+    description = (voucher.get("description") or "").strip()
+    if not description:
+        raise PostingError("Please provide a voucher description.")
+    if len(description) > DESCRIPTION_LENGTH:
+        raise PostingError(f"The description is too long (at most {DESCRIPTION_LENGTH} characters).")
+    if len(voucher.get("voucher_type") or "") > VOUCHER_TYPE_LENGTH:
+        raise PostingError(f"The voucher type is too long (at most {VOUCHER_TYPE_LENGTH} characters).")
+    lines = []
+    total_debit = 0
+    total_credit = 0
+    for line in voucher.get("lines") or []:
+        if line.get("type") not in ("debit", "credit"):
+            raise PostingError("Transaction type must be 'debit' or 'credit'.")
+        try:
+            amount = to_minor(line["amount"])
+        except (KeyError, ValueError):
+            raise PostingError("Please enter a valid amount.")
+        if line["type"] == "debit":
+            total_debit += amount
+        else:
+            total_credit += amount
+        lines.append(dict(line, amount=amount))
+    if len(lines) < 2:
+        raise PostingError("At least two transactions are required.")
+    if total_debit != total_credit:
+        raise PostingError("Total debits must equal total credits.")
+    return dict(voucher, lines=lines)
+
+def check_books_open(voucher, closed_until):
+    # closed_until: fiscal.books_closed_until(), read by the caller once per
+    # batch.  Undated vouchers are posted now, which is always open.
+    date = voucher.get("date")
+    if closed_until is not None and date is not None and date < closed_until:
+        raise PostingError(f"The books are closed before {closed_until:%Y-%m-%d}; "
+                           f"{date:%Y-%m-%d} is in a closed fiscal year.")
+
+def balance_deltas(vouchers):
+    # Net change per account for a batch of validated vouchers (amounts in
+    # minor units): debits increase, credits decrease.
+    deltas = defaultdict(int)
+    for voucher in vouchers:
+        for line in voucher["lines"]:
+            deltas[line["account_id"]] += line["amount"] if line["type"] == "debit" else -line["amount"]
+    return deltas
+
+def post_voucher(session, voucher, commit=True):
+    return post_vouchers(session, [voucher], commit=commit)[0]
+
+def post_vouchers(session, vouchers, commit=True):
+    # Returns the new voucher ids in input order.  With commit=False the caller
+    # owns the transaction (e.g. to record an import checkpoint alongside it).
+    validated = []
+    for index, voucher in enumerate(vouchers):
+        try:
+            validated.append(validate_voucher(voucher))
+        except PostingError as e:
+            if len(vouchers) == 1:
+                raise
+            raise PostingError(f"Voucher {index + 1}: {e}") from None
+    vouchers = validated
+    if not vouchers:
+        return []
+
+    deltas = balance_deltas(vouchers)
+    try:
+        # One query for every account the batch touches.
+        found = {row.id for row in session.query(Account.id).filter(Account.id.in_(list(deltas)))}
+        missing = sorted(set(deltas) - found)
+        if missing:
+            raise PostingError(f"Unknown account id(s): {', '.join(str(m) for m in missing)}")
+
+        now = datetime.utcnow()
+        headers = [{"date": v.get("date") or now, "description": v["description"].strip(),
+                    "voucher_type": v.get("voucher_type") or "Journal"} for v in vouchers]
+        if bulk.use_copy(session, len(vouchers)):
+            # Ids first, then every row goes in with COPY.
+            for header, entry_id in zip(headers, bulk.reserve_ids(session, JournalEntry.__table__, len(headers))):
+                header["id"] = entry_id
+            bulk.copy_rows(session, JournalEntry.__table__, headers)
+        else:
+            entries = [JournalEntry(**header) for header in headers]
+            session.add_all(entries)
+            session.flush()  # assigns ids inside the transaction; nothing is committed yet
+            for header, entry in zip(headers, entries):
+                header["id"] = entry.id
+        # Checked once the headers are in: a year-end close holds the table
+        # lock until it commits, so a batch that waited for it sees the year
+        # as closed.  Callers check earlier too (importer, writer queue); this
+        # is what catches a close that started in between.
+        closed_until = fiscal.books_closed_until(session)
+        for index, header in enumerate(headers):
+            try:
+                check_books_open(header, closed_until)
+            except PostingError as e:
+                if len(headers) == 1:
+                    raise
+                raise PostingError(f"Voucher {index + 1}: {e}") from None
+
+        bulk.insert_rows(session, TransactionDetail.__table__, [
+            {"journal_entry_id": header["id"], "account_id": line["account_id"],
+             "amount": line["amount"], "type": line["type"]}
+            for header, voucher in zip(headers, vouchers) for line in voucher["lines"]
+        ])
+        # One aggregated UPDATE per touched account, executed as a single
+        # executemany; in account id order, so concurrent writers on a server
+        # database lock the rows in the same order and can't deadlock.  The
+        # balance is never read and written back, so concurrent postings can't
+        # lose each other's changes; the row version tells ORM code that holds
+        # an older copy of the account (see ledger.models.Account).
+        accounts = Account.__table__
+        session.execute(
+            update(accounts)
+            .where(accounts.c.id == bindparam("account_id"))
+            .values(balance=func.coalesce(accounts.c.balance, 0) + bindparam("delta"),
+                    version=accounts.c.version + 1),
+            [{"account_id": acc_id, "delta": delta} for acc_id, delta in sorted(deltas.items())]
+        )
+        apply_period_deltas(session, period_deltas(vouchers, now))
+        bulk.insert_rows(session, AuditLog.__table__, [
+            {"timestamp": now, "action": "Voucher Entry",
+             "details": f"Voucher ID {h['id']} ({h['voucher_type']}) created: {h['description']}"}
+            for h in headers
+        ])
+        # Balances changed behind the ORM's back; make loaded accounts reload.
+        for key, obj in list(session.identity_map.items()):
+            if key[0] is Account and key[1][0] in deltas:
+                session.expire(obj, ["balance", "version"])
+        ids = [header["id"] for header in headers]
+        if commit:
+            session.commit()
+        return ids
+    except Exception:
+        if commit:
+            session.rollback()
+        raise
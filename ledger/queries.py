@@ -0,0 +1,232 @@
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import DateTime, bindparam, text
+
+from ledger import fiscal
+from ledger.balances import balances_as_of
+from ledger.money import to_minor, to_units
+
+# -------------------------------
+# Account Ledger (running balance, keyset pagination)
+# -------------------------------
+# Ledger lines are ordered by (voucher date, line id).  A page is fetched
+# "after" a cursor -- the (date, line id, running balance) of the last row of
+# the previous page -- so every page costs the same no matter how deep the
+# user has scrolled, and the running balance continues from the cursor.
+# The running balance is summed in minor units in SQL; rows and cursors carry
+# units.  From a cursor inside a closed fiscal year, the archives and the live
+# tables are read as one ledger (see ledger.fiscal.line_sources).
+
+LEDGER_PAGE_SIZE = 500
+
+LedgerRow = namedtuple("LedgerRow", "line_id voucher_id date voucher_type description debit credit balance")
+LedgerCursor = namedtuple("LedgerCursor", "date line_id balance")
+LedgerPage = namedtuple("LedgerPage", "opening rows cursor")
+
+_LINES_SQL = """SELECT td.id AS line_id, je.id AS voucher_id, je.date AS date,
+                 je.voucher_type AS voucher_type, je.description AS description,
+                 CASE WHEN td.type = 'debit' THEN td.amount ELSE 0 END AS debit,
+                 CASE WHEN td.type = 'credit' THEN td.amount ELSE 0 END AS credit
+          FROM {p}transaction_details td JOIN {p}journal_entries je ON je.id = td.journal_entry_id
+          WHERE td.account_id = :account_id
+            AND (je.date > :after_date OR (je.date = :after_date AND td.id > :after_id)){skip}"""
+
+@lru_cache(maxsize=64)
+def _page_sql(sources=(("", ""),)):
+    # sources: fiscal.line_sources() -- more than one when the page reaches
+    # back into closed years, read as one list in date order.
+    lines = "\n          UNION ALL\n          ".join(_LINES_SQL.format(p=p, skip=skip) for p, skip in sources)
+    return text(f"""
+    SELECT line_id, voucher_id, date, voucher_type, description, debit, credit,
+           :opening + SUM(debit - credit) OVER (ORDER BY date, line_id
+                                                ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS balance
+    FROM ({lines}
+          ORDER BY date, line_id
+          LIMIT :limit) AS page
+    ORDER BY date, line_id
+""").bindparams(bindparam("after_date", type_=DateTime)).columns(date=DateTime)
+
+def opening_balance(session, account_id, date_from=None):
+    if date_from is None:
+        return 0.0
+    return to_units(balances_as_of(session, date_from).get(account_id, 0))
+
+def first_cursor(session, account_id, date_from=None):
+    # Cursor positioned just before the first line on or after date_from.
+    # date_from is an inclusive datetime (e.g. midnight of the first day).
+    start = date_from or datetime(1, 1, 1)
+    return LedgerCursor(start, 0, opening_balance(session, account_id, date_from))
+
+def ledger_page(session, account_id, cursor, limit=LEDGER_PAGE_SIZE):
+    # Returns LedgerPage(opening, rows, next_cursor); next_cursor is None once
+    # the last line has been read.  `opening` is the balance carried into the
+    # page, i.e. cursor.balance.
+    sql = _page_sql(tuple(fiscal.line_sources(session, cursor.date)))
+    rows = [LedgerRow(line_id, voucher_id, date, voucher_type, description,
+                      to_units(debit), to_units(credit), to_units(balance))
+            for line_id, voucher_id, date, voucher_type, description, debit, credit, balance in session.execute(
+                sql, {"account_id": account_id, "after_date": cursor.date, "after_id": cursor.line_id,
+                      "opening": to_minor(cursor.balance), "limit": limit})]
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = LedgerCursor(last.date, last.line_id, last.balance)
+    return LedgerPage(cursor.balance, rows, next_cursor)
+
+# -------------------------------
+# Paged data sources for large lists
+# -------------------------------
+# The list screens read rows through this small interface, so they never hold
+# more than a few pages in memory:
+#     count()                                   -> total number of rows
+#     fetch(offset, limit, sort, descending, after) -> raw rows (tuples)
+#     format_row(row)                           -> display values
+#     sortable(column)                          -> whether ORDER BY column is allowed
+# `after` is the last raw row of the previous page when the caller has it;
+# sources use it to seek instead of skipping `offset` rows.
+
+class PagedQuery:
+    def __init__(self, session, table, columns, where=None, params=None, default_sort=None,
+                 descending=False, keyset=("id",), formatters=None):
+        # columns: [(key, sql expression)], the first one being the unique id.
+        self.session = session
+        self.table = table
+        self.columns = columns
+        self.keys = [key for key, _ in columns]
+        self.where = where
+        self.params = params or {}
+        self.default_sort = default_sort or self.keys[0]
+        self.default_descending = descending
+        self.keyset = set(keyset)  # NOT NULL columns that can be used to seek
+        self.formatters = formatters or {}
+        self._exprs = dict(columns)
+
+    def sortable(self, column):
+        return column in self._exprs
+
+    def count(self):
+        sql = f"SELECT COUNT(*) FROM {self.table}"
+        if self.where:
+            sql += f" WHERE {self.where}"
+        return self.session.execute(text(sql), self.params).scalar()
+
+    def fetch(self, offset, limit, sort=None, descending=None, after=None):
+        sort = sort or self.default_sort
+        descending = self.default_descending if descending is None else descending
+        sort_expr, id_expr = self._exprs[sort], self.columns[0][1]
+        order = "DESC" if descending else "ASC"
+        op = "<" if descending else ">"
+        conditions = [self.where] if self.where else []
+        params = dict(self.params, limit=limit)
+        if after is not None and sort in self.keyset:
+            last_sort, last_id = after[self.keys.index(sort)], after[0]
+            if sort == self.keys[0]:
+                conditions.append(f"{id_expr} {op} :after_id")
+            else:
+                conditions.append(f"({sort_expr} {op} :after_sort OR ({sort_expr} = :after_sort AND {id_expr} {op} :after_id))")
+            params.update(after_sort=last_sort, after_id=last_id)
+            offset_sql = ""
+        else:
+            offset_sql = " OFFSET :offset"
+            params["offset"] = offset
+        sql = f"SELECT {', '.join(expr for _, expr in self.columns)} FROM {self.table}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(f"({c})" for c in conditions)
+        sql += f" ORDER BY {sort_expr} {order}, {id_expr} {order} LIMIT :limit{offset_sql}"
+        return [tuple(row) for row in self.session.execute(text(sql), params)]
+
+    def format_row(self, row):
+        return tuple(self.formatters[key](value) if key in self.formatters and value is not None else value
+                     for key, value in zip(self.keys, row))
+
+def _money(value):
+    return f"{to_units(value):.2f}"
+
+def _timestamp(value):
+    return str(value)[:19]
+
+def accounts_source(session):
+    return PagedQuery(session, "accounts", [("ID", "id"), ("Name", "name"), ("Type", "type"), ("Balance", "balance")],
+                      keyset=("ID", "Name", "Type"), formatters={"Balance": _money})
+
+def stock_source(session):
+    return PagedQuery(session, "stocks", [("ID", "id"), ("Product Name", "product_name"), ("Quantity", "quantity"),
+                                          ("Purchase Price", "purchase_price"), ("Selling Price", "selling_price")],
+                      keyset=("ID", "Product Name"), formatters={"Purchase Price": _money, "Selling Price": _money})
+
+def audit_source(session, where=None, params=None):
+    return PagedQuery(session, "audit_logs", [("ID", "id"), ("Timestamp", "timestamp"), ("Action", "action"), ("Details", "details")],
+                      where=where, params=params, default_sort="Timestamp", descending=True, keyset=("ID", "Timestamp"),
+                      formatters={"Timestamp": _timestamp})
+
+class LedgerSource:
+    # One account's ledger: row 0 is the opening balance, then the lines in
+    # date order with their running balance.  Lines are read with ledger_page();
+    # the cursor at the start of every page is remembered, so jumping to any
+    # offset walks forward at most once.  `start` is first_cursor() when the
+    # caller has already computed it (e.g. on a background thread).
+    def __init__(self, session, account_id, date_from=None, page_size=LEDGER_PAGE_SIZE, start=None):
+        self.session = session
+        self.account_id = account_id
+        self.date_from = date_from
+        self.page_size = page_size
+        self.cursors = {0: start or first_cursor(session, account_id, date_from)}
+
+    def sortable(self, column):
+        return False  # the running balance only makes sense in date order
+
+    def count(self):
+        total = 0
+        for p, skip in fiscal.line_sources(self.session, self.date_from):
+            sql = f"""SELECT COUNT(*) FROM {p}transaction_details td JOIN {p}journal_entries je ON je.id = td.journal_entry_id
+                     WHERE td.account_id = :account_id{skip}"""
+            params = {"account_id": self.account_id}
+            if self.date_from is not None:
+                sql += " AND je.date >= :date_from"
+                params["date_from"] = self.date_from
+            stmt = text(sql).bindparams(bindparam("date_from", type_=DateTime)) if self.date_from is not None else text(sql)
+            total += self.session.execute(stmt, params).scalar()
+        return 1 + total
+
+    def fetch(self, offset, limit, sort=None, descending=None, after=None):
+        rows = []
+        if offset == 0:
+            rows.append(("opening", None, "", "Opening Balance", 0.0, 0.0, self.cursors[0].balance))
+            limit -= 1
+        else:
+            offset -= 1
+        start, end = offset, offset + limit
+        page_index = max(i for i in self.cursors if i <= start // self.page_size)
+        while page_index * self.page_size < end:
+            cursor = self.cursors.get(page_index)
+            if cursor is None:
+                break
+            page = ledger_page(self.session, self.account_id, cursor, self.page_size)
+            if page.cursor is not None:
+                self.cursors[page_index + 1] = page.cursor
+            base = page_index * self.page_size
+            for i, row in enumerate(page.rows):
+                if start <= base + i < end:
+                    rows.append((row.line_id, row.date, row.voucher_type, row.description, row.debit, row.credit, row.balance))
+            page_index += 1
+        return rows
+
+    def format_row(self, row):
+        line_id, date, voucher_type, description, debit, credit, balance = row
+        return (date.strftime("%Y-%m-%d") if date else "", voucher_type, description,
+                f"{debit:.2f}" if debit else "", f"{credit:.2f}" if credit else "", f"{balance:.2f}")
+
+# -------------------------------
+# Dashboard
+# -------------------------------
+DashboardSummary = namedtuple("DashboardSummary", "accounts vouchers stock_items last_voucher")
+
+def dashboard_summary(session):
+    # last_voucher is (description, voucher_type, date) or None.
+    counts = session.execute(text("SELECT (SELECT COUNT(*) FROM accounts), (SELECT COUNT(*) FROM journal_entries), "
+                                  "(SELECT COUNT(*) FROM stocks)")).one()
+    last = session.execute(text("SELECT description, voucher_type, date FROM journal_entries "
+                                "ORDER BY date DESC, id DESC LIMIT 1").columns(date=DateTime)).first()
+    return DashboardSummary(*counts, tuple(last) if last else None)
@@ -0,0 +1,208 @@
+import argparse
+import sys
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from ledger.balances import rebuild_period_balances, signed_amount_sql
+from ledger.db import DATABASE_URL, init_db, make_engine
+from ledger.money import to_units
+from ledger.report_pack import pool_context
+
+# -------------------------------
+# Balance Reconciliation
+# -------------------------------
+#     python -m ledger reconcile                 report only
+#     python -m ledger reconcile --fix           also correct the balances
+#     python -m ledger reconcile --workers 8 --chunk 2000000
+#
+# accounts.balance and the monthly closing balances are running totals kept
+# by posting; this recomputes them from transaction_details and reports every
+# account where they disagree, plus lines whose account no longer exists.
+#
+# The lines are read in chunks of --chunk ids, one GROUP BY account_id per
+# chunk (a range scan of the primary key), so memory holds one sum per account
+# whatever the size of the table.  With --workers the chunks are summed by a
+# process pool.  All reads see one snapshot: on SQLite the workers stop at the
+# highest line id visible when the balances were read (ids are handed out in
+# commit order, as there is one writer at a time); on PostgreSQL they join the
+# coordinator's exported snapshot.
+#
+# --fix corrects each account by its discrepancy -- balance = balance - (balance
+# - sum of lines) as of the snapshot -- in one transaction.  Postings made
+# since the snapshot moved the balance and the lines by the same amount, so
+# the fix is right without stopping the other terminals.  Monthly closing
+# balances are rebuilt from the lines when any of them is off.
+#
+# Amounts are whole minor units (see ledger.money), so a balance either
+# matches the sum of its lines exactly or it is wrong.
+
+CHUNK_LINES = 250_000
+
+Discrepancy = namedtuple("Discrepancy", "account_id name balance lines closing difference")  # minor units
+
+_chunk_sql = text(f"""
+    SELECT td.account_id, SUM({signed_amount_sql()}), COUNT(*)
+    FROM transaction_details td
+    WHERE td.id > :low AND td.id <= :high
+    GROUP BY td.account_id
+""")
+
+def sum_chunk(session, low, high):
+    # {account_id: (sum, lines)} for the lines with low < id <= high.
+    return {account_id: (int(total or 0), count) for account_id, total, count in session.execute(
+        _chunk_sql, {"low": low, "high": high})}
+
+# --- worker side ---
+_session_factory = None
+
+def _init_worker(url):
+    global _session_factory
+    _session_factory = sessionmaker(bind=make_engine(url, readonly=True))
+
+def _sum_chunk(low, high, snapshot):
+    with _session_factory() as session:
+        if snapshot:
+            session.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot}'"))
+        return sum_chunk(session, low, high)
+
+# --- coordinator ---
+def _chunks(low, high, size):
+    while low < high:
+        yield low, min(low + size, high)
+        low += size
+
+def reconcile(url, workers=1, chunk=CHUNK_LINES, progress=None):
+    # Returns a dict with the discrepancies, orphan lines and timings.
+    # progress(lines_done, lines_total, message) is called after each chunk.
+    started = time.perf_counter()
+    engine = make_engine(url, readonly=True)
+    sums = defaultdict(int)
+    counts = defaultdict(int)
+    try:
+        with sessionmaker(bind=engine)() as session:
+            snapshot = None
+            if engine.dialect.name == "postgresql" and workers > 1:
+                snapshot = session.execute(text("SELECT pg_export_snapshot()")).scalar()
+            accounts = {row[0]: (row[1], int(row[2] or 0)) for row in session.execute(
+                text("SELECT id, name, balance FROM accounts"))}
+            closing = {account_id: int(balance) for account_id, balance in session.execute(text("""
+                SELECT p.account_id, p.closing_balance FROM account_period_balances p
+                WHERE p.period = (SELECT MAX(q.period) FROM account_period_balances q
+                                  WHERE q.account_id = p.account_id)
+            """))}
+            low, high = session.execute(text("SELECT COALESCE(MIN(id), 1) - 1, COALESCE(MAX(id), 0) "
+                                             "FROM transaction_details")).one()
+            ranges = list(_chunks(low, high, chunk))
+            total = high - low
+            done = 0
+
+            def add(result, chunk_range):
+                nonlocal done
+                for account_id, (amount, count) in result.items():
+                    sums[account_id] += amount
+                    counts[account_id] += count
+                done += chunk_range[1] - chunk_range[0]
+                if progress:
+                    progress(done, total, f"Reconciling... {done:,} of {total:,} line ids")
+
+            if workers > 1 and len(ranges) > 1:
+                with ProcessPoolExecutor(workers, mp_context=pool_context(), initializer=_init_worker,
+                                         initargs=(url,)) as pool:
+                    futures = [(pool.submit(_sum_chunk, lo, hi, snapshot), (lo, hi)) for lo, hi in ranges]
+                    for future, chunk_range in futures:
+                        add(future.result(), chunk_range)
+            else:
+                workers = 1
+                for lo, hi in ranges:
+                    add(sum_chunk(session, lo, hi), (lo, hi))
+    finally:
+        engine.dispose()
+
+    discrepancies = []
+    for account_id, (name, balance) in sorted(accounts.items()):
+        lines = sums.get(account_id, 0)
+        last = closing.get(account_id, 0)
+        if balance != lines or last != lines:
+            discrepancies.append(Discrepancy(account_id, name, balance, lines, last, balance - lines))
+    orphans = {account_id: (sums[account_id], counts[account_id]) for account_id in sums if account_id not in accounts}
+    return {"accounts": len(accounts), "lines": sum(counts.values()), "max_line_id": high,
+            "discrepancies": discrepancies, "orphans": orphans, "workers": workers,
+            "seconds": time.perf_counter() - started}
+
+def fix_balances(url, result):
+    # Applies the corrections of reconcile() in one write transaction and
+    # returns (balances corrected, whether the monthly balances were rebuilt).
+    wrong_balance = [d for d in result["discrepancies"] if d.difference]
+    wrong_closing = any(d.closing != d.lines for d in result["discrepancies"])
+    if not wrong_balance and not wrong_closing:
+        return 0, False
+    engine = make_engine(url)
+    try:
+        with engine.begin() as conn:
+            if wrong_balance:
+                conn.execute(text("UPDATE accounts SET balance = COALESCE(balance, 0) - :difference, "
+                                  "version = version + 1 WHERE id = :id"),
+                             [{"id": d.account_id, "difference": d.difference} for d in wrong_balance])
+            if wrong_closing:
+                rebuild_period_balances(conn)
+            conn.execute(text("INSERT INTO audit_logs (timestamp, action, details) VALUES (:now, :action, :details)"),
+                         {"now": datetime.utcnow(), "action": "Balances Reconciled",
+                          "details": f"{len(wrong_balance)} account balance(s) corrected"
+                                     + ("; monthly balances rebuilt" if wrong_closing else "")})
+    finally:
+        engine.dispose()
+    return len(wrong_balance), wrong_closing
+
+def print_report(result, out=sys.stdout):
+    print(f"Checked {result['accounts']:,} accounts against {result['lines']:,} lines "
+          f"in {result['seconds']:.1f} s ({result['workers']} worker{'s' if result['workers'] != 1 else ''}, "
+          f"{result['lines'] / max(result['seconds'], 1e-9):,.0f} lines/s).", file=out)
+    discrepancies = result["discrepancies"]
+    if discrepancies:
+        print(f"\n{len(discrepancies)} account(s) out of balance:", file=out)
+        print("{:<6} {:<30} {:>16} {:>16} {:>16} {:>14}".format(
+            "ID", "Name", "Balance", "Sum of lines", "Last closing", "Difference"), file=out)
+        for d in discrepancies:
+            print("{:<6} {:<30} {:>16,.2f} {:>16,.2f} {:>16,.2f} {:>14,.2f}".format(
+                d.account_id, d.name[:30], to_units(d.balance), to_units(d.lines), to_units(d.closing),
+                to_units(d.difference)), file=out)
+    else:
+        print("All account balances and monthly closing balances agree with the lines.", file=out)
+    if result["orphans"]:
+        print(f"\n{len(result['orphans'])} missing account(s) still have lines (not fixed automatically):", file=out)
+        for account_id, (amount, count) in sorted(result["orphans"].items(), key=lambda item: str(item[0])):
+            print(f"  account {account_id}: {count:,} lines, net {to_units(amount):,.2f}", file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ledger.reconcile",
+                                     description="Check account balances against the ledger lines.")
+    parser.add_argument("--url", default=DATABASE_URL, help="SQLAlchemy database URL")
+    parser.add_argument("--fix", action="store_true", help="correct the balances that disagree")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes summing the chunks")
+    parser.add_argument("--chunk", type=int, default=CHUNK_LINES, help="line ids per chunk")
+    args = parser.parse_args(argv)
+
+    init_db(make_engine(args.url))
+
+    def progress(done, total, message):
+        print(f"\r{message}", end="", file=sys.stderr, flush=True)
+
+    result = reconcile(args.url, args.workers, args.chunk, progress if sys.stderr.isatty() else None)
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    print_report(result)
+    if args.fix:
+        started = time.perf_counter()
+        corrected, rebuilt = fix_balances(args.url, result)
+        print(f"\nFixed: {corrected} account balance(s) corrected"
+              + (", monthly balances rebuilt" if rebuilt else "") + f" in {time.perf_counter() - started:.1f} s.")
+        return 1 if result["orphans"] else 0
+    return 1 if result["discrepancies"] or result["orphans"] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+from collections import namedtuple
+
+from ledger import reports
+from ledger.pdf import Column, Heading, Total, format_value
+
+# -------------------------------
+# Report Model
+# -------------------------------
+# A statement is computed once (ledger.reports) and turned into a Report:
+# typed columns, titled sections of rows and the total lines.  Every output
+# renders from that one object -- the reports screen (through ReportSource),
+# text, CSV, JSON, XLSX and PDF (ledger.export) -- so exporting a report that
+# is on screen never queries the database again.
+#
+# report.lines() yields the report top to bottom as plain rows, Heading(title)
+# before each titled section and Total(label, values) for the totals, which is
+# exactly what ledger.pdf consumes; the other exporters use it too.
+
+Section = namedtuple("Section", "title rows")
+
+TITLES = {"trial_balance": "TRIAL BALANCE", "income_statement": "INCOME STATEMENT",
+          "balance_sheet": "BALANCE SHEET"}
+
+AMOUNT_COLUMNS = [Column("ID", 6), Column("Name", 34), Column("Type", 20), Column("Amount", 16, "amount")]
+TRIAL_BALANCE_COLUMNS = [Column("ID", 6), Column("Name", 30), Column("Type", 16),
+                         Column("Opening", 14, "amount", True), Column("Movement", 14, "amount", True),
+                         Column("Closing", 14, "amount", True)]
+
+class Report:
+    def __init__(self, kind, period, columns, sections, totals=(), notes=(), summary=None):
+        self.kind = kind
+        self.title = TITLES[kind]
+        self.period = period
+        self.columns = columns
+        self.sections = sections
+        self.totals = list(totals)  # [(label, values)], values aligned with columns
+        self.notes = list(notes)  # extra lines printed below the totals
+        self.summary = summary or {}  # the statement's own totals, by key (for JSON)
+
+    def lines(self):
+        for section in self.sections:
+            if section.title:
+                yield Heading(section.title)
+            yield from section.rows
+        for label, values in self.totals:
+            yield Total(label, values)
+
+    def row_count(self):
+        return sum(len(section.rows) for section in self.sections)
+
+def _amount_rows(lines):
+    return [(line.id, line.name, line.type, line.amount) for line in lines]
+
+def _amount_total(label, value):
+    return (label, [None, None, None, value])
+
+def trial_balance_report(tb):
+    rows = [(l.id, l.name, l.type, l.opening, l.movement, l.closing) for l in tb["lines"]]
+    totals = [sum(row[i] for row in rows) for i in (3, 4, 5)]
+    return Report("trial_balance", tb["period"], TRIAL_BALANCE_COLUMNS, [Section(None, rows)],
+                  [("Total", [None, None, None] + totals)], summary={"total": tb["total"]})
+
+def income_statement_report(stmt):
+    net = stmt["net_result"]
+    sections = [Section("Revenues", _amount_rows(stmt["revenues"])),
+                Section("Expenses", _amount_rows(stmt["expenses"]))]
+    totals = [_amount_total("Total Revenue", stmt["total_revenue"]),
+              _amount_total("Total Expense", stmt["total_expense"]),
+              _amount_total("Net Profit c/d" if net >= 0 else "Net Loss c/d", abs(net))]
+    summary = {key: stmt[key] for key in ("total_revenue", "total_expense", "net_result")}
+    return Report("income_statement", stmt["period"], AMOUNT_COLUMNS, sections, totals, summary=summary)
+
+def balance_sheet_report(bs):
+    sections = [Section("Assets", _amount_rows(bs["assets"])),
+                Section("Liabilities & Equity", _amount_rows(bs["liabilities"] + bs["equity"]))]
+    totals = [_amount_total("Total Assets", bs["total_assets"]),
+              _amount_total("Total Liabilities", bs["total_liabilities"]),
+              _amount_total("Total Equity", bs["total_equity"])]
+    summary = {key: bs[key] for key in ("total_assets", "total_liabilities", "total_equity", "balanced")}
+    return Report("balance_sheet", bs["period"], AMOUNT_COLUMNS, sections, totals,
+                  [f"Accounting Equation Valid: {bs['balanced']}"], summary=summary)
+
+BUILDERS = {"trial_balance": trial_balance_report, "income_statement": income_statement_report,
+            "balance_sheet": balance_sheet_report}
+
+def build_report(session, kind, date_from=None, date_to=None):
+    # The balance sheet is a position: only date_to applies.
+    if kind == "balance_sheet":
+        return balance_sheet_report(reports.balance_sheet(session, date_to))
+    return BUILDERS[kind](getattr(reports, kind)(session, date_from, date_to))
+
+# -------------------------------
+# Data source for the reports screen
+# -------------------------------
+# The paged data-source interface of ledger.queries, over report.lines(), so
+# the screen shows a report in a VirtualTreeview.  Section headings, totals and
+# notes are rows of their own, labelled in the widest text column.
+
+class ReportSource:
+    def __init__(self, report):
+        self.report = report
+        self.rows = list(report.lines()) + [Heading(note) for note in report.notes]
+        text_columns = [i for i, c in enumerate(report.columns) if c.kind == "text"]
+        self.label_column = max(text_columns, key=lambda i: report.columns[i].width) if text_columns else 0
+
+    def sortable(self, column):
+        return False  # sections and totals only make sense in report order
+
+    def count(self):
+        return len(self.rows)
+
+    def fetch(self, offset, limit, sort=None, descending=None, after=None):
+        return self.rows[offset:offset + limit]
+
+    def format_row(self, row):
+        columns = self.report.columns
+        if isinstance(row, Heading):
+            values = [""] * len(columns)
+            values[self.label_column] = row.text
+        elif isinstance(row, Total):
+            values = [format_value(v, c.kind) if v is not None else "" for c, v in zip(columns, row.values)]
+            values += [""] * (len(columns) - len(values))
+            values[self.label_column] = row.label
+        else:
+            values = [format_value(v, c.kind) for c, v in zip(columns, row)]
+        return tuple(values)
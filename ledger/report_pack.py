@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from collections import defaultdict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from ledger import export, fiscal, report_model, reports
+from ledger.db import DATABASE_URL, make_engine
+
+# -------------------------------
+# Report Pack: many reports for one period, rendered in parallel
+# -------------------------------
+#     python -m ledger pack --from 2025-01-01 --to 2025-12-31 -o pack-2025.zip
+#     python -m ledger pack trial_balance balance_sheet --ledgers 12 14 -o pack/ --format pdf xlsx
+#
+# A pack is a list of jobs -- the statements and the account ledgers -- run on
+# a process pool, one job per file, so rendering uses every CPU core instead of
+# the one the GIL allows.  Each worker process opens its own read-only engine
+# (ledger.db.make_engine(readonly=True)) once and reads every job through it.
+# The biggest ledgers are submitted first so the pool doesn't end up waiting on
+# one long ledger started last.
+#
+# The files go to a directory, or into a zip when the output ends in .zip,
+# with a manifest.json listing each file (report, rows, pages, bytes, seconds,
+# sha256) and the total wall time.
+
+STATEMENTS = list(report_model.TITLES)
+FORMATS = ("pdf", "xlsx", "csv")
+MANIFEST = "manifest.json"
+
+Job = namedtuple("Job", "kind account_id account_name file weight")
+
+_slug_re = re.compile(r"[^a-z0-9]+")
+
+def _slug(name):
+    return _slug_re.sub("-", name.lower()).strip("-") or "account"
+
+def pool_context():
+    # spawn, never fork: the pack is started from the app's worker threads,
+    # and a forked child could inherit a lock (logging, connection pool,
+    # instrumentation) another thread was holding.  Spawned workers import
+    # ledger.report_pack and the caller's main script, so scripts keep their
+    # start-up under "if __name__ == '__main__'" (see revised.py).
+    return multiprocessing.get_context("spawn")
+
+def ledger_accounts(session, date_from=None, date_to=None, account_ids=None):
+    # [(id, name, lines in the period)] of the accounts with lines, biggest
+    # first, counting the lines of closed years in their archives too.
+    params = {"start": reports.day_start(date_from) if date_from else datetime(1, 1, 1),
+              "end": reports.day_end(date_to) if date_to else datetime(9999, 1, 1)}
+    counts, names = defaultdict(int), {}
+    for p, skip in fiscal.line_sources(session, params["start"] if date_from else None):
+        for account_id, name, n in session.execute(text(f"""
+            SELECT a.id, a.name, COUNT(*) AS n
+            FROM {p}transaction_details td
+            JOIN {p}journal_entries je ON je.id = td.journal_entry_id
+            JOIN {p}accounts a ON a.id = td.account_id
+            WHERE je.date >= :start AND je.date < :end{skip}
+            GROUP BY a.id, a.name
+        """), params):
+            counts[account_id] += n
+            names[account_id] = name  # the live tables come last: current name
+    rows = sorted(((account_id, names[account_id], n) for account_id, n in counts.items()),
+                  key=lambda row: (-row[2], row[0]))
+    if account_ids is not None:
+        wanted = set(account_ids)
+        found = {row[0] for row in rows}
+        missing = sorted(wanted - found)
+        if missing:
+            raise ValueError(f"No ledger lines in the period for account(s): {', '.join(map(str, missing))}")
+        rows = [row for row in rows if row[0] in wanted]
+    return [tuple(row) for row in rows]
+
+def plan_pack(session, statements, ledgers, date_from=None, date_to=None, formats=("pdf",)):
+    # ledgers: None for none, "all", or a list of account ids.  Ledgers are
+    # written as PDF; statements in every format asked for.
+    jobs = []
+    for kind in statements:
+        for fmt in formats:
+            # A statement costs about as much as a small ledger.
+            jobs.append(Job(kind, None, None, f"{kind}.{fmt}", 1000))
+    if ledgers:
+        account_ids = None if ledgers == "all" else ledgers
+        for account_id, name, lines in ledger_accounts(session, date_from, date_to, account_ids):
+            jobs.append(Job("ledger", account_id, name, f"ledgers/{account_id:04d}-{_slug(name)}.pdf", lines))
+    jobs.sort(key=lambda job: -job.weight)
+    return jobs
+
+# --- worker side ---
+_session_factory = None
+
+def _init_worker(url):
+    global _session_factory
+    _session_factory = sessionmaker(bind=make_engine(url, readonly=True))
+
+def _render(job, directory, date_from, date_to):
+    path = os.path.join(directory, job.file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    started = time.perf_counter()
+    session = _session_factory()
+    try:
+        if job.kind == "ledger":
+            result = export.write_ledger_pdf(session, job.account_id, job.account_name, path, date_from,
+                                             date_to=date_to)
+        else:
+            report = report_model.build_report(session, job.kind, date_from, date_to)
+            ext = os.path.splitext(path)[1]
+            result = export.FILE_EXPORTERS[ext](report, path) or {"rows": report.row_count()}
+    finally:
+        session.close()
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return {"file": job.file, "report": job.kind, "account_id": job.account_id, "account": job.account_name,
+            "rows": result.get("rows"), "pages": result.get("pages"), "bytes": os.path.getsize(path),
+            "seconds": round(time.perf_counter() - started, 3), "sha256": digest.hexdigest()}
+
+# --- driver ---
+def _zip_directory(directory, zip_path):
+    # PDFs and workbooks are compressed already; only the rest is deflated.
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                compress = zipfile.ZIP_STORED if name.endswith((".pdf", ".xlsx")) else zipfile.ZIP_DEFLATED
+                zf.write(path, os.path.relpath(path, directory).replace(os.sep, "/"), compress_type=compress)
+
+def run_pack(url, jobs, output, date_from=None, date_to=None, workers=None, progress=None):
+    # Renders the jobs of plan_pack() and returns the manifest.  progress(done,
+    # total, message) is called as files are finished (and every half second
+    # meanwhile); it may raise to cancel -- jobs not started yet are dropped
+    # and the partial output removed.
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    as_zip = output.lower().endswith(".zip")
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".pack-", dir=parent)
+    started = time.perf_counter()
+    files = []
+    pool = ProcessPoolExecutor(workers, mp_context=pool_context(), initializer=_init_worker, initargs=(url,))
+    try:
+        pending = {pool.submit(_render, job, staging, date_from, date_to) for job in jobs}
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                files.append(future.result())
+            if progress:
+                last = files[-1]["file"] if files else ""
+                progress(len(files), len(jobs), f"Report pack: {len(files)}/{len(jobs)} files {last}")
+        pool.shutdown()
+    except BaseException:
+        pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    files.sort(key=lambda entry: entry["file"])
+    manifest = {"generated": datetime.now().isoformat(timespec="seconds"),
+                "period": reports.period_label(date_from, date_to),
+                "date_from": f"{date_from:%Y-%m-%d}" if date_from else None,
+                "date_to": f"{date_to:%Y-%m-%d}" if date_to else None,
+                "workers": workers, "wall_seconds": round(time.perf_counter() - started, 3),
+                "cpu_seconds": round(sum(entry["seconds"] for entry in files), 3),
+                "files": files}
+    with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    try:
+        if as_zip:
+            _zip_directory(staging, output)
+        else:
+            os.makedirs(output, exist_ok=True)
+            for name in os.listdir(staging):
+                target = os.path.join(output, name)
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                os.replace(os.path.join(staging, name), target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return manifest
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}' (expected YYYY-MM-DD)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ledger.report_pack",
+                                     description="Render several reports for one period in parallel.")
+    parser.add_argument("statements", nargs="*", metavar="STATEMENT",
+                        help=f"statements to include (default: all of {', '.join(STATEMENTS)})")
+    parser.add_argument("--url", default=DATABASE_URL, help="SQLAlchemy database URL")
+    parser.add_argument("--from", dest="date_from", type=_date, default=None, help="YYYY-MM-DD (inclusive)")
+    parser.add_argument("--to", dest="date_to", type=_date, default=None, help="YYYY-MM-DD (inclusive)")
+    parser.add_argument("--ledgers", nargs="*", type=int, default=None, metavar="ID",
+                        help="add account ledgers: the given ids, or every account with lines if none given")
+    parser.add_argument("--format", dest="formats", nargs="+", choices=FORMATS, default=["pdf"],
+                        help="statement formats (ledgers are always PDF)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("-o", "--output", required=True, help="output directory, or a .zip file")
+    args = parser.parse_args(argv)
+    unknown = [kind for kind in args.statements if kind not in STATEMENTS]
+    if unknown:
+        parser.error(f"unknown statement(s): {', '.join(unknown)} (choose from {', '.join(STATEMENTS)})")
+
+    statements = args.statements or STATEMENTS
+    ledgers = None if args.ledgers is None else (args.ledgers or "all")
+    engine = make_engine(args.url, readonly=True)
+    try:
+        with sessionmaker(bind=engine)() as session:
+            jobs = plan_pack(session, statements, ledgers, args.date_from, args.date_to, args.formats)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        engine.dispose()
+
+    def progress(done, total, message):
+        print(f"\r{message[:100]:<100}", end="", file=sys.stderr, flush=True)
+
+    manifest = run_pack(args.url, jobs, args.output, args.date_from, args.date_to, args.workers, progress)
+    print(file=sys.stderr)
+    print(f"{len(manifest['files'])} files in {manifest['wall_seconds']:.2f} s with {manifest['workers']} "
+          f"workers ({manifest['cpu_seconds']:.2f} s of rendering): {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from ledger.balances import balances_as_of, closing_movements
+from ledger.cache import account_cache
+from ledger.money import to_units
+
+# -------------------------------
+# Financial Statements
+# -------------------------------
+# Every statement accepts an optional period: date_from / date_to are dates
+# (both inclusive); None means "from the beginning" / "up to now".  Amounts are
+# computed in SQL from the monthly snapshots plus aggregate queries over the
+# partial months, never by loading Account or TransactionDetail objects.
+# Amounts keep the ledger's sign convention: debits positive, credits negative.
+# Balances and totals are added up in minor units and converted to units
+# once, on the way out, so totals are exact.
+#
+# Periods reaching back into closed fiscal years read the archives (see
+# ledger.fiscal).  Balances include the year-end closing vouchers, so the
+# balance sheet and trial balance after a year end show the result in equity;
+# the income statement leaves them out and shows what was earned.
+
+REVENUE_TYPES = ["Revenue", "Discount Received"]
+EXPENSE_TYPES = ["Expense", "Discount Allowed", "Depreciation", "Bad Debt"]
+
+ReportLine = namedtuple("ReportLine", "id name type amount")
+TrialBalanceLine = namedtuple("TrialBalanceLine", "id name type opening movement closing")
+
+def day_start(value):
+    return datetime(value.year, value.month, value.day)
+
+def day_end(value):
+    # Exclusive upper bound for an inclusive date.
+    return day_start(value) + timedelta(days=1)
+
+def period_label(date_from=None, date_to=None):
+    if date_from and date_to:
+        return f"From {date_from:%Y-%m-%d} to {date_to:%Y-%m-%d}"
+    if date_to:
+        return f"As of {date_to:%Y-%m-%d}"
+    if date_from:
+        return f"From {date_from:%Y-%m-%d}"
+    return "All dates"
+
+def _accounts(session, types=None):
+    # (id, name, type) in id order, from the shared account master cache.
+    cache = account_cache(session.get_bind())
+    return cache.of_type(*types) if types else cache.all()
+
+def closing_balances(session, date_to=None):
+    # {account_id: minor units} at the end of date_to, or the live balances.
+    if date_to is None:
+        return {row[0]: int(row[1] or 0) for row in session.execute(text("SELECT id, balance FROM accounts"))}
+    return balances_as_of(session, day_end(date_to))
+
+def period_movements(session, date_from=None, date_to=None):
+    # Net movement per account within the period: closing minus opening
+    # balance, less what the year-end closing vouchers in it moved.
+    closing = closing_balances(session, date_to)
+    opening = balances_as_of(session, day_start(date_from)) if date_from else {}
+    closed = closing_movements(session, day_start(date_from) if date_from else None,
+                               day_end(date_to) if date_to else None)
+    return {acc: closing.get(acc, 0) - opening.get(acc, 0) - closed.get(acc, 0) for acc in closing}
+
+def trial_balance(session, date_from=None, date_to=None):
+    # Opening balance at the start of the period (zero for an open start),
+    # net movement within it and closing balance at its end.
+    closing = closing_balances(session, date_to)
+    opening = balances_as_of(session, day_start(date_from)) if date_from else {}
+    lines = []
+    total = 0
+    for acc_id, name, acc_type in _accounts(session):
+        o, c = opening.get(acc_id, 0), closing.get(acc_id, 0)
+        lines.append(TrialBalanceLine(acc_id, name, acc_type, to_units(o), to_units(c - o), to_units(c)))
+        total += c
+    return {"period": period_label(date_from, date_to), "lines": lines, "total": to_units(total)}
+
+def _report_lines(session, types, amounts):
+    # ([ReportLine] in units, total in minor units) for the accounts of these types.
+    accounts = _accounts(session, types)
+    return ([ReportLine(a, n, t, to_units(amounts.get(a, 0))) for a, n, t in accounts],
+            sum(amounts.get(a, 0) for a, _, _ in accounts))
+
+def income_statement(session, date_from=None, date_to=None):
+    movements = period_movements(session, date_from, date_to)
+    revenues, total_rev = _report_lines(session, REVENUE_TYPES, movements)
+    expenses, total_exp = _report_lines(session, EXPENSE_TYPES, movements)
+    return {"period": period_label(date_from, date_to), "revenues": revenues, "expenses": expenses,
+            "total_revenue": to_units(total_rev), "total_expense": to_units(total_exp),
+            "net_result": to_units(total_rev - total_exp)}
+
+def balance_sheet(session, date_to=None):
+    closing = closing_balances(session, date_to)
+    sections, totals = {}, {}
+    for key, acc_type in (("assets", "Asset"), ("liabilities", "Liability"), ("equity", "Equity")):
+        sections[key], totals[key] = _report_lines(session, [acc_type], closing)
+    return dict(sections, period=period_label(None, date_to), total_assets=to_units(totals["assets"]),
+                total_liabilities=to_units(totals["liabilities"]), total_equity=to_units(totals["equity"]),
+                balanced=totals["assets"] == totals["liabilities"] + totals["equity"])
@@ -0,0 +1,112 @@
+import re
+
+from sqlalchemy import DateTime, text
+
+# -------------------------------
+# Full-text search over vouchers and audit logs
+# -------------------------------
+# Uses the FTS5 indexes created by migrations 8 and 9 (journal_entries_fts,
+# audit_logs_fts).  Free text is turned into an FTS query where every word must
+# match and the last one may be a prefix (search as you type): "acme pay" finds
+# "ACME Supplies payment".  Only the last word is a prefix because expanding
+# long prefixes costs far more than looking up whole terms.  Results are
+# ranked by bm25 and paged with the same data-source interface as
+# ledger.queries.PagedQuery, so the search screen shows them in a
+# VirtualTreeview.  Without FTS5 (another database, or an older schema) the
+# same filters run as LIKE '%word%' conditions, newest first.
+#
+# Archived audit rows (see ledger.archive) are not searched.
+
+_word_re = re.compile(r"\w+", re.UNICODE)
+
+def fts_query(value):
+    # 'acme "pay' -> '"acme" "pay"*'; None when there is nothing to search for.
+    words = [f'"{word}"' for word in _word_re.findall(value or "")]
+    if not words:
+        return None
+    return " ".join(words) + "*"
+
+def has_fts(session, table):
+    if session.get_bind().dialect.name != "sqlite":
+        return False
+    return session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                           {"name": f"{table}_fts"}).first() is not None
+
+class SearchSource:
+    def __init__(self, session, table, columns, text_columns, search, date_column,
+                 date_from=None, date_to=None, filters=None, formatters=None, types=None, fts=True):
+        # columns: [(key, sql expression over alias t)]; the first one is the id.
+        # types: {result column: SQLAlchemy type}, e.g. DateTime for the date
+        # SQLite returns as text.
+        # date_from is inclusive, date_to exclusive (datetimes).  fts=False
+        # forces the LIKE fallback (benchmarks).
+        self.session = session
+        self.keys = [key for key, _ in columns]
+        self.formatters = formatters or {}
+        self.types = types or {}
+        self.params = {}
+        conditions = []
+        query = fts_query(search)
+        fts_table = f"{table}_fts"
+        self.use_fts = fts and query is not None and has_fts(session, table)
+        if self.use_fts:
+            source = f"{fts_table} JOIN {table} t ON t.id = {fts_table}.rowid"
+            conditions.append(f"{fts_table} MATCH :query")
+            self.params["query"] = query
+            self.order = f"{fts_table}.rank"
+        else:
+            source = f"{table} t"
+            for i, word in enumerate(_word_re.findall(search or "")):
+                conditions.append("(" + " OR ".join(f"LOWER(t.{c}) LIKE :w{i}" for c in text_columns) + ")")
+                self.params[f"w{i}"] = f"%{word.lower()}%"
+            self.order = f"t.{date_column} DESC, t.id DESC"
+        if date_from is not None:
+            conditions.append(f"t.{date_column} >= :date_from")
+            self.params["date_from"] = f"{date_from:%Y-%m-%d %H:%M:%S}"
+        if date_to is not None:
+            conditions.append(f"t.{date_column} < :date_to")
+            self.params["date_to"] = f"{date_to:%Y-%m-%d %H:%M:%S}"
+        for i, (column, value) in enumerate((filters or {}).items()):
+            if value:
+                conditions.append(f"t.{column} = :f{i}")
+                self.params[f"f{i}"] = value
+        self.from_where = source + (" WHERE " + " AND ".join(conditions) if conditions else "")
+        self.select = ", ".join(expr for _, expr in columns)
+        self._count = None
+
+    def sortable(self, column):
+        return False  # ranked results
+
+    def count(self):
+        if self._count is None:
+            self._count = self.session.execute(text(f"SELECT COUNT(*) FROM {self.from_where}"), self.params).scalar()
+        return self._count
+
+    def fetch(self, offset, limit, sort=None, descending=None, after=None):
+        sql = f"SELECT {self.select} FROM {self.from_where} ORDER BY {self.order} LIMIT :limit OFFSET :offset"
+        return [tuple(row) for row in self.session.execute(text(sql).columns(**self.types),
+                                                           dict(self.params, limit=limit, offset=offset))]
+
+    def format_row(self, row):
+        return tuple(self.formatters[key](value) if key in self.formatters and value is not None else value
+                     for key, value in zip(self.keys, row))
+
+def _date(value):
+    return f"{value:%Y-%m-%d}"
+
+def _timestamp(value):
+    return f"{value:%Y-%m-%d %H:%M:%S}"
+
+def search_vouchers(session, search, date_from=None, date_to=None, voucher_type=None, fts=True):
+    return SearchSource(session, "journal_entries",
+                        [("ID", "t.id"), ("Date", "t.date"), ("Voucher Type", "t.voucher_type"), ("Description", "t.description")],
+                        ["description"], search, "date", date_from, date_to,
+                        filters={"voucher_type": voucher_type}, formatters={"Date": _date},
+                        types={"date": DateTime}, fts=fts)
+
+def search_audit_logs(session, search, date_from=None, date_to=None, action=None, fts=True):
+    return SearchSource(session, "audit_logs",
+                        [("ID", "t.id"), ("Timestamp", "t.timestamp"), ("Action", "t.action"), ("Details", "t.details")],
+                        ["action", "details"], search, "timestamp", date_from, date_to,
+                        filters={"action": action}, formatters={"Timestamp": _timestamp},
+                        types={"timestamp": DateTime}, fts=fts)
@@ -0,0 +1,351 @@
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from sqlalchemy.orm import sessionmaker
+
+from ledger import accounts, export, instrument, queries, report_model, reports, search, stock
+from ledger.cache import account_cache, share_account_cache
+from ledger.db import DATABASE_URL, init_db, make_engine
+from ledger.posting import PostingError
+from ledger.writer import WriteQueue, WriterBusy
+
+# -------------------------------
+# Local HTTP/JSON API: python -m ledger.server
+# -------------------------------
+# Lets several counters work on one ledger at the same time.  Requests are
+# served by asyncio; reads run on a small thread pool, each with its own
+# session, and every write goes through the single-writer queue
+# (ledger.writer), which group-commits whatever is waiting.
+#
+#     GET    /health
+#     GET    /stats                          writer statistics
+#     GET    /metrics                        query and request timings, Prometheus text format
+#     GET    /dashboard
+#     GET    /accounts
+#     POST   /accounts                       {"name": "Cash", "type": "Asset"}
+#     DELETE /accounts/<id>
+#     GET    /accounts/<id>/ledger?from=YYYY-MM-DD&cursor=...&limit=500
+#     POST   /vouchers                       one voucher, or {"vouchers": [...]}
+#     GET    /vouchers?q=...&from=...&to=...&type=...&offset=0&limit=100
+#     GET    /stock
+#     POST   /stock                          {"product_name", "quantity", "purchase_price", "selling_price", "details"}
+#     GET    /reports/trial-balance?from=...&to=...   (also income-statement, balance-sheet)
+#
+# Vouchers use the posting engine's format (see ledger.posting), with "date"
+# as an ISO date string.  Errors come back as {"error": "..."} with status 400
+# (invalid input), 404, 409 (an account with ledger lines can't be deleted) or
+# 503 (write queue full).  Only listens on localhost by default: there is no
+# authentication.
+
+MAX_BODY = 10 * 1024 * 1024
+REPORTS = {"trial-balance": "trial_balance", "income-statement": "income_statement",
+           "balance-sheet": "balance_sheet"}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPError(400, f"Invalid {name} date '{value}'.")
+
+def _int(value, name, default):
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(400, f"Invalid {name} '{value}'.")
+
+def _json(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _voucher(data):
+    if not isinstance(data, dict):
+        raise HTTPError(400, "A voucher must be a JSON object.")
+    voucher = dict(data)
+    if isinstance(voucher.get("date"), str):
+        voucher["date"] = _date(voucher["date"], "voucher")
+    return voucher
+
+# Ledger cursors travel as "date,line_id,balance".
+def _encode_cursor(cursor):
+    return None if cursor is None else f"{cursor.date.isoformat()},{cursor.line_id},{cursor.balance!r}"
+
+def _decode_cursor(value):
+    try:
+        date, line_id, balance = value.split(",")
+        return queries.LedgerCursor(datetime.fromisoformat(date), int(line_id), float(balance))
+    except ValueError:
+        raise HTTPError(400, "Invalid ledger cursor.")
+
+class LedgerServer:
+    def __init__(self, engine, workers=8, read_engine=None):
+        # Writes go through the writer queue on `engine`; reads run on
+        # read_engine (snapshot transactions, see ledger.db) when given.
+        self.engine = engine
+        self.Session = sessionmaker(bind=engine)
+        self.ReadSession = sessionmaker(bind=read_engine or engine)
+        self.readers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ledger-read")
+        self.writer = WriteQueue(self.Session).start()
+        self.cache = account_cache(engine)
+        self.routes = [
+            ("GET", r"/health", self.health),
+            ("GET", r"/stats", self.stats),
+            ("GET", r"/metrics", self.metrics),
+            ("GET", r"/dashboard", self.dashboard),
+            ("GET", r"/accounts", self.list_accounts),
+            ("POST", r"/accounts", self.create_account),
+            ("DELETE", r"/accounts/(\d+)", self.delete_account),
+            ("GET", r"/accounts/(\d+)/ledger", self.ledger),
+            ("POST", r"/vouchers", self.post_vouchers),
+            ("GET", r"/vouchers", self.search_vouchers),
+            ("GET", r"/stock", self.list_stock),
+            ("POST", r"/stock", self.add_stock),
+            ("GET", r"/reports/([a-z-]+)", self.report),
+        ]
+        self.routes = [(method, re.compile(pattern + "$"), handler) for method, pattern, handler in self.routes]
+
+    # --- plumbing ---
+    async def read(self, fn, *args):
+        # fn(session, *args) on a reader thread with its own session.
+        def run():
+            with self.ReadSession() as session:
+                return fn(session, *args)
+        return await asyncio.get_running_loop().run_in_executor(self.readers, run)
+
+    async def write(self, fn, *args, after=None):
+        return await asyncio.wrap_future(self.writer.submit(fn, *args, after=after))
+
+    async def dispatch(self, method, path, query, body):
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match:
+                if route_method == method:
+                    started = time.perf_counter()
+                    try:
+                        return await handler(query, body, *match.groups())
+                    finally:
+                        # Requests interleave on one thread, so they are timed with record(), not span().
+                        instrument.stats.record(f"http.{handler.__name__}", (time.perf_counter() - started) * 1000)
+                allowed = True
+        if allowed:
+            raise HTTPError(405, f"Method {method} not allowed for {path}.")
+        raise HTTPError(404, f"No such resource: {path}")
+
+    async def handle(self, reader, writer):
+        # One connection; HTTP/1.1 keep-alive.
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    return
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Malformed request line."}, False)
+                    return
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"error": "Request body too large."}, False)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                url = urlsplit(target)
+                status, result = await self.call(method, url.path.rstrip("/") or "/", dict(parse_qsl(url.query)), body)
+                await self.respond(writer, status, result, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def call(self, method, path, query, body):
+        try:
+            # Decimal, not float: amounts reach ledger.money.to_minor unrounded.
+            data = json.loads(body, parse_float=Decimal) if body else None
+        except ValueError:
+            return 400, {"error": "Request body is not valid JSON."}
+        try:
+            return 200, await self.dispatch(method, path, query, data)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except (PostingError, accounts.AccountError, stock.StockError) as e:
+            return 400, {"error": str(e)}
+        except WriterBusy as e:
+            return 503, {"error": str(e)}
+        except Exception as e:
+            print(f"{method} {path} failed: {e!r}", file=sys.stderr)
+            return 500, {"error": "Internal server error."}
+
+    async def respond(self, writer, status, result, keep_alive):
+        # Strings are sent as plain text, everything else as JSON.
+        if isinstance(result, str):
+            payload, content_type = result.encode(), "text/plain; version=0.0.4"
+        else:
+            payload, content_type = json.dumps(result, default=_json).encode(), "application/json"
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    # --- handlers ---
+    async def health(self, query, body):
+        return {"status": "ok"}
+
+    async def stats(self, query, body):
+        return {"writer": self.writer.stats()}
+
+    async def metrics(self, query, body):
+        return instrument.stats.to_prometheus()
+
+    async def dashboard(self, query, body):
+        return (await self.read(queries.dashboard_summary))._asdict()
+
+    async def list_accounts(self, query, body):
+        rows = await self.read(accounts.list_accounts)
+        return [{"id": i, "name": n, "type": t, "balance": b} for i, n, t, b in rows]
+
+    async def create_account(self, query, body):
+        body = body or {}
+        if not isinstance(body, dict):
+            raise HTTPError(400, "An account must be a JSON object.")
+        name, acc_type = body.get("name"), body.get("type")
+        if not isinstance(name, str) or not isinstance(acc_type, str):
+            raise HTTPError(400, "Please provide both name and type.")
+        account_id = await self.write(accounts.create_account, name, acc_type, False,
+                                      after=lambda id_: self.cache.added(id_, name.strip(), acc_type.strip()))
+        return {"id": account_id}
+
+    async def delete_account(self, query, body, account_id):
+        account_id = int(account_id)
+        try:
+            name = await self.write(accounts.delete_account, account_id, False,
+                                    after=lambda _: self.cache.removed(account_id))
+        except accounts.AccountInUse as e:
+            raise HTTPError(409, str(e))
+        except accounts.AccountError as e:
+            raise HTTPError(404, str(e))
+        return {"id": account_id, "name": name}
+
+    async def ledger(self, query, body, account_id):
+        account_id = int(account_id)
+        limit = min(_int(query.get("limit"), "limit", queries.LEDGER_PAGE_SIZE), 5000)
+        date_from = _date(query.get("from"), "from")
+
+        def load(session):
+            if self.cache.get(account_id) is None:
+                raise HTTPError(404, "Account not found.")
+            cursor = _decode_cursor(query["cursor"]) if query.get("cursor") else \
+                queries.first_cursor(session, account_id, date_from)
+            return queries.ledger_page(session, account_id, cursor, limit)
+
+        page = await self.read(load)
+        return {"opening": page.opening, "lines": [row._asdict() for row in page.rows],
+                "cursor": _encode_cursor(page.cursor)}
+
+    async def post_vouchers(self, query, body):
+        if isinstance(body, dict) and "vouchers" in body:
+            if not isinstance(body["vouchers"], list) or not body["vouchers"]:
+                raise HTTPError(400, "'vouchers' must be a non-empty list.")
+            vouchers = [_voucher(v) for v in body["vouchers"]]
+        else:
+            vouchers = [_voucher(body)]
+        ids = await asyncio.wrap_future(self.writer.post(vouchers))
+        return {"ids": ids}
+
+    async def search_vouchers(self, query, body):
+        offset = _int(query.get("offset"), "offset", 0)
+        limit = min(_int(query.get("limit"), "limit", 100), 1000)
+        date_from, date_to = _date(query.get("from"), "from"), _date(query.get("to"), "to")
+
+        def load(session):
+            source = search.search_vouchers(session, query.get("q"), date_from,
+                                            reports.day_end(date_to) if date_to else None, query.get("type"))
+            return source.count(), [source.format_row(row) for row in source.fetch(offset, limit)]
+
+        total, rows = await self.read(load)
+        return {"total": total, "vouchers": [dict(zip(("id", "date", "voucher_type", "description"), row))
+                                             for row in rows]}
+
+    async def list_stock(self, query, body):
+        rows = await self.read(stock.list_stock)
+        return [dict(zip(("id", "product_name", "quantity", "purchase_price", "selling_price"), row)) for row in rows]
+
+    async def add_stock(self, query, body):
+        body = body or {}
+        item_id = await self.write(stock.add_stock_item, body.get("product_name"), body.get("quantity"),
+                                   body.get("purchase_price"), body.get("selling_price"), body.get("details", ""), False)
+        return {"id": item_id}
+
+    async def report(self, query, body, name):
+        if name not in REPORTS:
+            raise HTTPError(404, f"No such report: {name}")
+        kind = REPORTS[name]
+        date_from, date_to = _date(query.get("from"), "from"), _date(query.get("to"), "to")
+        report = await self.read(report_model.build_report, kind, date_from, date_to)
+        return export.report_dict(report)
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Ledger API listening on http://{host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.writer.close()
+        self.readers.shutdown(wait=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ledger.server", description="Serve the ledger over HTTP/JSON.")
+    parser.add_argument("--url", default=DATABASE_URL, help="SQLAlchemy database URL")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=8, help="reader threads")
+    parser.add_argument("--slow-ms", type=float, default=instrument.SLOW_QUERY_MS, help="slow query log threshold")
+    parser.add_argument("--slow-log", default=None, help="append slow queries to this JSON-lines file")
+    args = parser.parse_args(argv)
+
+    engine = make_engine(args.url)
+    read_engine = make_engine(args.url, readonly=True, pool_size=args.workers + 2)
+    share_account_cache(engine, read_engine)
+    init_db(engine)
+    instrument.install(engine, slow_ms=args.slow_ms, slow_log=args.slow_log)
+    instrument.install(read_engine)
+    app = LedgerServer(engine, args.workers, read_engine)
+    try:
+        asyncio.run(app.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        app.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+from sqlalchemy import text
+
+from ledger.models import AuditLog, Stock
+from ledger.money import to_minor, to_units
+
+# -------------------------------
+# Stock Items
+# -------------------------------
+class StockError(ValueError):
+    pass
+
+def add_stock_item(session, product_name, quantity, purchase_price, selling_price, details="", commit=True):
+    product_name = (product_name or "").strip()
+    try:
+        quantity = int(quantity)
+        purchase_price = to_minor(purchase_price)
+        selling_price = to_minor(selling_price)
+    except (TypeError, ValueError):
+        raise StockError("Please enter valid numeric values for quantity and prices.")
+    if not product_name:
+        raise StockError("Product name is required.")
+    item = Stock(product_name=product_name, quantity=quantity, purchase_price=purchase_price,
+                 selling_price=selling_price, details=(details or "").strip())
+    session.add(item)
+    session.flush()
+    session.add(AuditLog(action="Stock Entry",
+                         details=f"New stock item '{product_name}' added with quantity {quantity}."))
+    if commit:
+        session.commit()
+    return item.id
+
+def list_stock(session):
+    # [(id, product_name, quantity, purchase_price, selling_price)] in id order, prices in units.
+    return [(item_id, name, quantity, to_units(purchase), to_units(selling))
+            for item_id, name, quantity, purchase, selling in session.execute(text(
+                "SELECT id, product_name, quantity, purchase_price, selling_price FROM stocks ORDER BY id"))]
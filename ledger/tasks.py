@@ -0,0 +1,151 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------------
+# Background database tasks
+# -------------------------------
+# TaskRunner runs functions on a small thread pool, each call with its own
+# session:  fn(session, task, *args).  Results, errors and progress reports are
+# queued and handed to the callbacks by deliver(), which the UI calls from its
+# own thread (the Tk app polls it with `after`), so callbacks never run on a
+# worker thread.
+#
+# Every task is submitted under a key (e.g. "screen").  Submitting a new task
+# for a key cancels the previous one, and deliver() drops anything from a task
+# that is no longer the newest for its key, so a slow, stale request can never
+# overwrite a newer screen.  Cancelling also interrupts the SQL statement the
+# task is running (sqlite3 interrupt() / psycopg cancel()).
+
+class Cancelled(Exception):
+    pass
+
+class Task:
+    def __init__(self, key, generation, on_done=None, on_error=None, on_progress=None):
+        self.key = key
+        self.generation = generation
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.cancelled = threading.Event()
+        self._interrupt = None
+        self._interrupt_lock = threading.Lock()
+        self._runner = None
+
+    def cancel(self):
+        self.cancelled.set()
+        # Under the lock, so a connection already handed back to the pool is
+        # never interrupted on behalf of this task.
+        with self._interrupt_lock:
+            if self._interrupt is not None:
+                try:
+                    self._interrupt()
+                except Exception:
+                    pass
+
+    def check(self):
+        # Called by task functions between steps; raises Cancelled when asked to stop.
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+    def progress(self, done, total=None, message=""):
+        self.check()
+        self._runner._post(self, "progress", (done, total, message))
+
+    def watch(self, session):
+        # Let cancel() interrupt statements running on this session's connection.
+        raw = session.connection().connection.dbapi_connection
+        with self._interrupt_lock:
+            self._interrupt = getattr(raw, "interrupt", None) or getattr(raw, "cancel", None)
+
+    def unwatch(self):
+        with self._interrupt_lock:
+            self._interrupt = None
+
+class TaskRunner:
+    def __init__(self, session_factory, workers=2):
+        self.session_factory = session_factory
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-task")
+        self.results = queue.Queue()
+        self.lock = threading.Lock()
+        self.current = {}  # key -> newest Task
+        self.generation = 0
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None, on_progress=None, session=True):
+        # session=False runs fn(task, *args) without opening a database session.
+        with self.lock:
+            previous = self.current.get(key)
+            if previous is not None:
+                previous.cancel()
+            self.generation += 1
+            task = Task(key, self.generation, on_done, on_error, on_progress)
+            task._runner = self
+            self.current[key] = task
+        self.executor.submit(self._run, task, fn, args, session)
+        return task
+
+    def cancel(self, key):
+        with self.lock:
+            task = self.current.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def is_current(self, task):
+        with self.lock:
+            return self.current.get(task.key) is task and not task.cancelled.is_set()
+
+    def busy(self, key):
+        with self.lock:
+            return key in self.current
+
+    def _post(self, task, kind, payload):
+        self.results.put((task, kind, payload))
+
+    def _run(self, task, fn, args, use_session):
+        if task.cancelled.is_set():
+            return
+        try:
+            if use_session:
+                with self.session_factory() as session:
+                    task.watch(session)
+                    try:
+                        result = fn(session, task, *args)
+                    finally:
+                        task.unwatch()
+            else:
+                result = fn(task, *args)
+            task.check()
+            self._post(task, "done", result)
+        except Cancelled:
+            pass
+        except Exception as e:
+            if not task.cancelled.is_set():
+                self._post(task, "error", e)
+
+    def deliver(self, limit=100):
+        # Run the callbacks of finished / progressing tasks (UI thread only).
+        for _ in range(limit):
+            try:
+                task, kind, payload = self.results.get_nowait()
+            except queue.Empty:
+                return
+            if not self.is_current(task):
+                continue
+            if kind == "progress":
+                if task.on_progress:
+                    task.on_progress(*payload)
+                continue
+            with self.lock:
+                if self.current.get(task.key) is task:
+                    del self.current[task.key]
+            callback = task.on_done if kind == "done" else task.on_error
+            if callback:
+                callback(payload)
+
+    def shutdown(self):
+        with self.lock:
+            tasks = list(self.current.values())
+            self.current.clear()
+        for task in tasks:
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+
+from ledger.db import Session
+
+# -------------------------------
+# Unit of Work
+# -------------------------------
+# Library functions take an explicit session and a `commit` flag.  To group
+# several calls into one transaction, pass commit=False and wrap them:
+#
+#     with unit_of_work() as session:
+#         account_id = accounts.create_account(session, "Cash", "Asset", commit=False)
+#         posting.post_voucher(session, voucher, commit=False)
+#
+# Everything is committed when the block ends, or rolled back if it raises.
+
+@contextmanager
+def unit_of_work(session_factory=Session):
+    session = session_factory()
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
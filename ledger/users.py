@@ -0,0 +1,29 @@
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from ledger.models import AuditLog, User
+
+# -------------------------------
+# Users
+# -------------------------------
+class UserError(ValueError):
+    pass
+
+def register_user(session, username, password, commit=True):
+    username, password = (username or "").strip(), (password or "").strip()
+    if not username or not password:
+        raise UserError("Please enter both username and password.")
+    if session.query(User).filter_by(username=username).first():
+        raise UserError("Username already exists.")
+    user = User(username=username, password=generate_password_hash(password))
+    session.add(user)
+    session.add(AuditLog(action="Registration", details=f"User '{username}' registered."))
+    if commit:
+        session.commit()
+    return user
+
+def authenticate(session, username, password):
+    # The User for valid credentials, otherwise None.
+    user = session.query(User).filter_by(username=username).first()
+    if user and check_password_hash(user.password, password):
+        return user
+    return None
@@ -0,0 +1,206 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from ledger import fiscal
+from ledger.db import retry_on_busy
+from ledger.posting import PostingError, check_books_open, post_vouchers, validate_voucher
+
+# -------------------------------
+# Single-Writer Queue (group commit)
+# -------------------------------
+# Every write of a multi-client process (the HTTP server) goes through one
+# thread with one session, so two writers never compete for the SQLite write
+# lock and nobody sees "database is locked".  Callers get a Future.
+#
+# Whatever is waiting in the queue when the writer comes round is applied in
+# one transaction and committed once (group commit): under load many vouchers
+# share one fsync, while a lone request is written straight away.  Consecutive
+# voucher requests are posted with a single post_vouchers() call.  If the
+# shared transaction fails, the batch is rolled back and every request is
+# retried on its own, so one bad voucher only fails its own request.  A batch
+# that finds the database locked by another process is retried whole first.
+# The writer re-reads the end of the closed fiscal years before each batch,
+# so post() turns away vouchers dated in a closed year up front.
+
+MAX_BATCH = 500  # vouchers (or other writes) per transaction
+
+class WriterBusy(Exception):
+    pass
+
+class _Write:
+    __slots__ = ("vouchers", "fn", "args", "after", "future")
+
+    def __init__(self, vouchers=None, fn=None, args=(), after=None):
+        self.vouchers = vouchers
+        self.fn = fn
+        self.args = args
+        self.after = after
+        self.future = Future()
+
+class WriteQueue:
+    def __init__(self, session_factory, max_batch=MAX_BATCH, max_queue=10000):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.queue = queue.Queue(max_queue)
+        self.thread = None
+        self.requests = 0
+        self.vouchers = 0
+        self.batches = 0
+        self.retried = 0
+        self.failed = 0
+        self.max_batch_seen = 0
+        self.total_commit_ms = 0.0
+        self.closed_until = None  # see ledger.fiscal.books_closed_until
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="ledger-writer", daemon=True)
+            self.thread.start()
+        return self
+
+    def post(self, vouchers):
+        # Future of the new voucher ids, in order.  Vouchers that break the
+        # posting rules fail here, without costing the writer a rollback.
+        write = _Write(vouchers=list(vouchers))
+        try:
+            for index, voucher in enumerate(write.vouchers):
+                try:
+                    validate_voucher(voucher)
+                    check_books_open(voucher, self.closed_until)
+                except PostingError as e:
+                    if len(write.vouchers) == 1:
+                        raise
+                    raise PostingError(f"Voucher {index + 1}: {e}") from None
+        except PostingError as e:
+            write.future.set_exception(e)
+            return write.future
+        return self._put(write)
+
+    def submit(self, fn, *args, after=None):
+        # Future of fn(session, *args).  fn must not commit; after(result) runs
+        # on the writer thread once the result is committed.
+        return self._put(_Write(fn=fn, args=args, after=after))
+
+    def _put(self, write):
+        # Never blocks: callers include the server's event loop, which must
+        # keep serving reads while the writer catches up.
+        try:
+            self.queue.put_nowait(write)
+        except queue.Full:
+            write.future.set_exception(WriterBusy("Too many writes waiting; try again shortly."))
+        return write.future
+
+    def close(self, timeout=None):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout)
+            self.thread = None
+
+    def stats(self):
+        return {"requests": self.requests, "vouchers": self.vouchers, "batches": self.batches,
+                "avg_batch": self.requests / self.batches if self.batches else 0.0,
+                "max_batch": self.max_batch_seen, "retried": self.retried, "failed": self.failed,
+                "avg_commit_ms": self.total_commit_ms / self.batches if self.batches else 0.0,
+                "queue_depth": self.queue.qsize()}
+
+    # --- writer thread ---
+    def _run(self):
+        session = self.session_factory()
+        self._refresh_closed_until(session)
+        try:
+            while True:
+                write = self.queue.get()
+                if write is None:
+                    return
+                batch, size = [write], self._size(write)
+                stop = False
+                while size < self.max_batch:
+                    try:
+                        write = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if write is None:
+                        stop = True
+                        break
+                    batch.append(write)
+                    size += self._size(write)
+                self._write(session, batch)
+                if stop:
+                    return
+        finally:
+            session.close()
+
+    def _size(self, write):
+        return len(write.vouchers) if write.vouchers is not None else 1
+
+    def _write(self, session, batch):
+        started = time.perf_counter()
+        try:
+            results = retry_on_busy(self._commit, session, batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._finish(batch, [e], failed=True)
+            else:
+                self.retried += len(batch)
+                for write in batch:
+                    self._write(session, [write])
+            return
+        self.batches += 1
+        self.total_commit_ms += (time.perf_counter() - started) * 1000
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self._finish(batch, results)
+
+    def _commit(self, session, batch):
+        try:
+            results = self._apply(session, batch)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self._refresh_closed_until(session)
+        return results
+
+    def _refresh_closed_until(self, session):
+        try:
+            self.closed_until = fiscal.books_closed_until(session)
+            session.rollback()  # don't hold a read transaction until the next batch
+        except Exception:
+            session.rollback()
+
+    def _apply(self, session, batch):
+        # Results in batch order; runs of voucher requests share one post_vouchers().
+        results = []
+        i = 0
+        while i < len(batch):
+            if batch[i].vouchers is None:
+                results.append(batch[i].fn(session, *batch[i].args))
+                i += 1
+                continue
+            run = []
+            while i < len(batch) and batch[i].vouchers is not None:
+                run.append(batch[i])
+                i += 1
+            ids = post_vouchers(session, [v for write in run for v in write.vouchers], commit=False)
+            for write in run:
+                results.append(ids[:len(write.vouchers)])
+                ids = ids[len(write.vouchers):]
+        return results
+
+    def _finish(self, batch, results, failed=False):
+        for write, result in zip(batch, results):
+            self.requests += 1
+            if failed:
+                self.failed += 1
+                write.future.set_exception(result)
+                continue
+            if write.vouchers is not None:
+                self.vouchers += len(write.vouchers)
+            if write.after is not None:
+                try:
+                    write.after(result)
+                except Exception:
+                    pass
+            write.future.set_result(result)
@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from ledger.pdf import Column, Heading, Total
+
+# -------------------------------
+# Streaming XLSX Writer
+# -------------------------------
+# Writes the same typed tables as ledger.pdf (Column, Heading, Total rows) to a
+# single-sheet .xlsx workbook.  The worksheet XML is streamed into the zip in
+# chunks as rows arrive, so memory stays flat however many rows there are, and
+# no spreadsheet library is needed: an .xlsx is a zip of a few small XML parts.
+#
+# Amounts are written as numbers with a #,##0.00 format (so they add up in the
+# spreadsheet), dates as real dates; headings and totals are bold and the
+# column heading row is frozen.
+
+FLUSH_ROWS = 1000
+
+_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_CONTENT_TYPES = _XML + (
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>')
+
+_ROOT_RELS = _XML + (
+    f'<Relationships xmlns="{_PKG_REL}">'
+    f'<Relationship Id="rId1" Type="{_REL}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>')
+
+_WORKBOOK_RELS = _XML + (
+    f'<Relationships xmlns="{_PKG_REL}">'
+    f'<Relationship Id="rId1" Type="{_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+    f'<Relationship Id="rId2" Type="{_REL}/styles" Target="styles.xml"/>'
+    '</Relationships>')
+
+# Cell styles (index into cellXfs): 0 text, 1 bold, 2 amount, 3 bold amount, 4 date.
+TEXT, BOLD, AMOUNT, BOLD_AMOUNT, DATE = range(5)
+
+_STYLES = _XML + (
+    f'<styleSheet xmlns="{_MAIN}">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="#,##0.00"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="5">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="1" fillId="0" borderId="0" xfId="0" applyNumberFormat="1" applyFont="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>')
+
+_EPOCH = datetime(1899, 12, 30)
+# Characters XML 1.0 does not allow at all.
+_invalid_re = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def column_letter(index):
+    letters = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+def _serial(value):
+    # Excel date serial number (days since 1899-12-30).
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    delta = value - _EPOCH
+    return delta.days + delta.seconds / 86400
+
+def _sheet_name(title):
+    return re.sub(r"[\[\]:*?/\\]", " ", title).strip()[:31] or "Sheet1"
+
+class TableXLSX:
+    def __init__(self, path, title, columns, subtitle=None):
+        self.path = path
+        self.title = title
+        self.columns = [c if isinstance(c, Column) else Column(*c) for c in columns]
+        self.letters = [column_letter(i) for i in range(len(self.columns))]
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self.sheet = self.zip.open("xl/worksheets/sheet1.xml", "w")
+        self.buffer = []
+        self.row_number = 0
+        self.rows = 0
+        header_row = 3 + (1 if subtitle else 0)
+        # Column widths in characters, from the relative widths of the columns.
+        scale = 100.0 / sum(c.width for c in self.columns)
+        cols = "".join(f'<col min="{i + 1}" max="{i + 1}" width="{max(8.0, c.width * scale):.1f}" customWidth="1"/>'
+                       for i, c in enumerate(self.columns))
+        self.buffer.append(
+            f'{_XML}<worksheet xmlns="{_MAIN}"><sheetViews><sheetView workbookViewId="0">'
+            f'<pane ySplit="{header_row}" topLeftCell="A{header_row + 1}" activePane="bottomLeft" state="frozen"/>'
+            f'</sheetView></sheetViews><cols>{cols}</cols><sheetData>')
+        self._row([(title, BOLD)])
+        if subtitle:
+            self._row([(subtitle, TEXT)])
+        self._row([])
+        self._row([(c.title, BOLD) for c in self.columns])
+
+    def _cell(self, ref, value, style):
+        if value is None or value == "":
+            return ""
+        if isinstance(value, bool):
+            value = str(value)
+        if isinstance(value, (int, float)):
+            return f'<c r="{ref}" s="{style}"><v>{value!r}</v></c>'
+        if isinstance(value, (date, datetime)):
+            return f'<c r="{ref}" s="{DATE}"><v>{_serial(value)!r}</v></c>'
+        text_ = escape(_invalid_re.sub("", str(value)))
+        return f'<c r="{ref}" t="inlineStr" s="{style}"><is><t xml:space="preserve">{text_}</t></is></c>'
+
+    def _row(self, cells):
+        self.row_number += 1
+        n = self.row_number
+        self.buffer.append(f'<row r="{n}">' + "".join(
+            self._cell(f"{letter}{n}", value, style) for letter, (value, style) in zip(self.letters, cells)) + "</row>")
+        if len(self.buffer) >= FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        self.sheet.write("".join(self.buffer).encode("utf-8"))
+        self.buffer = []
+
+    def add(self, row):
+        if isinstance(row, Heading):
+            self._row([])
+            self._row([(row.text, BOLD)])
+            return
+        if isinstance(row, Total):
+            values = list(row.values) + [None] * (len(self.columns) - len(row.values))
+            values[0] = row.label
+            self._row([(value, BOLD_AMOUNT if col.kind == "amount" else BOLD)
+                       for col, value in zip(self.columns, values)])
+            return
+        self._row([(value, AMOUNT if col.kind == "amount" else TEXT) for col, value in zip(self.columns, row)])
+        self.rows += 1
+
+    def close(self):
+        self.buffer.append("</sheetData></worksheet>")
+        self._flush()
+        self.sheet.close()
+        self.zip.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        self.zip.writestr("_rels/.rels", _ROOT_RELS)
+        self.zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        self.zip.writestr("xl/styles.xml", _STYLES)
+        self.zip.writestr("xl/workbook.xml", _XML + (
+            f'<workbook xmlns="{_MAIN}" xmlns:r="{_REL}"><sheets>'
+            f'<sheet name={quoteattr(_sheet_name(self.title))} sheetId="1" r:id="rId1"/></sheets></workbook>'))
+        self.zip.close()
+
+    def abort(self):
+        self.sheet.close()
+        self.zip.close()
+
+def write_table_xlsx(path, title, columns, rows, subtitle=None, progress=None):
+    # Returns {"rows", "bytes", "seconds"}; progress(rows_done, None, message)
+    # is called every FLUSH_ROWS rows and may raise to abort the export.
+    started = time.perf_counter()
+    book = TableXLSX(path, title, columns, subtitle)
+    try:
+        for row in rows:
+            book.add(row)
+            if progress and type(row) not in (Heading, Total) and book.rows % FLUSH_ROWS == 0:
+                progress(book.rows, None, f"Writing XLSX... {book.rows:,} rows")
+        book.close()
+    except BaseException:
+        book.abort()
+        os.remove(path)
+        raise
+    return {"rows": book.rows, "bytes": os.path.getsize(path), "seconds": time.perf_counter() - started}
@@ -0,0 +1,370 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import DateTime, MetaData, bindparam, text
+from sqlalchemy.orm import sessionmaker
+
+from ledger import accounts, bulk, fiscal
+from ledger.cache import account_cache
+from ledger.balances import period_of, rebuild_period_balances, signed_amount_sql
+from ledger.db import DATABASE_URL, init_db, make_engine, retry_on_busy
+from ledger.fiscal import FiscalError
+from ledger.models import Account, AccountPeriodBalance, AuditLog, FiscalYear, JournalEntry, TransactionDetail
+from ledger.money import MINOR_UNITS
+from ledger.posting import post_vouchers
+from ledger.reports import EXPENSE_TYPES, REVENUE_TYPES
+
+# -------------------------------
+# Fiscal Year-End Close
+# -------------------------------
+#     python -m ledger year-end close 2024
+#     python -m ledger year-end close 2025 --start-month 4 --equity-account 31
+#     python -m ledger year-end list
+#
+# Closing a fiscal year moves its vouchers out of the live tables, so ledger
+# loads, reports and backups only deal with the open years.  Three steps:
+#   1. closing entries: a "Closing" voucher on the year's last instant moves
+#      the balance of every Revenue and Expense account into an Equity account
+#      (Retained Earnings, created if missing, or --equity-account), and the
+#      year is registered as "closing": from then on vouchers dated in it are
+#      refused
+#   2. archive: every voucher dated before the end of the year is copied, with
+#      the chart of accounts, into ledger_archive/ledger-<year>.db next to the
+#      database (written under a temporary name, fsynced and renamed), or into
+#      the schema fy<year> on PostgreSQL; its monthly balances are rebuilt there
+#   3. in one transaction the copy is checked against the live lines, they are
+#      deleted and an "Opening Balance" voucher on the same last instant brings
+#      every account's balance forward; the year becomes "closed"
+#
+# Account balances don't move: the opening voucher adds up to exactly what was
+# removed.  A close that stopped part-way resumes at step 2 when run again.
+# Years are closed in order, and the first one closed must hold the oldest
+# voucher.  Reports reach the archives through ledger.fiscal.
+
+RETAINED_EARNINGS = "Retained Earnings"
+
+# The archive gets the indexes its reports and ledgers read through.
+ARCHIVE_INDEXES = [("ix_transaction_details_account_entry", "transaction_details", "account_id, journal_entry_id"),
+                   ("ix_transaction_details_entry_lines", "transaction_details",
+                    "journal_entry_id, account_id, type, amount"),
+                   ("ix_journal_entries_date_type", "journal_entries", "date, voucher_type")]
+
+def year_bounds(year, start_month=1):
+    return datetime(year, start_month, 1), datetime(year + 1, start_month, 1)
+
+def _lock_ledger(session, action, details):
+    # Keeps postings out until this transaction ends: the audit row is the
+    # first write, which takes SQLite's write lock; PostgreSQL needs a table
+    # lock, as its postings don't otherwise wait for a reader.
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("LOCK TABLE journal_entries, transaction_details IN SHARE ROW EXCLUSIVE MODE"))
+    session.add(AuditLog(action=action, details=details))
+    session.flush()
+
+def _dated_before(sql):
+    return text(sql).bindparams(bindparam("before", type_=DateTime))
+
+def _equity_account(session, account_id=None):
+    # (account id, whether it was created just now)
+    if account_id is not None:
+        account = session.get(Account, account_id)
+        if account is None or account.type != "Equity":
+            raise FiscalError(f"Account {account_id} is not an Equity account.")
+        return account.id, False
+    found = session.execute(text("SELECT id FROM accounts WHERE type = 'Equity' AND LOWER(name) = LOWER(:name) "
+                                 "ORDER BY id"), {"name": RETAINED_EARNINGS}).scalar()
+    if found:
+        return found, False
+    return accounts.create_account(session, RETAINED_EARNINGS, "Equity", commit=False), True
+
+def _units(minor):
+    return Decimal(minor) / MINOR_UNITS
+
+def start_close(Session, year, start_month=1, equity_account=None, archive_dir=fiscal.ARCHIVE_DIR, now=None):
+    # Step 1.  Returns the FiscalYearInfo of the year being closed; a close
+    # already in progress for `year` is returned as it is.
+    with Session() as session:
+        years = fiscal.fiscal_years(session)
+        current = next((fy for fy in years if fy.year == year), None)
+        if current is not None:
+            if current.status == "closed":
+                raise FiscalError(f"Fiscal year {fiscal.year_label(current)} is already closed.")
+            return current
+        if years and years[-1].status != "closed":
+            raise FiscalError(f"The close of fiscal year {fiscal.year_label(years[-1])} has not finished; "
+                              f"run it again first.")
+        if years and year != years[-1].year + 1:
+            raise FiscalError(f"Fiscal years are closed in order; the next one is {years[-1].year + 1}.")
+        if years:
+            date_from = years[-1].date_to
+            date_to = date_from.replace(year=date_from.year + 1)
+        else:
+            date_from, date_to = year_bounds(year, start_month)
+        archive = (fiscal.archive_alias(year) if session.get_bind().dialect.name == "postgresql"
+                   else os.path.join(archive_dir, f"ledger-{year}.db"))
+        fy = fiscal.FiscalYearInfo(year, date_from, date_to, "closing", archive, None)
+        label = fiscal.year_label(fy)
+        if date_to > (now or datetime.utcnow()):
+            raise FiscalError(f"Fiscal year {label} runs until {fiscal.last_instant(fy):%Y-%m-%d}; "
+                              f"it can't be closed before it has ended.")
+
+        _lock_ledger(session, "Fiscal Year Closing", f"Closing fiscal year {label}")
+        params = {"before": date_to}
+        if not years:
+            earlier = session.execute(_dated_before("SELECT MIN(date) FROM journal_entries WHERE date < :before"),
+                                      {"before": date_from}).scalar()
+            if earlier is not None:
+                raise FiscalError(f"There are vouchers from {str(earlier)[:10]}, before fiscal year {label}; "
+                                  f"close the earlier years first.")
+        orphans = session.execute(_dated_before("""
+            SELECT COUNT(*) FROM transaction_details td
+            JOIN journal_entries je ON je.id = td.journal_entry_id
+            LEFT JOIN accounts a ON a.id = td.account_id
+            WHERE je.date < :before AND a.id IS NULL
+        """), params).scalar()
+        if orphans:
+            raise FiscalError(f"{orphans:,} lines in the year belong to deleted accounts "
+                              f"(see python -m ledger reconcile); they can't be archived.")
+
+        created = None
+        nominal = REVENUE_TYPES + EXPENSE_TYPES
+        balances = {account_id: int(amount) for account_id, amount in session.execute(_dated_before(f"""
+            SELECT td.account_id, SUM({signed_amount_sql()})
+            FROM transaction_details td
+            JOIN journal_entries je ON je.id = td.journal_entry_id
+            JOIN accounts a ON a.id = td.account_id
+            WHERE je.date < :before AND a.type IN ({', '.join(f"'{t}'" for t in nominal)})
+            GROUP BY td.account_id
+        """), params) if amount}
+        if balances:
+            # Each balance goes back to zero; the result goes into equity.
+            lines = [{"account_id": account_id, "amount": _units(abs(amount)),
+                      "type": "credit" if amount > 0 else "debit"} for account_id, amount in sorted(balances.items())]
+            result = sum(balances.values())
+            if result:
+                account_id, is_new = _equity_account(session, equity_account)
+                created = account_id if is_new else None
+                lines.append({"account_id": account_id, "amount": _units(abs(result)),
+                              "type": "debit" if result > 0 else "credit"})
+            post_vouchers(session, [{"voucher_type": fiscal.CLOSING_VOUCHER_TYPE, "date": fiscal.last_instant(fy),
+                                     "description": f"Closing entries for fiscal year {label}", "lines": lines}],
+                          commit=False)
+        session.add(FiscalYear(year=year, date_from=date_from, date_to=date_to, status="closing", archive=archive))
+        session.commit()
+        if created is not None:
+            # Statements list accounts from the cache: show the new one at once.
+            account_cache(session.get_bind()).added(created, RETAINED_EARNINGS, "Equity")
+        return fy
+
+def _create_archive_tables(conn, schema):
+    metadata = MetaData()
+    for model in (Account, JournalEntry, TransactionDetail, AccountPeriodBalance):
+        model.__table__.to_metadata(metadata, schema=schema)
+    metadata.create_all(conn)
+
+def _create_archive_indexes(conn, schema):
+    for name, table, columns in ARCHIVE_INDEXES:
+        if conn.dialect.name == "sqlite":
+            conn.execute(text(f"CREATE INDEX {schema}.{name} ON {table} ({columns})"))
+        else:
+            conn.execute(text(f"CREATE INDEX {name} ON {schema}.{table} ({columns})"))
+
+def _copy_year(conn, schema, fy):
+    # The live vouchers dated before the end of the year, the chart of
+    # accounts with each account's balance at the end of the year, and the
+    # monthly balances, into the archive tables of `schema`.
+    params = {"before": fy.date_to}
+    _create_archive_tables(conn, schema)
+    conn.execute(text(f"INSERT INTO {schema}.accounts (id, name, type, balance, version) "
+                      f"SELECT id, name, type, 0, version FROM accounts"))
+    conn.execute(_dated_before(f"INSERT INTO {schema}.journal_entries (id, date, description, voucher_type) "
+                               f"SELECT id, date, description, voucher_type FROM journal_entries "
+                               f"WHERE date < :before"), params)
+    conn.execute(_dated_before(f"""
+        INSERT INTO {schema}.transaction_details (id, journal_entry_id, account_id, amount, type)
+        SELECT td.id, td.journal_entry_id, td.account_id, td.amount, td.type
+        FROM transaction_details td JOIN journal_entries je ON je.id = td.journal_entry_id
+        WHERE je.date < :before
+    """), params)
+    _create_archive_indexes(conn, schema)
+    balances = [{"id": account_id, "balance": int(amount)} for account_id, amount in conn.execute(text(
+        f"SELECT td.account_id, SUM({signed_amount_sql()}) FROM {schema}.transaction_details td "
+        f"GROUP BY td.account_id"))]
+    if balances:
+        conn.execute(text(f"UPDATE {schema}.accounts SET balance = :balance WHERE id = :id"), balances)
+    rebuild_period_balances(conn, schema)
+
+def _sync(path):
+    # fsync a file, or a directory so a rename in it is durable.
+    flags = os.O_RDONLY
+    if os.path.isdir(path):
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        flags |= os.O_DIRECTORY
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def write_archive(engine, fy):
+    # Step 2: (re)writes the archive of a year whose close is in progress.
+    if engine.dialect.name != "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {fy.archive} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {fy.archive}"))
+            _copy_year(conn, fy.archive, fy)
+        return
+    with engine.connect() as conn:
+        path = fiscal.archive_path(conn, fy.archive)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        conn.exec_driver_sql("ATTACH DATABASE ? AS archive_new", (tmp,))
+        try:
+            _copy_year(conn, "archive_new", fy)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql("DETACH DATABASE archive_new")
+    _sync(tmp)
+    os.replace(tmp, path)
+    _sync(os.path.dirname(path) or ".")
+
+def _line_totals(session, prefix, before=None):
+    # (vouchers, lines, highest line id, net amount) of the vouchers dated
+    # before `before` (None: all of them).
+    sql = text if before is None else _dated_before
+    where = "" if before is None else " WHERE je.date < :before"
+    params = {"before": before}
+    entries = session.execute(sql(f"SELECT COUNT(*) FROM {prefix}journal_entries je{where}"), params).scalar()
+    lines = session.execute(sql(f"""
+        SELECT COUNT(*), COALESCE(MAX(td.id), 0), COALESCE(SUM({signed_amount_sql()}), 0)
+        FROM {prefix}transaction_details td JOIN {prefix}journal_entries je ON je.id = td.journal_entry_id{where}
+    """), params).one()
+    return (entries,) + tuple(int(value) for value in lines)
+
+def finish_close(Session, fy, now=None):
+    # Step 3.  Returns (vouchers, lines) moved to the archive.
+    label = fiscal.year_label(fy)
+    with Session() as session:
+        alias = fiscal.attach(session, fy)  # before the transaction starts writing (SQLite)
+        _lock_ledger(session, "Fiscal Year Closed", f"Fiscal year {label} moved to {fy.archive}")
+        live = _line_totals(session, "", fy.date_to)
+        if live != _line_totals(session, f"{alias}."):
+            raise FiscalError(f"The vouchers of fiscal year {label} changed while the archive was written; "
+                              f"run the close again.")
+        balances = session.execute(text(f"SELECT id, balance FROM {alias}.accounts WHERE balance <> 0 "
+                                        f"ORDER BY id")).all()
+        nominal = set(REVENUE_TYPES + EXPENSE_TYPES)
+        types = {row.id: row.type for row in session.execute(text(f"SELECT id, type FROM {alias}.accounts"))}
+        left = [account_id for account_id, _ in balances if types[account_id] in nominal]
+        if left or sum(int(amount) for _, amount in balances):
+            raise FiscalError(f"The balances at the end of fiscal year {label} don't close "
+                              f"(accounts {', '.join(map(str, left)) or 'out of balance'}); run the close again.")
+
+        # The opening voucher goes in before the archived rows are deleted, so
+        # its ids are higher than theirs (SQLite hands out max(id) + 1): ids
+        # stay unique across the archives and the live tables.
+        opening_id = None
+        if balances:
+            entry = JournalEntry(date=fiscal.last_instant(fy), voucher_type=fiscal.OPENING_VOUCHER_TYPE,
+                                 description=f"Opening balances brought forward from fiscal year {label}")
+            session.add(entry)
+            session.flush()
+            opening_id = entry.id
+            bulk.insert_rows(session, TransactionDetail.__table__, [
+                {"journal_entry_id": entry.id, "account_id": account_id, "amount": abs(int(amount)),
+                 "type": "debit" if amount > 0 else "credit"} for account_id, amount in balances])
+        params = {"before": fy.date_to, "keep": opening_id or 0}
+        session.execute(_dated_before("DELETE FROM transaction_details WHERE journal_entry_id IN "
+                                      "(SELECT id FROM journal_entries WHERE date < :before AND id <> :keep)"), params)
+        session.execute(_dated_before("DELETE FROM journal_entries WHERE date < :before AND id <> :keep"), params)
+        # The monthly balances of the archived months go; the opening voucher
+        # is the movement of the year's last month.  Later closing balances
+        # already include everything before them.
+        period = period_of(fiscal.last_instant(fy))
+        session.execute(text("DELETE FROM account_period_balances WHERE period <= :period"), {"period": period})
+        bulk.insert_rows(session, AccountPeriodBalance.__table__, [
+            {"account_id": account_id, "period": period, "movement": int(amount), "closing_balance": int(amount)}
+            for account_id, amount in balances])
+        row = session.get(FiscalYear, fy.year)
+        row.status, row.opening_entry_id = "closed", opening_id
+        row.entries, row.lines = live[0], live[1]
+        row.closed_at = now or datetime.utcnow()
+        session.commit()
+        return live[0], live[1]
+
+def close_year(engine, year, start_month=1, equity_account=None, archive_dir=fiscal.ARCHIVE_DIR, now=None,
+               vacuum=False):
+    # All three steps; returns a summary dict with the time each took.
+    Session = sessionmaker(bind=engine)
+    timings = {}
+    started = time.perf_counter()
+    fy = retry_on_busy(start_close, Session, year, start_month, equity_account, archive_dir, now)
+    timings["closing entries"] = time.perf_counter() - started
+    started = time.perf_counter()
+    write_archive(engine, fy)
+    timings["archive"] = time.perf_counter() - started
+    started = time.perf_counter()
+    entries, lines = retry_on_busy(finish_close, Session, fy, now)
+    timings["move"] = time.perf_counter() - started
+    if vacuum and engine.dialect.name == "sqlite":
+        started = time.perf_counter()
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+        timings["vacuum"] = time.perf_counter() - started
+    return {"year": fy, "entries": entries, "lines": lines, "timings": timings}
+
+# -------------------------------
+# Command line: python -m ledger.yearend close|list
+# -------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ledger.yearend", description="Close fiscal years.")
+    parser.add_argument("--url", default=DATABASE_URL, help="SQLAlchemy database URL")
+    sub = parser.add_subparsers(dest="command", required=True)
+    close = sub.add_parser("close", help="post closing entries and move a year to its archive")
+    close.add_argument("year", type=int, help="calendar year the fiscal year starts in")
+    close.add_argument("--start-month", type=int, choices=range(1, 13), default=1, metavar="1-12",
+                       help="month the fiscal year starts in (first close only; later years follow on)")
+    close.add_argument("--equity-account", type=int, default=None,
+                       help=f"Equity account for the result (default: '{RETAINED_EARNINGS}')")
+    close.add_argument("--dir", default=fiscal.ARCHIVE_DIR,
+                       help="archive directory, relative to the database file (SQLite)")
+    close.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards (SQLite)")
+    sub.add_parser("list", help="list closed fiscal years")
+    args = parser.parse_args(argv)
+
+    engine = make_engine(args.url)
+    init_db(engine)
+    if args.command == "list":
+        with sessionmaker(bind=engine)() as session:
+            print("{:<9} {:<10} {:<10} {:<8} {:>10} {:>12}  {}".format(
+                "Year", "From", "To", "Status", "Vouchers", "Lines", "Archive"))
+            for row in session.query(FiscalYear).order_by(FiscalYear.year):
+                fy = fiscal.FiscalYearInfo(row.year, row.date_from, row.date_to, row.status, row.archive, None)
+                print("{:<9} {:%Y-%m-%d} {:%Y-%m-%d} {:<8} {:>10,} {:>12,}  {}".format(
+                    fiscal.year_label(fy), row.date_from, fiscal.last_instant(fy), row.status, row.entries or 0,
+                    row.lines or 0, row.archive))
+        return 0
+
+    try:
+        result = close_year(engine, args.year, args.start_month, args.equity_account, args.dir, vacuum=args.vacuum)
+    except (FiscalError, accounts.AccountError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    fy = result["year"]
+    print(f"Closed fiscal year {fiscal.year_label(fy)}: {result['entries']:,} vouchers, {result['lines']:,} lines "
+          f"moved to {fy.archive}.")
+    print(", ".join(f"{step} {seconds:.1f} s" for step, seconds in result["timings"].items()))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
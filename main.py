@@ -1,15 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from ledger.db import init_db, make_engine, retry_on_busy
+from ledger.money import MoneyUnits, to_minor
+from ledger.posting import PostingError, post_voucher
 
 # -------------------------------
 # Database Setup using SQLAlchemy
 # -------------------------------
 Base = declarative_base()
-engine = create_engine('sqlite:///accounting.db', echo=False)
+engine = make_engine(echo=False)  # URL and pool settings from ledger.config
 Session = sessionmaker(bind=engine)
 session = Session()
 
@@ -26,7 +29,7 @@ class Account(Base):
     id      = Column(Integer, primary_key=True)
     name    = Column(String(100), nullable=False)
     type    = Column(String(50), nullable=False)  # Asset, Liability, Equity, Revenue, Expense, Stock
-    balance = Column(Float, default=0.0)
+    balance = Column(MoneyUnits, default=0)  # stored in minor units, seen here in units (ledger.money)
 
 # --- Journal Entry / Voucher model ---
 class JournalEntry(Base):
@@ -43,7 +46,7 @@ class TransactionDetail(Base):
     id               = Column(Integer, primary_key=True)
     journal_entry_id = Column(Integer, ForeignKey('journal_entries.id'))
     account_id       = Column(Integer, ForeignKey('accounts.id'))
-    amount           = Column(Float, nullable=False)
+    amount           = Column(MoneyUnits, nullable=False)
     type             = Column(String(10), nullable=False)  # debit or credit
     journal_entry    = relationship('JournalEntry', back_populates='transactions')
 
@@ -61,11 +64,11 @@ class Stock(Base):
     id            = Column(Integer, primary_key=True)
     product_name  = Column(String(100), nullable=False)
     quantity      = Column(Integer, default=0)
-    purchase_price = Column(Float, default=0.0)
-    selling_price  = Column(Float, default=0.0)
+    purchase_price = Column(MoneyUnits, default=0)
+    selling_price  = Column(MoneyUnits, default=0)
     details       = Column(Text)
 
-Base.metadata.create_all(engine)
+init_db(engine)  # the schema comes from ledger.migrations
 
 def log_action(action, details):
     audit = AuditLog(action=action, details=details)
@@ -280,8 +283,8 @@ class TallyApp:
             return
         
         transactions = []
-        total_debit = 0.0
-        total_credit = 0.0
+        total_debit = 0  # minor units, so the totals compare exactly
+        total_credit = 0
         for (acc_combo, amt_entry, type_combo) in self.transaction_rows:
             acc_str = acc_combo.get().strip()
             if not acc_str:
@@ -291,8 +294,10 @@ class TallyApp:
             except Exception:
                 messagebox.showerror("Error", "Invalid account selection.")
                 return
+            # The typed text goes to the posting engine as is: no float rounding.
+            amount = amt_entry.get().strip()
             try:
-                amount = float(amt_entry.get())
+                minor = to_minor(amount)
             except ValueError:
                 messagebox.showerror("Error", "Please enter a valid amount.")
                 return
@@ -302,36 +307,26 @@ class TallyApp:
                 return
             transactions.append({"account_id": account_id, "amount": amount, "type": tran_type})
             if tran_type == "debit":
-                total_debit += amount
+                total_debit += minor
             else:
-                total_credit += amount
+                total_credit += minor
         
         if len(transactions) < 2:
             messagebox.showerror("Error", "At least two transactions are required.")
             return
-        if abs(total_debit - total_credit) > 0.001:
+        if total_debit != total_credit:
             messagebox.showerror("Error", "Total debits must equal total credits.")
             return
         
-        voucher = JournalEntry(description=description, voucher_type=voucher_type)
-        session.add(voucher)
-        session.commit()  # To get voucher.id
-        
-        for tran in transactions:
-            t = TransactionDetail(
-                journal_entry_id=voucher.id,
-                account_id=tran["account_id"],
-                amount=tran["amount"],
-                type=tran["type"]
-            )
-            session.add(t)
-            acc_obj = session.query(Account).get(tran["account_id"])
-            if tran["type"] == "debit":
-                acc_obj.balance += tran["amount"]
-            else:
-                acc_obj.balance -= tran["amount"]
-        session.commit()
-        log_action("Voucher Entry", f"Voucher ID {voucher.id} ({voucher.voucher_type}) created: {description}")
+        # Balances are changed with atomic "balance = balance + delta" updates
+        # (ledger.posting), so vouchers posted from several terminals at once
+        # never overwrite each other's changes.
+        voucher = {"voucher_type": voucher_type, "description": description, "lines": transactions}
+        try:
+            retry_on_busy(post_voucher, session, voucher)
+        except PostingError as e:
+            messagebox.showerror("Error", str(e))
+            return
         messagebox.showinfo("Success", "Voucher submitted successfully.")
         self.show_voucher_entry()
     
@@ -1,99 +1,86 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text
-from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+import atexit
+import functools
 import os
 import subprocess
+import sys
+import threading
 
-# For PDF generation using ReportLab:
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from ledger.db import DATABASE_URL, engine, read_engine, Session, ReadSession, init_db, retry_on_busy
+from ledger.posting import post_voucher, PostingError
+from ledger import accounts, archive, export, importer, instrument, queries, report_model, report_pack, reports, search, stock, users
+from ledger.audit import AuditWriter
+from ledger.cache import account_cache, account_label
+from ledger.tasks import TaskRunner
+from widgets import VirtualTreeview, TypeAheadPicker, TaskStatusBar
 
 # -------------------------------
 # Database Setup using SQLAlchemy
-# -------------------------------a
-Base = declarative_base()
-engine = create_engine('sqlite:///accounting.db', echo=False)
-Session = sessionmaker(bind=engine)
+# -------------------------------
+# Importing this module neither connects nor starts a thread: the report
+# pack's worker processes are spawned and run it again as __mp_main__.  The
+# app's start-up is start(), called from the __main__ block at the end.
+
+# Per-statement timings, screen spans and the slow query log (see
+# ledger.instrument); Ctrl+Shift+D opens the diagnostics screen.
+stats_flusher = instrument.StatsFlusher(instrument.stats)
+
+# Reads for the list screens (paged as the user scrolls).  Writes never go
+# through it: each one is a short transaction on its own session (write()).
 session = Session()
+accounts_cache = account_cache(engine)
+
+# Slow queries and file output run on worker threads with their own read-only
+# snapshot sessions; the Tk thread only builds widgets from the results (see
+# ledger.tasks and ledger.db).
+tasks = TaskRunner(ReadSession)
+
+def write(fn, *args):
+    # fn(session, *args) in its own session; retried while the database is locked.
+    def run():
+        with Session() as s:
+            return fn(s, *args)
+    return retry_on_busy(run)
 
-# --- User model ---
-class User(Base):
-    __tablename__ = 'users'
-    id       = Column(Integer, primary_key=True)
-    username = Column(String(80), unique=True, nullable=False)
-    password = Column(String(200), nullable=False)
-
-# --- Account model ---
-class Account(Base):
-    __tablename__ = 'accounts'
-    id      = Column(Integer, primary_key=True)
-    name    = Column(String(100), nullable=False)
-    type    = Column(String(50), nullable=False)  # Typical types: Asset, Liability, Equity, Revenue, Expense, Stock
-    balance = Column(Float, default=0.0)
-
-# --- Journal Entry / Voucher model ---
-class JournalEntry(Base):
-    __tablename__ = 'journal_entries'
-    id           = Column(Integer, primary_key=True)
-    date         = Column(DateTime, default=datetime.utcnow)
-    description  = Column(String(200))
-    voucher_type = Column(String(50), default="Journal")  # e.g., Journal, Payment, Receipt, Contra, Debit Note, Credit Note
-    transactions = relationship('TransactionDetail', back_populates='journal_entry')
-
-# --- Transaction Details ---
-class TransactionDetail(Base):
-    __tablename__ = 'transaction_details'
-    id               = Column(Integer, primary_key=True)
-    journal_entry_id = Column(Integer, ForeignKey('journal_entries.id'))
-    account_id       = Column(Integer, ForeignKey('accounts.id'))
-    amount           = Column(Float, nullable=False)
-    type             = Column(String(10), nullable=False)  # debit or credit
-    journal_entry    = relationship('JournalEntry', back_populates='transactions')
-
-# --- Audit Log ---
-class AuditLog(Base):
-    __tablename__ = 'audit_logs'
-    id        = Column(Integer, primary_key=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    action    = Column(String(100))
-    details   = Column(String(500))
-
-# --- Stock Management ---
-class Stock(Base):
-    __tablename__ = 'stocks'
-    id             = Column(Integer, primary_key=True)
-    product_name   = Column(String(100), nullable=False)
-    quantity       = Column(Integer, default=0)
-    purchase_price = Column(Float, default=0.0)
-    selling_price  = Column(Float, default=0.0)
-    details        = Column(Text)
-
-Base.metadata.create_all(engine)
+# Audit rows are written in batches by a background thread; log_action() is
+# called after the change it describes has been committed.
+audit_writer = AuditWriter(engine)
+
+def start():
+    init_db(engine)
+    instrument.install(engine, slow_ms=float(os.environ.get("LEDGER_SLOW_QUERY_MS", instrument.SLOW_QUERY_MS)),
+                       slow_log=os.path.join(instrument.STATS_DIR, "slow-queries.jsonl"))
+    instrument.install(read_engine)
+    stats_flusher.start()
+    atexit.register(stats_flusher.close)
+    atexit.register(audit_writer.close)
+    # Move audit rows past the retention period to the compressed archive (at
+    # most once a day), without holding up start-up.
+    threading.Thread(target=archive.archive_due, args=(engine,), name="audit-archive", daemon=True).start()
 
 def log_action(action, details):
-    audit = AuditLog(action=action, details=details)
-    session.add(audit)
-    session.commit()
+    audit_writer.log(action, details)
 
-# -------------------------------
-# PDF Generation Function
-# -------------------------------
-def save_report_as_pdf(report_text, file_path):
-    c = canvas.Canvas(file_path, pagesize=letter)
-    width, height = letter
-    # Use a fixed line spacing
-    lines = report_text.splitlines()
-    y = height - 50
-    for line in lines:
-        c.drawString(50, y, line)
-        y -= 15
-        if y < 50:
-            c.showPage()
-            y = height - 50
-    c.save()
+def account_picker(master, width=30):
+    # Type-ahead account field: matches code, name prefix, words, substrings and typos.
+    return TypeAheadPicker(master, lambda text_: accounts_cache.search(text_, 12), account_label, width=width)
+
+def timed_screen(method):
+    # Times a screen as <name>.build (widgets, and any query run on the Tk
+    # thread) and <name>.render (Tk drawing them); background work started
+    # with run_task() adds <name>.query and the build of its results.
+    name = method.__name__
+
+    @functools.wraps(method)
+    def run(self, *args, **kwargs):
+        self.current_span = name
+        with instrument.span(f"{name}.build"):
+            result = method(self, *args, **kwargs)
+        self.time_render(name)
+        return result
+    return run
 
 # -------------------------------
 # Login / Registration Window
@@ -124,8 +111,8 @@ class LoginWindow:
             messagebox.showerror("Error", "Please enter both username and password.")
             return
         
-        user = session.query(User).filter_by(username=username).first()
-        if user and check_password_hash(user.password, password):
+        user = users.authenticate(session, username, password)
+        if user:
             log_action("Login", f"User '{username}' logged in.")
             self.master.destroy()
             root = tk.Tk()
@@ -135,20 +122,11 @@ class LoginWindow:
             messagebox.showerror("Error", "Invalid credentials.")
     
     def register(self):
-        username = self.entry_username.get().strip()
-        password = self.entry_password.get().strip()
-        if not username or not password:
-            messagebox.showerror("Error", "Please enter both username and password.")
-            return
-        
-        if session.query(User).filter_by(username=username).first():
-            messagebox.showerror("Error", "Username already exists.")
+        try:
+            write(users.register_user, self.entry_username.get(), self.entry_password.get())
+        except users.UserError as e:
+            messagebox.showerror("Error", str(e))
             return
-        hashed_password = generate_password_hash(password)
-        new_user = User(username=username, password=hashed_password)
-        session.add(new_user)
-        session.commit()
-        log_action("Registration", f"User '{username}' registered.")
         messagebox.showinfo("Success", "User registered successfully. You can now log in.")
 
 # -------------------------------
@@ -161,6 +139,10 @@ class TallyApp:
         master.title("Accounting Software")
         master.geometry("1100x650")
         
+        # Status bar for background work (spans the bottom of the window)
+        self.status_bar = TaskStatusBar(master, bd=1, relief='sunken')
+        self.status_bar.pack(side='bottom', fill='x')
+        
         # Left Navigation Panel
         self.nav_frame = tk.Frame(master, width=200, bg='lightgray')
         self.nav_frame.pack(side='left', fill='y')
@@ -173,38 +155,94 @@ class TallyApp:
         tk.Button(self.nav_frame, text="Ledger", command=self.show_ledger, **btn_config).pack(fill='x')
         tk.Button(self.nav_frame, text="Reports", command=self.show_reports, **btn_config).pack(fill='x')
         tk.Button(self.nav_frame, text="Audit Logs", command=self.show_audit_logs, **btn_config).pack(fill='x')
+        tk.Button(self.nav_frame, text="Search", command=self.show_search, **btn_config).pack(fill='x')
         
         # Main Content Area
         self.content_frame = tk.Frame(master, bg='white')
         self.content_frame.pack(side='left', fill='both', expand=True)
         
+        master.protocol("WM_DELETE_WINDOW", self.on_close)
+        master.bind_all("<Control-D>", lambda event: self.show_diagnostics())
+        self.current_span = None
+        self.poll_tasks()
         self.show_dashboard()
+
+    def on_close(self):
+        tasks.shutdown()
+        audit_writer.close()
+        self.master.destroy()
     
     def clear_content(self):
+        # Results of work started for the previous screen are dropped.
+        self.cancel_task()
         for widget in self.content_frame.winfo_children():
             widget.destroy()
     
+    # ---------------------------
+    # Background work
+    # ---------------------------
+    def poll_tasks(self):
+        tasks.deliver()
+        self.master.after(50, self.poll_tasks)
+
+    def run_task(self, message, fn, *args, on_done=None, error_prefix="", key="screen", session=True):
+        # Runs fn(session, task, *args) on a worker thread and on_done(result)
+        # back on the Tk thread, unless the screen has moved on in the meantime.
+        span = (self.current_span if key == "screen" else None) or key
+
+        def timed(*fn_args):
+            with instrument.span(f"{span}.query"):
+                return fn(*fn_args)
+
+        def done(result):
+            self.status_bar.finish()
+            if on_done:
+                with instrument.span(f"{span}.build"):
+                    on_done(result)
+                self.time_render(span)
+
+        def failed(error):
+            self.status_bar.finish()
+            messagebox.showerror("Error", f"{error_prefix}{error}")
+
+        tasks.submit(key, timed, *args, on_done=done, on_error=failed, on_progress=self.status_bar.progress, session=session)
+        self.status_bar.start(message, on_cancel=lambda: tasks.cancel(key))
+
+    def time_render(self, name):
+        with instrument.span(f"{name}.render"):
+            self.master.update_idletasks()
+
+    def cancel_task(self, key="screen"):
+        if tasks.busy(key):
+            tasks.cancel(key)
+            self.status_bar.finish()
+    
     # ---------------------------
     # Dashboard Screen
     # ---------------------------
+    @timed_screen
     def show_dashboard(self):
         self.clear_content()
         tk.Label(self.content_frame, text="Dashboard", font=('Arial', 16, 'bold'), bg='white').pack(pady=10)
-        total_accounts = session.query(Account).count()
-        total_vouchers = session.query(JournalEntry).count()
-        total_stock = session.query(Stock).count()
-        last_entry = session.query(JournalEntry).order_by(JournalEntry.date.desc()).first()
-        
-        summary = f"Total Accounts: {total_accounts}\nTotal Vouchers: {total_vouchers}\nTotal Stock Items: {total_stock}\n"
-        if last_entry:
-            summary += f"Last Voucher: {last_entry.description} ({last_entry.voucher_type}) on {last_entry.date.strftime('%Y-%m-%d %H:%M:%S')}"
-        else:
-            summary += "No vouchers recorded yet."
-        tk.Label(self.content_frame, text=summary, font=('Arial', 12), bg='white').pack(pady=20)
+        summary_label = tk.Label(self.content_frame, text="Loading...", font=('Arial', 12), bg='white')
+        summary_label.pack(pady=20)
+
+        def load(s, task):
+            info = queries.dashboard_summary(s)
+            summary = f"Total Accounts: {info.accounts}\nTotal Vouchers: {info.vouchers}\nTotal Stock Items: {info.stock_items}\n"
+            if info.last_voucher:
+                description, voucher_type, date = info.last_voucher
+                summary += f"Last Voucher: {description} ({voucher_type}) on {date.strftime('%Y-%m-%d %H:%M:%S')}"
+            else:
+                summary += "No vouchers recorded yet."
+            return summary
+
+        self.run_task("Loading dashboard...", load, on_done=lambda summary: summary_label.config(text=summary))
     
     # ---------------------------
     # Masters (Accounts) Screen with Delete Feature
     # ---------------------------
+    @timed_screen
     def show_accounts_master(self):
         self.clear_content()
         tk.Label(self.content_frame, text="Accounts Master", font=('Arial', 16, 'bold'), bg='white').pack(pady=10)
@@ -212,12 +250,8 @@ class TallyApp:
         # Accounts Treeview in tabular form
         tree_frame = tk.Frame(self.content_frame)
         tree_frame.pack(fill='both', expand=True)
-        self.accounts_tree = ttk.Treeview(tree_frame, columns=("ID", "Name", "Type", "Balance"), show="headings")
-        for col in ("ID", "Name", "Type", "Balance"):
-            self.accounts_tree.heading(col, text=col)
-            self.accounts_tree.column(col, width=120)
+        self.accounts_tree = VirtualTreeview(tree_frame, queries.accounts_source(session), ("ID", "Name", "Type", "Balance"))
         self.accounts_tree.pack(fill='both', expand=True)
-        self.refresh_accounts_tree()
         
         # Buttons and Form Frame for Add/Delete
         btn_frame = tk.Frame(self.content_frame, bg='white')
@@ -227,53 +261,42 @@ class TallyApp:
         self.entry_account_name = tk.Entry(btn_frame)
         self.entry_account_name.grid(row=0, column=1, padx=5, pady=2)
         tk.Label(btn_frame, text="Type:", bg='white').grid(row=0, column=2, padx=5, pady=2)
-        self.combo_account_type = ttk.Combobox(btn_frame, values=["Asset", "Liability", "Equity", "Revenue", "Expense", "Stock"])
+        self.combo_account_type = ttk.Combobox(btn_frame, values=accounts.ACCOUNT_TYPES)
         self.combo_account_type.grid(row=0, column=3, padx=5, pady=2)
         tk.Button(btn_frame, text="Add Account", command=self.add_account).grid(row=0, column=4, padx=5, pady=2)
         tk.Button(btn_frame, text="Delete Account", command=self.delete_account).grid(row=0, column=5, padx=5, pady=2)
     
     def refresh_accounts_tree(self):
-        for i in self.accounts_tree.get_children():
-            self.accounts_tree.delete(i)
-        accounts = session.query(Account).all()
-        for acc in accounts:
-            self.accounts_tree.insert("", "end", values=(acc.id, acc.name, acc.type, acc.balance))
+        self.accounts_tree.refresh()
     
     def add_account(self):
-        name = self.entry_account_name.get().strip()
-        acc_type = self.combo_account_type.get().strip()
-        if not name or not acc_type:
-            messagebox.showerror("Error", "Please provide both name and type.")
+        try:
+            write(accounts.create_account, self.entry_account_name.get(), self.combo_account_type.get())
+        except accounts.AccountError as e:
+            messagebox.showerror("Error", str(e))
             return
-        new_acc = Account(name=name, type=acc_type)
-        session.add(new_acc)
-        session.commit()
-        log_action("Account Created", f"Account '{name}' of type '{acc_type}' created.")
         messagebox.showinfo("Success", "Account added successfully.")
         self.refresh_accounts_tree()
     
     def delete_account(self):
-        selected_item = self.accounts_tree.selection()
-        if not selected_item:
+        selected_row = self.accounts_tree.selected_row()
+        if not selected_row:
             messagebox.showerror("Error", "Please select an account to delete.")
             return
         if not messagebox.askyesno("Confirm Deletion", "Are you sure you want to delete the selected account?"):
             return
-        item = self.accounts_tree.item(selected_item)
-        acc_id = item["values"][0]
-        acc = session.query(Account).get(acc_id)
-        if acc:
-            session.delete(acc)
-            session.commit()
-            log_action("Account Deleted", f"Account '{acc.name}' (ID {acc.id}) deleted.")
-            messagebox.showinfo("Success", "Account deleted successfully.")
-            self.refresh_accounts_tree()
-        else:
-            messagebox.showerror("Error", "Account not found.")
+        try:
+            write(accounts.delete_account, selected_row[0])
+        except accounts.AccountError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        messagebox.showinfo("Success", "Account deleted successfully.")
+        self.refresh_accounts_tree()
     
     # ---------------------------
     # Voucher Entry Screen
     # ---------------------------
+    @timed_screen
     def show_voucher_entry(self):
         self.clear_content()
         tk.Label(self.content_frame, text="Voucher Entry", font=('Arial', 16, 'bold'), bg='white').pack(pady=10)
@@ -300,10 +323,7 @@ class TallyApp:
     
     def add_transaction_row(self):
         row_index = len(self.transaction_rows) + 1
-        accounts = session.query(Account).all()
-        account_list = [f"{acc.id} - {acc.name}" for acc in accounts]
-        account_var = tk.StringVar()
-        account_combo = ttk.Combobox(self.transactions_frame, textvariable=account_var, values=account_list, width=18)
+        account_combo = account_picker(self.transactions_frame, width=18)
         account_combo.grid(row=row_index, column=0, padx=5, pady=2)
         amount_entry = tk.Entry(self.transactions_frame, width=22)
         amount_entry.grid(row=row_index, column=1, padx=5, pady=2)
@@ -319,76 +339,42 @@ class TallyApp:
             return
         
         transactions = []
-        total_debit = 0.0
-        total_credit = 0.0
         for (acc_combo, amt_entry, type_combo) in self.transaction_rows:
-            acc_str = acc_combo.get().strip()
-            if not acc_str:
+            if not acc_combo.text():
                 continue
-            try:
-                account_id = int(acc_str.split(" - ")[0])
-            except Exception:
+            account = acc_combo.get()
+            if account is None:
                 messagebox.showerror("Error", "Invalid account selection.")
                 return
-            try:
-                amount = float(amt_entry.get())
-            except ValueError:
-                messagebox.showerror("Error", "Please enter a valid amount.")
-                return
+            account_id = account.id
+            # The typed text goes to the posting engine as is (ledger.money.to_minor
+            # checks it), so large amounts aren't rounded through a float.
+            amount = amt_entry.get().strip()
             tran_type = type_combo.get().strip().lower()
-            if tran_type not in ["debit", "credit"]:
-                messagebox.showerror("Error", "Transaction type must be 'debit' or 'credit'.")
-                return
             transactions.append({"account_id": account_id, "amount": amount, "type": tran_type})
-            if tran_type == "debit":
-                total_debit += amount
-            else:
-                total_credit += amount
         
-        if len(transactions) < 2:
-            messagebox.showerror("Error", "At least two transactions are required.")
-            return
-        if abs(total_debit - total_credit) > 0.001:
-            messagebox.showerror("Error", "Total debits must equal total credits.")
+        # Validation, lines, balances and the audit entry go through the posting
+        # engine in a single transaction.
+        try:
+            write(post_voucher, {"voucher_type": voucher_type, "description": description, "lines": transactions})
+        except PostingError as e:
+            messagebox.showerror("Error", str(e))
             return
-        
-        voucher = JournalEntry(description=description, voucher_type=voucher_type)
-        session.add(voucher)
-        session.commit()  # To get voucher.id
-        
-        for tran in transactions:
-            t = TransactionDetail(
-                journal_entry_id=voucher.id,
-                account_id=tran["account_id"],
-                amount=tran["amount"],
-                type=tran["type"]
-            )
-            session.add(t)
-            acc_obj = session.query(Account).get(tran["account_id"])
-            if tran["type"] == "debit":
-                acc_obj.balance += tran["amount"]
-            else:
-                acc_obj.balance -= tran["amount"]
-        session.commit()
-        log_action("Voucher Entry", f"Voucher ID {voucher.id} ({voucher.voucher_type}) created: {description}")
         messagebox.showinfo("Success", "Voucher submitted successfully.")
         self.show_voucher_entry()
     
     # ---------------------------
     # Stock Management Screen
     # ---------------------------
+    @timed_screen
     def show_stock_management(self):
         self.clear_content()
         tk.Label(self.content_frame, text="Stock Management", font=('Arial', 16, 'bold'), bg='white').pack(pady=10)
         
         tree_frame = tk.Frame(self.content_frame)
         tree_frame.pack(fill='both', expand=True)
-        self.stock_tree = ttk.Treeview(tree_frame, columns=("ID", "Product Name", "Quantity", "Purchase Price", "Selling Price"), show="headings")
-        for col in ("ID", "Product Name", "Quantity", "Purchase Price", "Selling Price"):
-            self.stock_tree.heading(col, text=col)
-            self.stock_tree.column(col, width=120)
+        self.stock_tree = VirtualTreeview(tree_frame, queries.stock_source(session), ("ID", "Product Name", "Quantity", "Purchase Price", "Selling Price"))
         self.stock_tree.pack(fill='both', expand=True)
-        self.refresh_stock_tree()
         
         form_frame = tk.Frame(self.content_frame, bg='white')
         form_frame.pack(fill='x', pady=10)
@@ -410,283 +396,392 @@ class TallyApp:
         tk.Button(form_frame, text="Add Stock Item", command=self.add_stock_item).grid(row=3, column=0, columnspan=4, pady=5)
     
     def refresh_stock_tree(self):
-        for i in self.stock_tree.get_children():
-            self.stock_tree.delete(i)
-        stocks = session.query(Stock).all()
-        for item in stocks:
-            self.stock_tree.insert("", "end", values=(item.id, item.product_name, item.quantity, item.purchase_price, item.selling_price))
+        self.stock_tree.refresh()
     
     def add_stock_item(self):
-        product_name = self.entry_product_name.get().strip()
         try:
-            quantity = int(self.entry_quantity.get().strip())
-            purchase_price = float(self.entry_purchase_price.get().strip())
-            selling_price = float(self.entry_selling_price.get().strip())
-        except ValueError:
-            messagebox.showerror("Error", "Please enter valid numeric values for quantity and prices.")
+            write(stock.add_stock_item, self.entry_product_name.get(), self.entry_quantity.get().strip(),
+                  self.entry_purchase_price.get().strip(), self.entry_selling_price.get().strip(),
+                  self.entry_stock_details.get())
+        except stock.StockError as e:
+            messagebox.showerror("Error", str(e))
             return
-        details = self.entry_stock_details.get().strip()
-        if not product_name:
-            messagebox.showerror("Error", "Product name is required.")
-            return
-        new_stock = Stock(product_name=product_name, quantity=quantity, purchase_price=purchase_price, selling_price=selling_price, details=details)
-        session.add(new_stock)
-        session.commit()
-        log_action("Stock Entry", f"New stock item '{product_name}' added with quantity {quantity}.")
         messagebox.showinfo("Success", "Stock item added successfully.")
         self.refresh_stock_tree()
     
     # ---------------------------
     # Ledger Screen
     # ---------------------------
+    @timed_screen
     def show_ledger(self):
         self.clear_content()
         tk.Label(self.content_frame, text="Ledger", font=('Arial', 16, 'bold'), bg='white').pack(pady=10)
         top_frame = tk.Frame(self.content_frame, bg='white')
         top_frame.pack(fill='x', pady=5)
         tk.Label(top_frame, text="Select Account:", bg='white').pack(side='left', padx=5)
-        self.ledger_account_var = tk.StringVar()
-        self.ledger_account_combo = ttk.Combobox(top_frame, textvariable=self.ledger_account_var)
-        self.refresh_ledger_account_combo()
+        self.ledger_account_combo = account_picker(top_frame)
         self.ledger_account_combo.pack(side='left', padx=5)
+        self.ledger_account_combo.bind("<<ItemPicked>>", lambda e: self.load_ledger())
+        tk.Label(top_frame, text="From (YYYY-MM-DD):", bg='white').pack(side='left', padx=5)
+        self.entry_ledger_from = tk.Entry(top_frame, width=12)
+        self.entry_ledger_from.pack(side='left', padx=5)
         tk.Button(top_frame, text="Load Ledger", command=self.load_ledger).pack(side='left', padx=5)
+        tk.Button(top_frame, text="Export PDF", command=self.export_ledger_pdf).pack(side='left', padx=5)
         
-        self.ledger_tree = ttk.Treeview(self.content_frame, columns=("ID", "VoucherID", "AccountID", "Amount", "Type"), show="headings")
-        for col in ("ID", "VoucherID", "AccountID", "Amount", "Type"):
-            self.ledger_tree.heading(col, text=col)
-            self.ledger_tree.column(col, width=100)
+        # Only the visible ledger rows are materialized; pages are fetched as the user scrolls.
+        columns = ("Date", "Voucher Type", "Description", "Debit", "Credit", "Balance")
+        self.ledger_tree = VirtualTreeview(self.content_frame, None, columns, widths={"Description": 250})
         self.ledger_tree.pack(fill='both', expand=True, pady=5)
     
-    def refresh_ledger_account_combo(self):
-        accounts = session.query(Account).all()
-        acc_list = [f"{acc.id} - {acc.name}" for acc in accounts]
-        self.ledger_account_combo['values'] = acc_list
-    
+    @timed_screen
     def load_ledger(self):
-        acc_str = self.ledger_account_combo.get().strip()
-        if not acc_str:
+        account = self.ledger_account_combo.get()
+        if account is None:
+            messagebox.showerror("Error", "Please select an account.")
+            return
+        account_id = account.id
+        date_from = None
+        from_str = self.entry_ledger_from.get().strip()
+        if from_str:
+            try:
+                date_from = datetime.strptime(from_str, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid date '{from_str}'. Use YYYY-MM-DD.")
+                return
+        # The opening balance is the slow part; the pages are read as the user scrolls.
+        self.run_task("Loading ledger...", lambda s, task: queries.first_cursor(s, account_id, date_from),
+                      on_done=lambda start: self.ledger_tree.set_source(
+                          queries.LedgerSource(session, account_id, date_from, start=start)))
+
+    def export_ledger_pdf(self):
+        # The whole ledger, not just the rows on screen; pages are streamed to
+        # the file on a worker thread.
+        account = self.ledger_account_combo.get()
+        if account is None:
             messagebox.showerror("Error", "Please select an account.")
             return
-        account_id = int(acc_str.split(" - ")[0])
-        transactions = session.query(TransactionDetail).filter_by(account_id=account_id).all()
-        for i in self.ledger_tree.get_children():
-            self.ledger_tree.delete(i)
-        for tran in transactions:
-            self.ledger_tree.insert("", "end", values=(tran.id, tran.journal_entry_id, tran.account_id, tran.amount, tran.type))
+        date_from = None
+        from_str = self.entry_ledger_from.get().strip()
+        if from_str:
+            try:
+                date_from = datetime.strptime(from_str, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid date '{from_str}'. Use YYYY-MM-DD.")
+                return
+        file_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf")],
+                                                 title="Export Ledger as PDF")
+        if file_path:
+            self.run_task("Exporting ledger...", lambda s, task: export.write_ledger_pdf(
+                              s, account.id, account.name, file_path, date_from, task.progress),
+                          key="export", error_prefix="Failed to export ledger: ",
+                          on_done=lambda result: messagebox.showinfo(
+                              "Export PDF", f"Ledger saved as PDF: {os.path.basename(file_path)} ({result['pages']} pages)"))
     
     # ---------------------------
-    # Reports Screen (Modern Two-Pane, PDF & Print, Profit & Loss Balancing)
+    # Reports Screen (one report model: on screen, PDF, XLSX, CSV & Print)
     # ---------------------------
+    @timed_screen
     def show_reports(self):
         self.clear_content()
         tk.Label(self.content_frame, text="Reports", font=('Arial', 16, 'bold'), bg='white').pack(pady=10)
+        
+        # Period selector (YYYY-MM-DD, both inclusive; blank = open-ended)
+        period_frame = tk.Frame(self.content_frame, bg='white')
+        period_frame.pack(pady=5)
+        tk.Label(period_frame, text="From:", bg='white').pack(side='left', padx=5)
+        self.entry_report_from = tk.Entry(period_frame, width=12)
+        self.entry_report_from.pack(side='left', padx=5)
+        tk.Label(period_frame, text="To / As of:", bg='white').pack(side='left', padx=5)
+        self.entry_report_to = tk.Entry(period_frame, width=12)
+        self.entry_report_to.pack(side='left', padx=5)
+        tk.Label(period_frame, text="(YYYY-MM-DD)", bg='white').pack(side='left', padx=5)
+        
         btn_frame = tk.Frame(self.content_frame, bg='white')
         btn_frame.pack(pady=5)
         tk.Button(btn_frame, text="Trial Balance", command=self.report_trial_balance, width=15).grid(row=0, column=0, padx=5)
         tk.Button(btn_frame, text="Income Statement", command=self.report_income_statement, width=15).grid(row=0, column=1, padx=5)
         tk.Button(btn_frame, text="Balance Sheet", command=self.report_balance_sheet, width=15).grid(row=0, column=2, padx=5)
         
-        # Additional buttons for PDF and printing:
+        # Export and printing work from the report on screen (self.current_report).
         btn_frame2 = tk.Frame(self.content_frame, bg='white')
         btn_frame2.pack(pady=5)
-        tk.Button(btn_frame2, text="Save as PDF", command=self.save_report_pdf, width=15).pack(side='left', padx=5)
+        tk.Button(btn_frame2, text="Export...", command=self.export_report, width=15).pack(side='left', padx=5)
         tk.Button(btn_frame2, text="Print Report", command=self.print_report_pdf, width=15).pack(side='left', padx=5)
+        tk.Button(btn_frame2, text="Report Pack...", command=self.export_report_pack, width=15).pack(side='left', padx=5)
         
         self.report_frame = tk.Frame(self.content_frame, bg='white')
         self.report_frame.pack(fill='both', padx=5, pady=5, expand=True)
         
-        # Variable to store current report text for PDF generation/printing
-        self.current_report = ""
+        # The report_model.Report on screen, for export and printing
+        self.current_report = None
+    
+    def get_report_period(self):
+        # Returns (date_from, date_to), or None after showing an error.
+        dates = []
+        for entry in (self.entry_report_from, self.entry_report_to):
+            value = entry.get().strip()
+            if not value:
+                dates.append(None)
+                continue
+            try:
+                dates.append(datetime.strptime(value, "%Y-%m-%d").date())
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid date '{value}'. Use YYYY-MM-DD.")
+                return None
+        if dates[0] and dates[1] and dates[0] > dates[1]:
+            messagebox.showerror("Error", "The From date must not be after the To date.")
+            return None
+        return tuple(dates)
     
+    @timed_screen
     def report_trial_balance(self):
-        for widget in self.report_frame.winfo_children():
-            widget.destroy()
-        accounts = session.query(Account).all()
-        tree = ttk.Treeview(self.report_frame, columns=("ID", "Name", "Type", "Balance"), show="headings")
-        for col in ("ID", "Name", "Type", "Balance"):
-            tree.heading(col, text=col)
-            tree.column(col, width=120)
-        tree.pack(fill='both', expand=True)
-        for acc in accounts:
-            tree.insert("", "end", values=(acc.id, acc.name, acc.type, f"{acc.balance:.2f}"))
-        report_text = "TRIAL BALANCE\n\n"
-        report_text += "{:<5} {:<20} {:<15} {:>10}\n".format("ID", "Name", "Type", "Balance")
-        report_text += "-"*55 + "\n"
-        for acc in accounts:
-            report_text += "{:<5} {:<20} {:<15} {:>10.2f}\n".format(acc.id, acc.name, acc.type, acc.balance)
-        self.current_report = report_text
+        period = self.get_report_period()
+        if period is None:
+            return
+        self.run_task("Computing trial balance...",
+                      lambda s, task: report_model.build_report(s, "trial_balance", *period), on_done=self.render_report)
     
+    @timed_screen
     def report_income_statement(self):
-        for widget in self.report_frame.winfo_children():
-            widget.destroy()
-        # In our model, assume accounts with type "Revenue" and also "Discount Received" are treated as revenues.
-        # And accounts with type "Expense" and also "Discount Allowed", "Depreciation", "Bad Debt" are treated as expenses.
-        revenues = session.query(Account).filter(Account.type.in_(["Revenue", "Discount Received"])).all()
-        expenses = session.query(Account).filter(Account.type.in_(["Expense", "Discount Allowed", "Depreciation", "Bad Debt"])).all()
-        total_rev = sum(acc.balance for acc in revenues)
-        total_exp = sum(acc.balance for acc in expenses)
-        net_result = total_rev - total_exp
-        
-        # Use a PanedWindow to show Revenues on left and Expenses on right
-        pw = tk.PanedWindow(self.report_frame, orient=tk.HORIZONTAL, bg='white')
-        pw.pack(fill='both', expand=True)
-        
-        left_frame = tk.Frame(pw, bg='white')
-        right_frame = tk.Frame(pw, bg='white')
-        pw.add(left_frame)
-        pw.add(right_frame)
-        
-        tk.Label(left_frame, text="Revenues", font=('Arial', 12, 'bold'), bg='white').pack(pady=5)
-        rev_tree = ttk.Treeview(left_frame, columns=("ID", "Name", "Balance"), show="headings")
-        for col in ("ID", "Name", "Balance"):
-            rev_tree.heading(col, text=col)
-            rev_tree.column(col, width=120)
-        rev_tree.pack(fill='both', expand=True)
-        for acc in revenues:
-            rev_tree.insert("", "end", values=(acc.id, acc.name, f"{acc.balance:.2f}"))
-        
-        tk.Label(right_frame, text="Expenses", font=('Arial', 12, 'bold'), bg='white').pack(pady=5)
-        exp_tree = ttk.Treeview(right_frame, columns=("ID", "Name", "Balance"), show="headings")
-        for col in ("ID", "Name", "Balance"):
-            exp_tree.heading(col, text=col)
-            exp_tree.column(col, width=120)
-        exp_tree.pack(fill='both', expand=True)
-        for acc in expenses:
-            exp_tree.insert("", "end", values=(acc.id, acc.name, f"{acc.balance:.2f}"))
-        
-        # Calculate net profit/loss and create balancing row
-        if net_result >= 0:
-            balance_text = f"Net Profit c/d: {net_result:.2f}"
-        else:
-            balance_text = f"Net Loss c/d: {abs(net_result):.2f}"
-        
-        summary_label = tk.Label(self.report_frame, text=f"Total Revenue: {total_rev:.2f}    Total Expense: {total_exp:.2f}\n{balance_text}", font=('Arial', 12), bg='white')
-        summary_label.pack(pady=5)
-        
-        # Prepare report text for PDF/printing
-        report_text = "INCOME STATEMENT\n\nRevenues:\n"
-        report_text += "{:<5} {:<20} {:>10}\n".format("ID", "Name", "Balance")
-        report_text += "-"*40 + "\n"
-        for acc in revenues:
-            report_text += "{:<5} {:<20} {:>10.2f}\n".format(acc.id, acc.name, acc.balance)
-        report_text += "\nExpenses:\n"
-        report_text += "{:<5} {:<20} {:>10}\n".format("ID", "Name", "Balance")
-        report_text += "-"*40 + "\n"
-        for acc in expenses:
-            report_text += "{:<5} {:<20} {:>10.2f}\n".format(acc.id, acc.name, acc.balance)
-        report_text += f"\nTotal Revenue: {total_rev:.2f}\nTotal Expense: {total_exp:.2f}\n"
-        if net_result >= 0:
-            report_text += f"Net Profit c/d: {net_result:.2f}\n"
-        else:
-            report_text += f"Net Loss c/d: {abs(net_result):.2f}\n"
-        self.current_report = report_text
+        period = self.get_report_period()
+        if period is None:
+            return
+        # In our model, accounts with type "Revenue" and also "Discount Received" are treated as revenues,
+        # and accounts with type "Expense" and also "Discount Allowed", "Depreciation", "Bad Debt" as expenses.
+        self.run_task("Computing income statement...",
+                      lambda s, task: report_model.build_report(s, "income_statement", *period), on_done=self.render_report)
     
+    @timed_screen
     def report_balance_sheet(self):
+        period = self.get_report_period()
+        if period is None:
+            return
+        # The balance sheet is a position: only the To / As of date applies.
+        self.run_task("Computing balance sheet...",
+                      lambda s, task: report_model.build_report(s, "balance_sheet", None, period[1]),
+                      on_done=self.render_report)
+    
+    def render_report(self, report):
         for widget in self.report_frame.winfo_children():
             widget.destroy()
-        assets = session.query(Account).filter_by(type="Asset").all()
-        liabilities = session.query(Account).filter_by(type="Liability").all()
-        equity = session.query(Account).filter_by(type="Equity").all()
-        total_assets = sum(acc.balance for acc in assets)
-        total_liab = sum(acc.balance for acc in liabilities)
-        total_equity = sum(acc.balance for acc in equity)
-        
-        # Use a PanedWindow: Left pane for Assets; Right pane for Liabilities & Equity
-        pw = tk.PanedWindow(self.report_frame, orient=tk.HORIZONTAL, bg='white')
-        pw.pack(fill='both', expand=True)
-        left_frame = tk.Frame(pw, bg='white')
-        right_frame = tk.Frame(pw, bg='white')
-        pw.add(left_frame)
-        pw.add(right_frame)
-        
-        tk.Label(left_frame, text="Assets", font=('Arial', 12, 'bold'), bg='white').pack(pady=5)
-        asset_tree = ttk.Treeview(left_frame, columns=("ID", "Name", "Balance"), show="headings")
-        for col in ("ID", "Name", "Balance"):
-            asset_tree.heading(col, text=col)
-            asset_tree.column(col, width=120)
-        asset_tree.pack(fill='both', expand=True)
-        for acc in assets:
-            asset_tree.insert("", "end", values=(acc.id, acc.name, f"{acc.balance:.2f}"))
-        
-        tk.Label(right_frame, text="Liabilities & Equity", font=('Arial', 12, 'bold'), bg='white').pack(pady=5)
-        le_tree = ttk.Treeview(right_frame, columns=("ID", "Name", "Balance"), show="headings")
-        for col in ("ID", "Name", "Balance"):
-            le_tree.heading(col, text=col)
-            le_tree.column(col, width=120)
-        le_tree.pack(fill='both', expand=True)
-        for acc in liabilities:
-            le_tree.insert("", "end", values=(acc.id, acc.name, f"{acc.balance:.2f}"))
-        for acc in equity:
-            le_tree.insert("", "end", values=(acc.id, acc.name, f"{acc.balance:.2f}"))
-        
-        summary_label = tk.Label(self.report_frame, text=f"Total Assets: {total_assets:.2f}    Total Liabilities: {total_liab:.2f}    Total Equity: {total_equity:.2f}\nAccounting Equation Valid: {abs(total_assets - (total_liab + total_equity)) < 0.001}", font=('Arial', 12), bg='white')
-        summary_label.pack(pady=5)
-        
-        report_text = "BALANCE SHEET\n\nAssets:\n"
-        report_text += "{:<5} {:<20} {:>10}\n".format("ID", "Name", "Balance")
-        report_text += "-"*40 + "\n"
-        for acc in assets:
-            report_text += "{:<5} {:<20} {:>10.2f}\n".format(acc.id, acc.name, acc.balance)
-        report_text += "\nLiabilities & Equity:\n"
-        report_text += "{:<5} {:<20} {:>10}\n".format("ID", "Name", "Balance")
-        report_text += "-"*40 + "\n"
-        for acc in liabilities:
-            report_text += "{:<5} {:<20} {:>10.2f}\n".format(acc.id, acc.name, acc.balance)
-        for acc in equity:
-            report_text += "{:<5} {:<20} {:>10.2f}\n".format(acc.id, acc.name, acc.balance)
-        report_text += f"\nTotal Assets: {total_assets:.2f}\nTotal Liabilities: {total_liab:.2f}\nTotal Equity: {total_equity:.2f}\n"
-        report_text += f"Accounting Equation Valid: {abs(total_assets - (total_liab + total_equity)) < 0.001}\n"
-        self.current_report = report_text
+        tk.Label(self.report_frame, text=f"{report.title}    {report.period}", font=('Arial', 12, 'bold'),
+                 bg='white').pack(pady=5)
+        columns = [c.title for c in report.columns]
+        widths = {c.title: 60 if c.title == "ID" else 220 if c.kind == "text" else 120 for c in report.columns}
+        tree = VirtualTreeview(self.report_frame, report_model.ReportSource(report), columns, widths=widths)
+        tree.pack(fill='both', expand=True)
+        self.current_report = report
     
-    def save_report_pdf(self):
-        if not self.current_report:
-            messagebox.showerror("Error", "No report available to save.")
+    def export_report(self):
+        report = self.current_report
+        if report is None:
+            messagebox.showerror("Error", "No report available to export.")
             return
-        file_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf")],
-                                                 title="Save Report as PDF")
-        if file_path:
-            try:
-                save_report_as_pdf(self.current_report, file_path)
-                messagebox.showinfo("Save as PDF", f"Report saved as PDF: {os.path.basename(file_path)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save PDF: {str(e)}")
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf", title="Export Report",
+            filetypes=[("PDF Files", "*.pdf"), ("Excel Workbook", "*.xlsx"), ("CSV Files", "*.csv")])
+        if not file_path:
+            return
+        exporter = export.FILE_EXPORTERS.get(os.path.splitext(file_path)[1].lower())
+        if exporter is None:
+            messagebox.showerror("Error", "Please choose a .pdf, .xlsx or .csv file name.")
+            return
+        self.run_task("Exporting report...", lambda task: exporter(report, file_path, task.progress),
+                      key="export", session=False, error_prefix="Failed to export report: ",
+                      on_done=lambda _: messagebox.showinfo("Export", f"Report saved as {os.path.basename(file_path)}"))
+    
+    def export_report_pack(self):
+        # All three statements (and optionally every ledger) for the period in
+        # the From / To boxes, rendered in parallel into one zip.
+        period = self.get_report_period()
+        if period is None:
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".zip", filetypes=[("Zip Archives", "*.zip")],
+                                                 title="Save Report Pack")
+        if not file_path:
+            return
+        ledgers = "all" if messagebox.askyesno("Report Pack", "Include the ledger of every account?") else None
+
+        def build(s, task):
+            jobs = report_pack.plan_pack(s, report_pack.STATEMENTS, ledgers, *period)
+            return report_pack.run_pack(DATABASE_URL, jobs, file_path, *period, progress=task.progress)
+
+        self.run_task("Building report pack...", build, key="export", error_prefix="Failed to build report pack: ",
+                      on_done=lambda manifest: messagebox.showinfo("Report Pack", (
+                          f"{len(manifest['files'])} files saved in {os.path.basename(file_path)} "
+                          f"({manifest['wall_seconds']:.1f} s, {manifest['workers']} workers)")))
     
     def print_report_pdf(self):
-        if not self.current_report:
+        report = self.current_report
+        if report is None:
             messagebox.showerror("Error", "No report available to print.")
             return
         file_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf")],
                                                  title="Save Report as PDF for Printing")
         if file_path:
-            try:
-                save_report_as_pdf(self.current_report, file_path)
+            def print_pdf(task):
+                export.write_report_pdf(report, file_path, task.progress)
                 if os.name == 'nt':
                     os.startfile(file_path, "print")
                 else:
                     subprocess.run(["lpr", file_path])
-                messagebox.showinfo("Print Report", "Report sent to printer.")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to print report: {str(e)}")
+
+            self.run_task("Printing...", print_pdf, key="export", session=False,
+                          error_prefix="Failed to print report: ", on_done=lambda _: messagebox.showinfo("Print Report", "Report sent to printer."))
     
     # ---------------------------
     # Audit Logs Screen
     # ---------------------------
+    @timed_screen
     def show_audit_logs(self):
         self.clear_content()
         tk.Label(self.content_frame, text="Audit Logs", font=('Arial', 16, 'bold'), bg='white').pack(pady=10)
-        tree = ttk.Treeview(self.content_frame, columns=("ID", "Timestamp", "Action", "Details"), show="headings")
-        for col in ("ID", "Timestamp", "Action", "Details"):
-            tree.heading(col, text=col)
-            tree.column(col, width=150)
-        tree.pack(fill='both', expand=True, padx=5, pady=5)
-        logs = session.query(AuditLog).order_by(AuditLog.timestamp.desc()).all()
-        for log in logs:
-            tree.insert("", "end", values=(log.id, log.timestamp.strftime("%Y-%m-%d %H:%M:%S"), log.action, log.details))
+        top_frame = tk.Frame(self.content_frame, bg='white')
+        top_frame.pack(fill='x', pady=5)
+        tk.Label(top_frame, text="From (YYYY-MM-DD):", bg='white').pack(side='left', padx=5)
+        self.entry_audit_from = tk.Entry(top_frame, width=12)
+        self.entry_audit_from.pack(side='left', padx=5)
+        tk.Label(top_frame, text="To (YYYY-MM-DD):", bg='white').pack(side='left', padx=5)
+        self.entry_audit_to = tk.Entry(top_frame, width=12)
+        self.entry_audit_to.pack(side='left', padx=5)
+        tk.Button(top_frame, text="Show", command=self.load_audit_logs).pack(side='left', padx=5)
+        tk.Label(top_frame, text="(older entries are read from the archive)", bg='white', fg='gray').pack(side='left', padx=5)
+        columns = ("ID", "Timestamp", "Action", "Details")
+        self.audit_tree = VirtualTreeview(self.content_frame, None, columns, widths={col: 150 for col in columns})
+        self.audit_tree.pack(fill='both', expand=True, padx=5, pady=5)
+        self.load_audit_logs()
+
+    @timed_screen
+    def load_audit_logs(self):
+        dates = []
+        for entry in (self.entry_audit_from, self.entry_audit_to):
+            value = entry.get().strip()
+            try:
+                dates.append(datetime.strptime(value, "%Y-%m-%d") if value else None)
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid date '{value}'. Use YYYY-MM-DD.")
+                return
+        date_from, date_to = dates[0], reports.day_end(dates[1]) if dates[1] else None
+
+        def load(s, task):
+            audit_writer.checkpoint()
+            return archive.old_audit_rows(s, date_from, date_to)
+
+        # Counting archived partitions can take a while; table and archive pages are read on demand.
+        self.run_task("Loading audit logs...", load, on_done=lambda old: self.audit_tree.set_source(
+            archive.audit_history_source(session, date_from, date_to, old=old)))
+
+    # ---------------------------
+    # Search Screen (vouchers and audit logs)
+    # ---------------------------
+    @timed_screen
+    def show_search(self):
+        self.clear_content()
+        tk.Label(self.content_frame, text="Search", font=('Arial', 16, 'bold'), bg='white').pack(pady=10)
+        top_frame = tk.Frame(self.content_frame, bg='white')
+        top_frame.pack(fill='x', pady=5)
+        self.entry_search = tk.Entry(top_frame, width=30)
+        self.entry_search.pack(side='left', padx=5)
+        self.entry_search.bind("<Return>", lambda e: self.run_search())
+        self.combo_search_scope = ttk.Combobox(top_frame, values=["Vouchers", "Audit Logs"], state="readonly", width=10)
+        self.combo_search_scope.current(0)
+        self.combo_search_scope.pack(side='left', padx=5)
+        tk.Label(top_frame, text="From:", bg='white').pack(side='left', padx=2)
+        self.entry_search_from = tk.Entry(top_frame, width=11)
+        self.entry_search_from.pack(side='left', padx=2)
+        tk.Label(top_frame, text="To:", bg='white').pack(side='left', padx=2)
+        self.entry_search_to = tk.Entry(top_frame, width=11)
+        self.entry_search_to.pack(side='left', padx=2)
+        tk.Label(top_frame, text="Voucher Type:", bg='white').pack(side='left', padx=2)
+        self.combo_search_type = ttk.Combobox(top_frame, values=["", "Journal", "Payment", "Receipt", "Contra", "Debit Note", "Credit Note"], width=11)
+        self.combo_search_type.pack(side='left', padx=2)
+        tk.Button(top_frame, text="Search", command=self.run_search).pack(side='left', padx=5)
+        self.search_status = tk.Label(self.content_frame, text="", bg='white', anchor='w')
+        self.search_status.pack(fill='x', padx=5)
+        self.search_tree = VirtualTreeview(self.content_frame, None, ("ID", "Date", "Type / Action", "Description / Details"),
+                                           widths={"Description / Details": 400})
+        self.search_tree.pack(fill='both', expand=True, padx=5, pady=5)
+        self.entry_search.focus_set()
+
+    @timed_screen
+    def run_search(self):
+        dates = []
+        for entry in (self.entry_search_from, self.entry_search_to):
+            value = entry.get().strip()
+            try:
+                dates.append(datetime.strptime(value, "%Y-%m-%d") if value else None)
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid date '{value}'. Use YYYY-MM-DD.")
+                return
+        date_from, date_to = dates[0], reports.day_end(dates[1]) if dates[1] else None
+        text_ = self.entry_search.get().strip()
+        if self.combo_search_scope.get() == "Audit Logs":
+            audit_writer.checkpoint()
+            source = search.search_audit_logs(session, text_, date_from, date_to)
+        else:
+            source = search.search_vouchers(session, text_, date_from, date_to, self.combo_search_type.get().strip() or None)
+        self.search_tree.set_source(source)
+        self.search_status.config(text=f"{source.count():,} result(s)" + (", best matches first" if source.use_fts and text_ else ""))
+    
+    # ---------------------------
+    # Diagnostics Screen (hidden; Ctrl+Shift+D)
+    # ---------------------------
+    def show_diagnostics(self):
+        self.clear_content()
+        self.current_span = None
+        tk.Label(self.content_frame, text="Diagnostics", font=('Arial', 16, 'bold'), bg='white').pack(pady=10)
+        btn_frame = tk.Frame(self.content_frame, bg='white')
+        btn_frame.pack(fill='x')
+        tk.Button(btn_frame, text="Refresh", command=self.refresh_diagnostics).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Reset", command=lambda: (instrument.stats.reset(), self.refresh_diagnostics())).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Write Files Now", command=stats_flusher.flush).pack(side='left', padx=5)
+        self.diagnostics_status = tk.Label(btn_frame, text="", bg='white')
+        self.diagnostics_status.pack(side='left', padx=10)
+        
+        notebook = ttk.Notebook(self.content_frame)
+        notebook.pack(fill='both', expand=True, padx=5, pady=5)
+        self.diagnostics_trees = {}
+        for title, columns in (("Screens", ("Span", "Count", "Avg ms", "Max ms", "Last ms", "Queries", "Query ms")),
+                               ("Statements", ("SQL", "Count", "Errors", "Total ms", "Avg ms", "Max ms", "Rows", "Slow", "Called From")),
+                               ("Slow / Failed Queries", ("Time", "ms", "Rows", "Called From", "Error", "SQL"))):
+            frame = tk.Frame(notebook)
+            notebook.add(frame, text=title)
+            tree = ttk.Treeview(frame, columns=columns, show="headings")
+            for col in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=400 if col == "SQL" else 220 if col in ("Span", "Called From", "Error") else 80)
+            scrollbar = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side='right', fill='y')
+            tree.pack(fill='both', expand=True)
+            self.diagnostics_trees[title] = tree
+        self.refresh_diagnostics()
+    
+    def refresh_diagnostics(self):
+        snap = instrument.stats.snapshot()
+        rows = {
+            "Screens": [(s["name"], s["count"], f"{s['avg_ms']:.1f}", f"{s['max_ms']:.1f}", f"{s['last_ms']:.1f}",
+                         s["queries"], f"{s['query_ms']:.1f}") for s in snap["spans"]],
+            "Statements": [(s["sql"], s["count"], s["errors"], f"{s['total_ms']:.1f}", f"{s['avg_ms']:.2f}", f"{s['max_ms']:.1f}",
+                            s["rows"], s["slow"], ", ".join(s["call_sites"])) for s in snap["statements"]],
+            "Slow / Failed Queries": [(e["time"], e["ms"], e["rows"], e["site"], e.get("error") or "", " ".join(e["sql"].split()))
+                             for e in reversed(snap["slow_queries"])],
+        }
+        for title, tree in self.diagnostics_trees.items():
+            tree.delete(*tree.get_children())
+            for row in rows[title]:
+                tree.insert("", "end", values=row)
+        self.diagnostics_status.config(text=f"Since {snap['since']}; slow query threshold {snap['slow_query_ms']:g} ms; "
+                                            f"files in {os.path.abspath(stats_flusher.directory)}")
 
 # -------------------------------
 # Run the Application
 # -------------------------------
 if __name__ == '__main__':
+    # Command-line import mode: python revised.py import FILE [options]
+    if len(sys.argv) > 1 and sys.argv[1] == "import":
+        sys.exit(importer.main(sys.argv[2:]))
+    start()
     root = tk.Tk()
     LoginWindow(root)
     root.mainloop()
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.local_postgres import LocalPostgres, pg_bindir
+
+# -------------------------------
+# Shared fixtures
+# -------------------------------
+# pg_server: a PostgreSQL server URL for the whole run -- $LEDGER_TEST_PG_URL,
+# or a throw-away server (tests/local_postgres.py) from $LEDGER_TEST_PG_BIN,
+# PATH or pg_config.  Tests that need it are skipped when there is none or
+# psycopg isn't installed; everything else runs on SQLite.
+
+@pytest.fixture(scope="session")
+def pg_server():
+    pytest.importorskip("psycopg")
+    url = os.environ.get("LEDGER_TEST_PG_URL")
+    if url:
+        yield url
+        return
+    bindir = pg_bindir(os.environ.get("LEDGER_TEST_PG_BIN"))
+    if bindir is None:
+        pytest.skip("no PostgreSQL: set LEDGER_TEST_PG_BIN or LEDGER_TEST_PG_URL")
+    server = LocalPostgres(bindir)
+    try:
+        url = server.start()
+    except Exception as e:
+        server.stop()
+        pytest.skip(f"cannot start PostgreSQL: {e}")
+    try:
+        yield url
+    finally:
+        server.stop()
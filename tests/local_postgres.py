@@ -0,0 +1,81 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from ledger.db import make_engine
+
+# -------------------------------
+# A throw-away PostgreSQL server
+# -------------------------------
+# Used by the PostgreSQL tests (tests/conftest.py) and by
+# benchmarks/bench_backends.py.  LocalPostgres runs initdb + pg_ctl from a
+# bin directory (pg_bindir(): given, PATH or pg_config) in a temporary
+# directory on a free port, listening on a Unix socket only, and removes
+# everything on stop().  PostgreSQL refuses to run as root, so under root the
+# server runs as $LEDGER_PG_USER (default "nobody") through runuser.
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def pg_bindir(given=None):
+    # Directory with initdb and pg_ctl, or None.
+    if given:
+        return given
+    found = shutil.which("pg_ctl")
+    if found:
+        return os.path.dirname(found)
+    try:
+        return subprocess.run(["pg_config", "--bindir"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class LocalPostgres:
+    # A temporary cluster listening on a Unix socket in its own directory.
+    def __init__(self, bindir):
+        self.bindir = bindir
+        self.dir = tempfile.mkdtemp(prefix="ledger-pg-")
+        self.data = os.path.join(self.dir, "data")
+        self.port = free_port()
+        self.prefix = []
+        if hasattr(os, "geteuid") and os.geteuid() == 0:
+            import pwd
+
+            user = os.environ.get("LEDGER_PG_USER", "nobody")
+            if not shutil.which("runuser"):
+                raise RuntimeError("PostgreSQL won't run as root and runuser is missing: run as a normal user")
+            entry = pwd.getpwnam(user)
+            os.chown(self.dir, entry.pw_uid, entry.pw_gid)
+            self.prefix = ["runuser", "-u", user, "--"]
+
+    def _run(self, *args):
+        subprocess.run([*self.prefix, os.path.join(self.bindir, args[0]), *args[1:]], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def start(self):
+        self._run("initdb", "-D", self.data, "-U", "ledger", "--auth", "trust", "-E", "UTF8")
+        self._run("pg_ctl", "-D", self.data, "-l", os.path.join(self.dir, "server.log"), "-w", "-o",
+                  f"-p {self.port} -k {self.dir} -c listen_addresses='' -c fsync=on", "start")
+        return f"postgresql+psycopg://ledger@/postgres?host={self.dir}&port={self.port}"
+
+    def stop(self):
+        try:
+            if os.path.exists(os.path.join(self.data, "postmaster.pid")):
+                self._run("pg_ctl", "-D", self.data, "-m", "fast", "-w", "stop")
+        finally:
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+def fresh_pg_database(server_url, name):
+    # Drops and creates `name` on the server; returns its URL.
+    admin = make_engine(server_url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    admin.dispose()
+    return make_url(server_url).set(database=name).render_as_string(hide_password=False)
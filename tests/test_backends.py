@@ -0,0 +1,267 @@
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import sessionmaker
+
+from ledger import accounts, bulk, fiscal, migrations, reports, yearend
+from ledger.db import make_engine
+from ledger.money import to_minor, to_units
+from ledger.posting import PostingError, post_vouchers
+from ledger.reconcile import reconcile
+from tests.local_postgres import fresh_pg_database
+
+# -------------------------------
+# SQLite and PostgreSQL: the same ledger on both
+# -------------------------------
+# Usage: python -m pytest tests
+#        LEDGER_TEST_PG_BIN=/usr/lib/postgresql/16/bin python -m pytest tests
+#        LEDGER_TEST_PG_URL=postgresql+psycopg://user@host/postgres python -m pytest tests
+# The same vouchers are posted on every backend, in one batch big enough for
+# COPY (ledger.bulk) plus a few single vouchers.  On SQLite the statements and
+# reconcile are checked against totals worked out from the vouchers here; on
+# PostgreSQL (see tests/conftest.py; skipped without one) they must also match
+# SQLite exactly.  Also covered: migrations down and up again (0012 retypes
+# the money columns, with ALTER COLUMN ... TYPE on PostgreSQL), the REPEATABLE
+# READ read engine and a year-end close (into an fy<year> schema on PostgreSQL),
+# after which accounts with only archived lines must still be kept.
+
+ACCOUNTS = 24
+VOUCHERS = 600  # one batch: well over bulk.COPY_MIN_ROWS
+THIS_YEAR = date.today().year
+FIRST_YEAR = THIS_YEAR - 2  # the vouchers spread over two years from here
+
+def make_vouchers(rnd, count, start=datetime(FIRST_YEAR, 1, 1)):
+    vouchers = []
+    for i in range(count):
+        debits = [rnd.randint(1, 500_000) for _ in range(rnd.randint(1, 3))]
+        lines = [{"account_id": rnd.randint(1, ACCOUNTS), "amount": f"{d / 100:.2f}", "type": "debit"} for d in debits]
+        lines.append({"account_id": rnd.randint(1, ACCOUNTS), "amount": f"{sum(debits) / 100:.2f}", "type": "credit"})
+        vouchers.append({"voucher_type": "Journal", "description": f"Test voucher {i}", "lines": lines,
+                         "date": start + timedelta(days=rnd.randrange(730), seconds=rnd.randrange(86400))})
+    return vouchers
+
+def ledger_vouchers():
+    # (bulk batch, single vouchers): the same on every call.
+    rnd = random.Random(7)
+    return make_vouchers(rnd, VOUCHERS), make_vouchers(rnd, 5)
+
+def build_ledger(url):
+    engine = make_engine(url)
+    migrations.upgrade(engine)
+    batch, singles = ledger_vouchers()
+    with sessionmaker(bind=engine)() as session:
+        for i in range(ACCOUNTS):
+            accounts.create_account(session, f"Account {i + 1:03d}", accounts.ACCOUNT_TYPES[i % len(accounts.ACCOUNT_TYPES)])
+        post_vouchers(session, batch)
+        for voucher in singles:
+            post_vouchers(session, [voucher])
+    return engine
+
+def backend_url(request, name, tmp_path):
+    if name == "sqlite":
+        return f"sqlite:///{tmp_path / 'ledger.db'}"
+    return fresh_pg_database(request.getfixturevalue("pg_server"), f"ledger_test_{tmp_path.name.lower()}"[:60])
+
+@pytest.fixture(scope="module")
+def sqlite_ledger(tmp_path_factory):
+    engine = build_ledger(f"sqlite:///{tmp_path_factory.mktemp('sqlite') / 'ledger.db'}")
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(scope="module")
+def pg_ledger(pg_server):
+    engine = build_ledger(fresh_pg_database(pg_server, "ledger_test"))
+    yield engine
+    engine.dispose()
+
+def url_of(engine):
+    return engine.url.render_as_string(hide_password=False)
+
+def statements(engine):
+    # Every statement the screens show, for a few periods, in plain values.
+    periods = [(None, None), (date(FIRST_YEAR, 1, 1), date(FIRST_YEAR, 12, 31)),
+               (date(FIRST_YEAR, 7, 1), date(FIRST_YEAR + 1, 6, 30)), (date(FIRST_YEAR + 1, 3, 1), None)]
+    result = {}
+    with sessionmaker(bind=engine)() as session:
+        for date_from, date_to in periods:
+            key = f"{date_from}..{date_to}"
+            result[f"trial balance {key}"] = repr(reports.trial_balance(session, date_from, date_to))
+            result[f"income statement {key}"] = repr(reports.income_statement(session, date_from, date_to))
+        for as_of in (date(FIRST_YEAR, 12, 31), date(FIRST_YEAR + 1, 5, 20), None):
+            result[f"balance sheet {as_of}"] = repr(reports.balance_sheet(session, as_of))
+    return result
+
+def expected_balances(before=None):
+    # {account id: debit - credit in minor units} of the vouchers dated before `before`.
+    balances = defaultdict(int)
+    batch, singles = ledger_vouchers()
+    for voucher in batch + singles:
+        if before is None or voucher["date"] < before:
+            for line in voucher["lines"]:
+                amount = to_minor(line["amount"])
+                balances[line["account_id"]] += amount if line["type"] == "debit" else -amount
+    return balances
+
+def assert_reconciles(engine):
+    result = reconcile(url_of(engine), workers=2, chunk=500)
+    assert result["discrepancies"] == []
+    assert result["orphans"] == {}
+    return result
+
+def line_counts(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT (SELECT COUNT(*) FROM journal_entries), "
+                                 "(SELECT COUNT(*) FROM transaction_details)")).one()
+
+# --- SQLite, checked against the vouchers ---
+def test_every_voucher_is_posted(sqlite_ledger):
+    batch, singles = ledger_vouchers()
+    assert tuple(line_counts(sqlite_ledger)) == (len(batch) + len(singles),
+                                                  sum(len(v["lines"]) for v in batch + singles))
+    with sessionmaker(bind=sqlite_ledger)() as session:
+        assert not bulk.use_copy(session, VOUCHERS)
+
+@pytest.mark.parametrize("date_to", [None, date(FIRST_YEAR, 12, 31), date(FIRST_YEAR + 1, 5, 20)])
+def test_trial_balance_matches_the_vouchers(sqlite_ledger, date_to):
+    expected = expected_balances(reports.day_end(date_to) if date_to else None)
+    with sessionmaker(bind=sqlite_ledger)() as session:
+        report = reports.trial_balance(session, None, date_to)
+    assert {line.id: line.closing for line in report["lines"]} == {i: to_units(expected[i]) for i in range(1, ACCOUNTS + 1)}
+    assert report["total"] == 0
+
+def test_reconcile_passes(sqlite_ledger):
+    result = assert_reconciles(sqlite_ledger)
+    assert result["lines"] == line_counts(sqlite_ledger)[1]
+
+# --- PostgreSQL, checked against SQLite ---
+def test_bulk_batch_goes_through_copy(sqlite_ledger, pg_ledger):
+    with sessionmaker(bind=pg_ledger)() as session:
+        assert bulk.use_copy(session, VOUCHERS)
+    assert line_counts(pg_ledger) == line_counts(sqlite_ledger)
+
+def test_statements_match_sqlite(sqlite_ledger, pg_ledger):
+    assert statements(pg_ledger) == statements(sqlite_ledger)
+
+def test_reconcile_agrees(sqlite_ledger, pg_ledger):
+    assert assert_reconciles(pg_ledger)["lines"] == assert_reconciles(sqlite_ledger)["lines"]
+
+def test_read_engine_is_a_read_only_snapshot(pg_ledger):
+    reader = make_engine(url_of(pg_ledger), readonly=True)
+    try:
+        with sessionmaker(bind=reader)() as session:
+            before = session.execute(text("SELECT COUNT(*) FROM journal_entries")).scalar()
+            with sessionmaker(bind=pg_ledger)() as writer:
+                post_vouchers(writer, make_vouchers(random.Random(1), 1, datetime(THIS_YEAR, 1, 1)))
+            # Same transaction: still the snapshot it started with.
+            assert session.execute(text("SELECT COUNT(*) FROM journal_entries")).scalar() == before
+            session.rollback()
+            assert session.execute(text("SELECT COUNT(*) FROM journal_entries")).scalar() == before + 1
+            with pytest.raises(DBAPIError):
+                session.execute(text("UPDATE accounts SET name = name"))
+    finally:
+        reader.dispose()
+
+# --- both backends ---
+def money_column(engine):
+    with engine.connect() as conn:
+        column = next(c for c in inspect(conn).get_columns("transaction_details") if c["name"] == "amount")
+        amounts = conn.execute(text("SELECT amount FROM transaction_details ORDER BY id LIMIT 20")).scalars().all()
+    return type(column["type"]).__name__, amounts
+
+@pytest.mark.parametrize("backend", ["sqlite", "postgresql"])
+def test_migrations_down_and_up(request, backend, tmp_path):
+    engine = build_ledger(backend_url(request, backend, tmp_path))
+    try:
+        before = statements(engine)
+        type_name, minor = money_column(engine)
+
+        migrations.downgrade(engine, 11)  # money back to floating-point units
+        type_name_11, units = money_column(engine)
+        assert [round(u * 100) for u in units] == minor
+        if backend == "postgresql":
+            assert (type_name, type_name_11) == ("BIGINT", "DOUBLE_PRECISION")
+
+        migrations.upgrade(engine)
+        assert migrations.current_version(engine) == migrations.latest_version()
+        assert money_column(engine) == (type_name, minor)
+        assert statements(engine) == before
+        assert_reconciles(engine)
+
+        migrations.downgrade(engine, 0)
+        with engine.connect() as conn:
+            assert [t for t in inspect(conn).get_table_names() if t != "schema_version"] == []
+        migrations.upgrade(engine)
+        assert migrations.current_version(engine) == migrations.latest_version()
+    finally:
+        engine.dispose()
+
+def close_first_year(engine):
+    # Closes FIRST_YEAR and checks what a close must keep; returns the
+    # (income statement, balance sheet) before and after.
+    income = (date(FIRST_YEAR, 1, 1), date(FIRST_YEAR + 1, 12, 31))
+
+    def shown():
+        with sessionmaker(bind=engine)() as session:
+            return (repr(reports.income_statement(session, *income)),
+                    repr(reports.balance_sheet(session, date(FIRST_YEAR + 1, 5, 20))))
+
+    before = shown()
+    assert yearend.close_year(engine, FIRST_YEAR)["entries"] > 0
+    after = shown()
+    assert after[0] == before[0]  # closing vouchers are left out
+    with sessionmaker(bind=engine)() as session:
+        voucher = dict(make_vouchers(random.Random(2), 1)[0], date=datetime(FIRST_YEAR, 6, 1))
+        with pytest.raises(PostingError):
+            post_vouchers(session, [voucher])
+        session.rollback()
+    assert_reconciles(engine)
+    return before, after
+
+def test_year_end_close(tmp_path):
+    engine = build_ledger(f"sqlite:///{tmp_path / 'close.db'}")
+    try:
+        close_first_year(engine)
+    finally:
+        engine.dispose()
+
+@pytest.mark.parametrize("backend", ["sqlite", "postgresql"])
+def test_accounts_with_archived_lines_are_kept(request, backend, tmp_path):
+    engine = build_ledger(backend_url(request, backend, tmp_path))
+    try:
+        with sessionmaker(bind=engine)() as session:
+            sales = accounts.create_account(session, "Old Sales", "Revenue")
+            unused = accounts.create_account(session, "Never Used", "Revenue")
+            post_vouchers(session, [{"voucher_type": "Journal", "description": "Sale", "date": datetime(FIRST_YEAR, 3, 1),
+                                     "lines": [{"account_id": 1, "amount": "12.50", "type": "debit"},
+                                               {"account_id": sales, "amount": "12.50", "type": "credit"}]}])
+        yearend.close_year(engine, FIRST_YEAR)
+        with sessionmaker(bind=engine)() as session:
+            # Closed to zero: no live lines left, only the archived ones.
+            assert session.execute(text("SELECT COUNT(*) FROM transaction_details WHERE account_id = :id"),
+                                   {"id": sales}).scalar() == 0
+            with pytest.raises(accounts.AccountInUse):
+                accounts.delete_account(session, sales)
+            session.rollback()
+            assert accounts.delete_account(session, unused) == "Never Used"
+            with pytest.raises(accounts.AccountError, match="not found"):
+                accounts.delete_account(session, unused)
+            report = reports.income_statement(session, date(FIRST_YEAR, 1, 1), date(FIRST_YEAR, 12, 31))
+        assert [line.amount for line in report["revenues"] if line.id == sales] == [-12.5]  # credit balance
+    finally:
+        engine.dispose()
+
+def test_year_end_close_matches_sqlite(pg_server, tmp_path):
+    engines = {"sqlite": build_ledger(f"sqlite:///{tmp_path / 'close.db'}"),
+               "postgresql": build_ledger(fresh_pg_database(pg_server, "ledger_test_close"))}
+    try:
+        results = {name: close_first_year(engine) for name, engine in engines.items()}
+        assert results["postgresql"] == results["sqlite"]
+        with engines["postgresql"].connect() as conn:
+            assert fiscal.archive_alias(FIRST_YEAR) in inspect(conn).get_schema_names()
+    finally:
+        for engine in engines.values():
+            engine.dispose()
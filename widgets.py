@@ -0,0 +1,351 @@
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+
+# -------------------------------
+# Virtual Treeview
+# -------------------------------
+# A ttk.Treeview that only ever holds the rows currently on screen.  Rows are
+# pulled in pages from a data source (see ledger.queries.PagedQuery for the
+# interface) and a few pages are kept in an LRU cache as a scroll buffer.  The
+# scrollbar, mouse wheel and keyboard move a window over the source's row
+# count; clicking a heading re-sorts through the source (i.e. the database).
+
+class VirtualTreeview(tk.Frame):
+    def __init__(self, master, source, columns, widths=None, page_size=200, cached_pages=6, **kwargs):
+        super().__init__(master, **kwargs)
+        self.source = source
+        self.columns = tuple(columns)
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+        self.sort_column = None
+        self.descending = None
+        self.total = 0
+        self.top = 0
+        self.visible = 1
+        self.pages = OrderedDict()
+        self.selected_index = None
+        self._items = []
+        self._rendering = False
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings", selectmode="browse")
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        widths = widths or {}
+        for col in self.columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=widths.get(col, 120))
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Down>", lambda e: self._on_arrow(1))
+        self.tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.visible) or "break")
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.visible) or "break")
+        self.refresh()
+
+    # --- data ---
+    def set_source(self, source):
+        self.source = source
+        self.sort_column = None
+        self.descending = None
+        self.top = 0
+        self.refresh()
+
+    def refresh(self):
+        # Re-read the row count and drop cached pages (after edits or re-sorting).
+        self.total = self.source.count() if self.source is not None else 0
+        self.pages.clear()
+        self.selected_index = None
+        self.top = max(0, min(self.top, self.total - self.visible))
+        self._render()
+
+    def _page(self, index):
+        if index in self.pages:
+            self.pages.move_to_end(index)
+            return self.pages[index]
+        previous = self.pages.get(index - 1)
+        after = previous[-1] if previous and len(previous) == self.page_size else None
+        rows = self.source.fetch(index * self.page_size, self.page_size, self.sort_column, self.descending, after)
+        self.pages[index] = rows
+        while len(self.pages) > self.cached_pages:
+            self.pages.popitem(last=False)
+        return rows
+
+    def row(self, index):
+        if index < 0 or index >= self.total:
+            return None
+        rows = self._page(index // self.page_size)
+        offset = index % self.page_size
+        return rows[offset] if offset < len(rows) else None
+
+    def selected_row(self):
+        return self.row(self.selected_index) if self.selected_index is not None else None
+
+    # --- rendering ---
+    def _row_height(self):
+        height = ttk.Style().lookup("Treeview", "rowheight")
+        try:
+            return int(height) or 20
+        except (TypeError, ValueError):
+            return 20
+
+    def _render(self):
+        if self._rendering:
+            return
+        self._rendering = True
+        try:
+            count = max(0, min(self.visible, self.total - self.top))
+            while len(self._items) < count:
+                self._items.append(self.tree.insert("", "end", values=()))
+            while len(self._items) > count:
+                self.tree.delete(self._items.pop())
+            selection = None
+            for i, iid in enumerate(self._items):
+                row = self.row(self.top + i)
+                self.tree.item(iid, values=self.source.format_row(row) if row is not None else ())
+                if self.top + i == self.selected_index:
+                    selection = iid
+            self.tree.selection_set(selection) if selection else self.tree.selection_remove(self.tree.selection())
+            if self.total:
+                self.scrollbar.set(self.top / self.total, min(1.0, (self.top + self.visible) / self.total))
+            else:
+                self.scrollbar.set(0, 1)
+        finally:
+            self._rendering = False
+
+    def _on_resize(self, event):
+        # Leave room for the heading row.
+        visible = max(1, (event.height - self._row_height() - 6) // self._row_height())
+        if visible != self.visible:
+            self.visible = visible
+            self.top = max(0, min(self.top, self.total - self.visible))
+            self._render()
+
+    # --- navigation ---
+    def scroll(self, rows):
+        top = max(0, min(self.top + rows, self.total - self.visible))
+        if top != self.top:
+            self.top = top
+            self._render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll(int(float(value) * self.total) - self.top)
+        elif action == "scroll":
+            self.scroll(int(value) * (self.visible if unit == "pages" else 1))
+
+    def _on_arrow(self, step):
+        if self.selected_index is None:
+            return None
+        target = self.selected_index + step
+        if 0 <= target < self.total:
+            self.selected_index = target
+            if not (self.top <= target < self.top + self.visible):
+                self.top = target if step < 0 else target - self.visible + 1
+            self._render()
+        return "break"
+
+    def _on_select(self, event):
+        if self._rendering:
+            return
+        selection = self.tree.selection()
+        if selection and selection[0] in self._items:
+            self.selected_index = self.top + self._items.index(selection[0])
+
+    # --- sorting ---
+    def sort_by(self, column):
+        if self.source is None or not self.source.sortable(column):
+            return
+        if self.sort_column == column:
+            self.descending = not self.descending
+        else:
+            self.sort_column, self.descending = column, False
+        for col in self.columns:
+            arrow = (" ▼" if self.descending else " ▲") if col == column else ""
+            self.tree.heading(col, text=col + arrow)
+        self.top = 0
+        self.refresh()
+
+# -------------------------------
+# In-memory data source (benchmarks, small fixed lists)
+# -------------------------------
+class ListSource:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def sortable(self, column):
+        return False
+
+    def count(self):
+        return len(self.rows)
+
+    def fetch(self, offset, limit, sort=None, descending=None, after=None):
+        return self.rows[offset:offset + limit]
+
+    def format_row(self, row):
+        return row
+
+# -------------------------------
+# Type-ahead picker
+# -------------------------------
+# An Entry with a drop-down list of matches that is refreshed on every key
+# press.  `search(text)` returns the matching items (best first) and
+# `label(item)` their display text; the picked item itself is kept, so callers
+# never have to parse it back out of the label.  Up/Down move through the list
+# while the focus stays in the entry, Return or a click picks, Escape closes.
+# Picking generates <<ItemPicked>>.
+
+class TypeAheadPicker(tk.Frame):
+    def __init__(self, master, search, label=str, width=30, rows=10, **kwargs):
+        super().__init__(master, **kwargs)
+        self.search = search
+        self.label = label
+        self.rows = rows
+        self.value = None
+        self.matches = []
+        self.popup = None
+        self.listbox = None
+        self.var = tk.StringVar()
+        self.entry = tk.Entry(self, textvariable=self.var, width=width)
+        self.entry.pack(fill='x', expand=True)
+        self.entry.bind("<KeyRelease>", self._on_key)
+        self.entry.bind("<Down>", lambda e: self._move(1))
+        self.entry.bind("<Up>", lambda e: self._move(-1))
+        self.entry.bind("<Return>", lambda e: self._pick_current())
+        self.entry.bind("<Tab>", lambda e: self._pick_current(close_only=True))
+        self.entry.bind("<Escape>", lambda e: self.close())
+        self.entry.bind("<FocusOut>", lambda e: self.after(200, self._on_focus_out))
+
+    # --- value ---
+    def get(self):
+        # The picked item, or None if the text doesn't correspond to one.
+        return self.value
+
+    def text(self):
+        return self.var.get().strip()
+
+    def set(self, item):
+        self.value = item
+        self.var.set(self.label(item) if item is not None else "")
+        self.close()
+        if item is not None:
+            self.event_generate("<<ItemPicked>>")
+
+    # --- drop-down ---
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab", "Shift_L", "Shift_R"):
+            return
+        if self.value is not None and self.var.get() == self.label(self.value):
+            return
+        self.value = None
+        self.matches = self.search(self.text())
+        self._show()
+
+    def _show(self):
+        if not self.matches:
+            self.close()
+            return
+        if self.popup is None:
+            self.popup = tk.Toplevel(self)
+            self.popup.overrideredirect(True)
+            self.listbox = tk.Listbox(self.popup, exportselection=False)
+            self.listbox.pack(fill='both', expand=True)
+            self.listbox.bind("<ButtonRelease-1>", self._on_click)
+        self.listbox.delete(0, 'end')
+        for item in self.matches:
+            self.listbox.insert('end', self.label(item))
+        self.listbox.config(height=min(self.rows, len(self.matches)))
+        self.listbox.selection_set(0)
+        x, y = self.entry.winfo_rootx(), self.entry.winfo_rooty() + self.entry.winfo_height()
+        self.popup.geometry(f"{max(self.entry.winfo_width(), 250)}x{self.listbox.winfo_reqheight()}+{x}+{y}")
+        self.popup.lift()
+
+    def close(self):
+        if self.popup is not None:
+            self.popup.destroy()
+            self.popup = self.listbox = None
+
+    def _current(self):
+        if self.listbox is None or not self.matches:
+            return None
+        selection = self.listbox.curselection()
+        return self.matches[selection[0]] if selection else self.matches[0]
+
+    def _move(self, step):
+        if self.listbox is None:
+            self.matches = self.search(self.text())
+            self._show()
+            return "break"
+        selection = self.listbox.curselection()
+        index = max(0, min(len(self.matches) - 1, (selection[0] if selection else -1) + step))
+        self.listbox.selection_clear(0, 'end')
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+        return "break"
+
+    def _pick_current(self, close_only=False):
+        item = self._current()
+        if item is not None:
+            self.set(item)
+        elif close_only:
+            self.close()
+        return None if close_only else "break"
+
+    def _on_click(self, event):
+        index = self.listbox.nearest(event.y)
+        if 0 <= index < len(self.matches):
+            self.set(self.matches[index])
+        self.entry.focus_set()
+
+    def _on_focus_out(self):
+        # Leaving the field with exactly one match picks it.
+        if not self.winfo_exists() or self.focus_get() is self.entry:
+            return
+        if self.value is None and len(self.matches) == 1 and self.text():
+            self.set(self.matches[0])
+        self.close()
+
+# -------------------------------
+# Status bar for background work
+# -------------------------------
+class TaskStatusBar(tk.Frame):
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.label = tk.Label(self, text="", anchor='w')
+        self.label.pack(side='left', fill='x', expand=True, padx=5)
+        self.bar = ttk.Progressbar(self, length=200, mode='indeterminate')
+        self.cancel_button = tk.Button(self, text="Cancel", command=self._cancel)
+        self.on_cancel = None
+
+    def start(self, message, on_cancel=None):
+        self.on_cancel = on_cancel
+        self.label.config(text=message)
+        self.bar.config(mode='indeterminate', value=0)
+        self.bar.pack(side='left', padx=5)
+        self.bar.start(15)
+        if on_cancel is not None:
+            self.cancel_button.pack(side='left', padx=5)
+
+    def progress(self, done, total=None, message=None):
+        if message:
+            self.label.config(text=message)
+        if total:
+            self.bar.stop()
+            self.bar.config(mode='determinate', maximum=total, value=done)
+
+    def finish(self, message=""):
+        self.bar.stop()
+        self.bar.pack_forget()
+        self.cancel_button.pack_forget()
+        self.label.config(text=message)
+        self.on_cancel = None
+
+    def _cancel(self):
+        if self.on_cancel is not None:
+            self.on_cancel()
+        self.finish("Cancelled.")